@@ -0,0 +1,166 @@
+import re
+import struct
+from functools import lru_cache
+from typing import List, Tuple
+from app.exceptions.commands import InvalidComandosException
+
+# Gramática aceita pelo firmware: "aNNNN" avança NNNN unidades,
+# "d" e "e" giram para a direita e para a esquerda.
+COMMANDS_PATTERN = re.compile(r"(?:a\d{4}|[de])+")
+TOKEN_PATTERN = re.compile(r"a(\d{4})|([de])")
+
+Token = Tuple[str, int]
+
+# Tempos nominais do firmware (os mesmos usados pelo simulador em esp.py).
+MS_PER_DISTANCE_UNIT = 10
+MS_PER_TURN = 1000
+
+# Codificação compacta "c1", usada com dispositivos que a anunciam em
+# ``encodings`` no status: marcador 0xC1 e id do trajeto (u32), seguidos das
+# instruções, little-endian:
+#   0x01 u16      avança N unidades
+#   0x02 / 0x03   gira à direita (d) / à esquerda (e)
+#   0x04 u8 u16   repete n vezes o bloco de ``tamanho`` bytes seguinte
+COMPACT_ENCODING = "c1"
+COMPACT_MARKER = 0xC1
+COMPACT_HEADER = struct.Struct("<BI")
+COMPACT_FORWARD = struct.Struct("<BH")
+COMPACT_REPEAT = struct.Struct("<BBH")
+OP_FORWARD, OP_RIGHT, OP_LEFT, OP_REPEAT = 1, 2, 3, 4
+# Maior bloco (em comandos) procurado como repetição.
+MAX_REPEAT_BLOCK = 64
+
+
+def parse_commands(comandos: str) -> List[Token]:
+    """
+    Converte a string de comandos em uma lista de ``(comando, distancia)``.
+
+    Raises:
+        InvalidComandosException: se a string não seguir a gramática.
+    """
+    if not COMMANDS_PATTERN.fullmatch(comandos):
+        raise InvalidComandosException(f"Comandos inválidos: {comandos!r}")
+
+    return [
+        ("a", int(distance)) if distance else (turn, 0)
+        for distance, turn in TOKEN_PATTERN.findall(comandos)
+    ]
+
+
+def compile_commands(comandos: str) -> str:
+    """Valida os comandos e retorna o payload MQTT canônico, sem o id do trajeto."""
+    return "".join(
+        f"a{distance:04d}" if command == "a" else command
+        for command, distance in parse_commands(comandos)
+    )
+
+
+@lru_cache(maxsize=65_536)
+def command_totals(comandos: str) -> Tuple[int, int]:
+    """Distância total de avanço e número de giros da string (leniente, sem validar)."""
+    distance = 0
+    turns = 0
+    for digits, _ in TOKEN_PATTERN.findall(comandos):
+        if digits:
+            distance += int(digits)
+        else:
+            turns += 1
+    return distance, turns
+
+
+def _token_size(token: Token) -> int:
+    return COMPACT_FORWARD.size if token[0] == "a" else 1
+
+
+def _encode_tokens(tokens: List[Token]) -> bytes:
+    """
+    Codifica os comandos trocando sequências repetidas por blocos de
+    repetição (escolha gulosa da que mais economiza a cada posição).
+    """
+    sizes = [0]
+    for token in tokens:
+        sizes.append(sizes[-1] + _token_size(token))
+
+    out = bytearray()
+    i, n = 0, len(tokens)
+    while i < n:
+        best = None
+        for length in range(1, min(MAX_REPEAT_BLOCK, (n - i) // 2) + 1):
+            if tokens[i + length] != tokens[i]:
+                continue
+            block = tokens[i:i + length]
+            count = 1
+            while count < 255 and tokens[i + count * length:i + (count + 1) * length] == block:
+                count += 1
+            if count < 2:
+                continue
+            saving = (count - 1) * (sizes[i + length] - sizes[i]) - COMPACT_REPEAT.size
+            if saving > 0 and (best is None or saving > best[0]):
+                best = (saving, length, count)
+
+        if best is None:
+            command, distance = tokens[i]
+            if command == "a":
+                out += COMPACT_FORWARD.pack(OP_FORWARD, distance)
+            else:
+                out.append(OP_RIGHT if command == "d" else OP_LEFT)
+            i += 1
+        else:
+            _, length, count = best
+            body = _encode_tokens(tokens[i:i + length])
+            out += COMPACT_REPEAT.pack(OP_REPEAT, count, len(body)) + body
+            i += length * count
+    return bytes(out)
+
+
+@lru_cache(maxsize=1024)
+def _compact_body(comandos: str) -> bytes:
+    return _encode_tokens(parse_commands(comandos))
+
+
+def encode_compact(comandos: str, trajeto_id: int) -> bytes:
+    """
+    Payload "c1" equivalente a ``{comandos}i{trajeto_id}``.
+
+    Raises:
+        InvalidComandosException: se a string não seguir a gramática.
+    """
+    return COMPACT_HEADER.pack(COMPACT_MARKER, trajeto_id) + _compact_body(comandos)
+
+
+def _decode_body(payload: bytes, start: int, end: int, out: List[str]) -> None:
+    i = start
+    while i < end:
+        op = payload[i]
+        if op == OP_FORWARD and i + COMPACT_FORWARD.size <= end:
+            out.append(f"a{COMPACT_FORWARD.unpack_from(payload, i)[1]:04d}")
+            i += COMPACT_FORWARD.size
+        elif op in (OP_RIGHT, OP_LEFT):
+            out.append("d" if op == OP_RIGHT else "e")
+            i += 1
+        elif op == OP_REPEAT and i + COMPACT_REPEAT.size <= end:
+            _, count, size = COMPACT_REPEAT.unpack_from(payload, i)
+            i += COMPACT_REPEAT.size
+            if i + size > end:
+                raise InvalidComandosException("Bloco de repetição maior que o payload")
+            block: List[str] = []
+            _decode_body(payload, i, i + size, block)
+            out.extend(block * count)
+            i += size
+        else:
+            raise InvalidComandosException(f"Instrução inválida no byte {i}")
+
+
+def decode_compact(payload: bytes) -> Tuple[str, int]:
+    """
+    Expande um payload "c1" para ``(comandos, id do trajeto)``.
+
+    Raises:
+        InvalidComandosException: se o payload estiver malformado.
+    """
+    if len(payload) < COMPACT_HEADER.size or payload[0] != COMPACT_MARKER:
+        raise InvalidComandosException("Payload não está na codificação compacta")
+    _, trajeto_id = COMPACT_HEADER.unpack_from(payload)
+    out: List[str] = []
+    _decode_body(payload, COMPACT_HEADER.size, len(payload), out)
+    return "".join(out), trajeto_id
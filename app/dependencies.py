@@ -1,7 +1,42 @@
-from app.database import SessionLocal
-from app.mqtt_manager import MQTTManager
+import os
+import secrets
+from fastapi import Header, HTTPException
+from app.database import SessionLocal, engine
+from app.mqtt_manager import MQTTManager, CLIENT_ID
+from app.publisher_pool import PublisherPool, MQTT_PUBLISHER_POOL_SIZE
+from app.rate_limiter import RateLimiter
+from app.repositories.group_commit import TrajetoGroupCommitter, GROUP_COMMIT_MS
+from app.services.templates import TemplateCache
+from app.services.eta import DurationModel
+from app.tracing import Tracer
+from app.profiler import ProfileStore
+from app.telemetry import TelemetryWriter
+from app.outbox import OutboxRelay
+from app.events import EventLog
+from app.recorder import MessageRecorder, MQTT_RECORD_FILE
+from typing import Optional
 
-mqtt_manager: MQTTManager = MQTTManager()
+ADMIN_TOKEN: Optional[str] = os.getenv("ADMIN_TOKEN") or None
+
+duration_model: DurationModel = DurationModel()
+tracer: Tracer = Tracer()
+event_log: EventLog = EventLog(engine)
+mqtt_manager: MQTTManager = MQTTManager(
+    duration_model=duration_model,
+    tracer=tracer,
+    event_log=event_log,
+    recorder=MessageRecorder(MQTT_RECORD_FILE) if MQTT_RECORD_FILE else None,
+    publisher_pool=PublisherPool(MQTT_PUBLISHER_POOL_SIZE, CLIENT_ID) if MQTT_PUBLISHER_POOL_SIZE > 0 else None,
+)
+telemetry_writer: TelemetryWriter = TelemetryWriter(engine)
+mqtt_manager.register_handler("devices/+/telemetry", telemetry_writer.handle)
+rate_limiter: RateLimiter = RateLimiter()
+template_cache: TemplateCache = TemplateCache()
+profile_store: ProfileStore = ProfileStore()
+outbox_relay: OutboxRelay = OutboxRelay(SessionLocal, mqtt_manager, tracer, event_log=event_log)
+group_committer: Optional[TrajetoGroupCommitter] = (
+    TrajetoGroupCommitter(SessionLocal) if GROUP_COMMIT_MS > 0 else None
+)
 
 def get_db():
     db = SessionLocal()
@@ -11,4 +46,39 @@ def get_db():
         db.close()
 
 def get_mqtt_manager() -> MQTTManager:
-    return mqtt_manager
\ No newline at end of file
+    return mqtt_manager
+
+def get_rate_limiter() -> RateLimiter:
+    return rate_limiter
+
+def get_group_committer() -> Optional[TrajetoGroupCommitter]:
+    return group_committer
+
+def get_template_cache() -> TemplateCache:
+    return template_cache
+
+def get_duration_model() -> DurationModel:
+    return duration_model
+
+def get_tracer() -> Tracer:
+    return tracer
+
+def get_profile_store() -> ProfileStore:
+    return profile_store
+
+def get_telemetry_writer() -> TelemetryWriter:
+    return telemetry_writer
+
+def get_outbox_relay() -> OutboxRelay:
+    return outbox_relay
+
+def get_event_log() -> EventLog:
+    return event_log
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Sem ADMIN_TOKEN configurado, os recursos administrativos ficam desabilitados."""
+    return ADMIN_TOKEN is not None and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
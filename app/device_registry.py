@@ -0,0 +1,86 @@
+import json
+import secrets
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+# Versão = época do processo nos bits altos + contador de mudanças nos baixos,
+# abaixo de 2**53 para continuar exata em clientes JavaScript.
+EPOCH_BITS = 16
+COUNTER_BITS = 37
+
+
+class DeviceRegistry(MutableMapping):
+    """
+    Último status de cada dispositivo, com uma versão que cresce a cada mudança.
+
+    Os dispositivos ficam ordenados pela última alteração, então
+    :meth:`changed_since` percorre só o que mudou depois da versão pedida. A
+    versão carrega uma época aleatória sorteada na criação: versões (e ETags)
+    de outra execução do processo nunca casam com as desta, mesmo que o
+    relógio tenha voltado, e recebem o registro completo. Remoções e
+    substituições do registro inteiro também não cabem num delta: clientes
+    anteriores a elas recebem o registro completo.
+    """
+
+    def __init__(self, epoch: Optional[int] = None):
+        self.epoch = secrets.randbelow(2 ** EPOCH_BITS) if epoch is None else epoch
+        self._devices: "OrderedDict[str, dict]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.version = self.epoch << COUNTER_BITS
+        self._reset_version = self.version
+        self._snapshot: Optional[Tuple[int, bytes]] = None
+
+    def __getitem__(self, device_id: str) -> dict:
+        return self._devices[device_id]
+
+    def __setitem__(self, device_id: str, status: dict) -> None:
+        if self._devices.get(device_id) == status:
+            return
+        self.version += 1
+        self._devices[device_id] = status
+        self._devices.move_to_end(device_id)
+        self._versions[device_id] = self.version
+
+    def __delitem__(self, device_id: str) -> None:
+        del self._devices[device_id]
+        del self._versions[device_id]
+        self.version += 1
+        self._reset_version = self.version
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._devices)
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __repr__(self) -> str:
+        return f"DeviceRegistry(version={self.version}, devices={dict(self._devices)!r})"
+
+    def replace(self, devices: Mapping[str, dict]) -> None:
+        """Substitui o registro inteiro."""
+        self.version += 1
+        self._devices = OrderedDict(devices)
+        self._versions = dict.fromkeys(self._devices, self.version)
+        self._reset_version = self.version
+
+    def changed_since(self, since: int) -> Tuple[Dict[str, dict], bool]:
+        """
+        Dispositivos alterados depois da versão ``since``. O segundo valor é
+        ``True`` quando o delta não é possível e o registro completo é devolvido.
+        """
+        if since >> COUNTER_BITS != self.epoch or since < self._reset_version or since > self.version:
+            return dict(self._devices), True
+
+        changed = []
+        for device_id in reversed(self._devices):
+            if self._versions[device_id] <= since:
+                break
+            changed.append(device_id)
+        return {device_id: self._devices[device_id] for device_id in reversed(changed)}, False
+
+    def snapshot_json(self) -> bytes:
+        """Registro completo serializado, reaproveitado enquanto a versão não muda."""
+        if self._snapshot is None or self._snapshot[0] != self.version:
+            self._snapshot = (self.version, json.dumps(self._devices).encode())
+        return self._snapshot[1]
@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.models import EventoTrajetoORM, TrajetoORM
+
+EVENTOS_BATCH_SIZE: int = int(os.getenv("EVENTOS_BATCH_SIZE", 1000))
+EVENTOS_FLUSH_INTERVAL: float = float(os.getenv("EVENTOS_FLUSH_MS", 1000)) / 1000
+EVENTOS_MAX_BUFFER: int = int(os.getenv("EVENTOS_MAX_BUFFER", 100_000))
+
+DESPACHADO = "despachado"
+PUBLICADO = "publicado"
+CONCLUIDO = "concluido"
+INTERROMPIDO = "interrompido"
+
+# Faixas logarítmicas de latência, 4 por oitava (~19% de largura cada).
+BINS_PER_OCTAVE = 4
+
+
+def latency_bin(latency_ms: int) -> int:
+    return 0 if latency_ms < 1 else int(math.log2(latency_ms) * BINS_PER_OCTAVE) + 1
+
+
+def bin_value(faixa: int) -> float:
+    """Ponto médio (geométrico) da faixa, em ms."""
+    return 0.0 if faixa == 0 else 2 ** ((faixa - 0.5) / BINS_PER_OCTAVE)
+
+
+class EventLog:
+    """
+    Registra o ciclo de vida dos trajetos (despachado, publicado, concluído
+    ou interrompido) e grava os eventos em lotes numa thread própria, como o
+    :class:`app.telemetry.TelemetryWriter`.
+
+    A latência de cada evento é contada a partir do despacho do trajeto,
+    guardado em memória para os ``max_tracked`` trajetos mais recentes;
+    eventos de trajetos despachados antes de um reinício ficam sem latência.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = EVENTOS_BATCH_SIZE,
+        flush_interval: float = EVENTOS_FLUSH_INTERVAL,
+        max_buffer: int = EVENTOS_MAX_BUFFER,
+        max_tracked: int = 100_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_tracked = max_tracked
+        self.clock = clock
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self._dispatched: "OrderedDict[int, int]" = OrderedDict()
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def dispatched(self, trajetos: Iterable[TrajetoORM]) -> None:
+        now = self._now()
+        with self._lock:
+            for trajeto in trajetos:
+                self._dispatched[trajeto.idTrajeto] = now
+                if len(self._dispatched) > self.max_tracked:
+                    self._dispatched.popitem(last=False)
+                self._append(trajeto.idTrajeto, trajeto.deviceId, DESPACHADO, now, None)
+
+    def published(self, trajeto_id: int, device_id: Optional[str]) -> None:
+        now = self._now()
+        with self._lock:
+            self._append(trajeto_id, device_id, PUBLICADO, now, self._dispatched.get(trajeto_id))
+
+    def completed(self, trajeto_id: int, device_id: Optional[str], status: Optional[bool]) -> None:
+        now = self._now()
+        with self._lock:
+            self._append(
+                trajeto_id, device_id, CONCLUIDO if status else INTERROMPIDO, now,
+                self._dispatched.pop(trajeto_id, None),
+            )
+
+    def _now(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _append(self, trajeto_id: int, device_id: Optional[str], tipo: str, now: int, since: Optional[int]) -> None:
+        latency = None if since is None else max(0, now - since)
+        self._buffer.append({
+            "idTrajeto": trajeto_id,
+            "deviceId": device_id,
+            "tipo": tipo,
+            "timestamp": now,
+            "minuto": now // 60_000,
+            "latenciaMs": latency,
+            "faixaLatencia": None if latency is None else latency_bin(latency),
+        })
+        self.received += 1
+        self._trim()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        """Descarta os eventos mais antigos que passarem de ``max_buffer``."""
+        if len(self._buffer) > self.max_buffer:
+            excess = len(self._buffer) - self.max_buffer
+            del self._buffer[:excess]
+            self.dropped += excess
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            # Falha do banco no desligamento não deve interromper o resto do teardown.
+            print(f"[ERROR] falha ao gravar eventos de trajeto no desligamento: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] falha ao gravar eventos de trajeto: {e}")
+
+    def flush(self) -> int:
+        """Grava tudo o que está no buffer. Retorna o número de eventos gravados."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(EventoTrajetoORM), batch)
+            except Exception:
+                # Devolve o lote ao início do buffer para a próxima tentativa,
+                # respeitando o limite: com o banco fora, o buffer não cresce sem fim.
+                with self._lock:
+                    self._buffer[:0] = batch
+                    self._trim()
+                raise
+
+            self.written += len(batch)
+            return len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "recebidos": self.received,
+            "gravados": self.written,
+            "descartados": self.dropped,
+            "pendentes": pending,
+        }
@@ -0,0 +1,5 @@
+from app.exceptions.base import CustomException
+
+class InvalidComandosException(CustomException):
+    code = 422
+    message = "Comandos inválidos"
@@ -0,0 +1,9 @@
+from app.exceptions.base import CustomException
+
+class GrupoNotFoundException(CustomException):
+    code = 404
+    message = "Grupo não encontrado"
+
+class GrupoAlreadyExistsException(CustomException):
+    code = 409
+    message = "Já existe um grupo com esse nome"
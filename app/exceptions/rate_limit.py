@@ -0,0 +1,17 @@
+import math
+from typing import Optional
+from app.exceptions.base import CustomException
+
+class RateLimitExceededException(CustomException):
+    code = 429
+    message = "Limite de comandos excedido"
+
+    def __init__(self, retry_after: float, message: Optional[str] = None):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+    @property
+    def headers(self) -> dict:
+        if math.isinf(self.retry_after):
+            return {}
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
@@ -0,0 +1,5 @@
+from app.exceptions.base import CustomException
+
+class InvalidTelemetryException(CustomException):
+    code = 400
+    message = "Payload de telemetria inválido"
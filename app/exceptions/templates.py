@@ -0,0 +1,5 @@
+from app.exceptions.base import CustomException
+
+class TemplateNotFoundException(CustomException):
+    code = 404
+    message = "Template não encontrado"
@@ -1,8 +1,12 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import trajetos, devices
-from app.dependencies import get_mqtt_manager
+from app.routers import trajetos, devices, templates, analise, traces, admin, grupos
+from app.dependencies import (
+    get_mqtt_manager, get_group_committer, get_duration_model, get_tracer, get_profile_store, is_admin_token,
+    get_telemetry_writer, get_outbox_relay, get_event_log
+)
+from app.profiler import ProfilingMiddleware
 import os
 
 @asynccontextmanager
@@ -12,17 +16,46 @@ async def lifespan(app: FastAPI):
 
     models.Base.metadata.create_all(bind=engine)
 
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        get_duration_model().fit_history(db)
+    finally:
+        db.close()
+
+    telemetry_writer = get_telemetry_writer()
+    telemetry_writer.start()
+    event_log = get_event_log()
+    event_log.start()
+
     mqtt_manager = get_mqtt_manager()
     await mqtt_manager.connect()
 
+    outbox_relay = get_outbox_relay()
+    outbox_relay.start()
+
     try:
         yield
     finally:
+        group_committer = get_group_committer()
+        if group_committer is not None:
+            await group_committer.drain()
+        await outbox_relay.stop()
         await mqtt_manager.disconnect()
+        if mqtt_manager.recorder is not None:
+            mqtt_manager.recorder.close()
+        telemetry_writer.stop()
+        event_log.stop()
+        get_tracer().flush()
 
 app = FastAPI(title="ESP32 Car Control API", version="1.0.0", lifespan=lifespan, docs_url="/docs")
 app.include_router(trajetos.router)
 app.include_router(devices.router)
+app.include_router(templates.router)
+app.include_router(analise.router)
+app.include_router(traces.router)
+app.include_router(admin.router)
+app.include_router(grupos.router)
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
@@ -32,8 +65,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Devices-Version", "X-Devices-Complete"],
 )
 
+app.add_middleware(ProfilingMiddleware, store=get_profile_store, is_admin=is_admin_token)
+
 @app.get("/health")
 async def health():
     return {
@@ -1,11 +1,115 @@
 from app.database import Base
-from sqlalchemy import Boolean, Column, Integer, Text
+from sqlalchemy import (
+    JSON, BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, SmallInteger, String,
+    Text, func,
+)
+from sqlalchemy.orm import relationship
+
+class RotaTemplateORM(Base):
+    __tablename__ = "rota_template"
+
+    idTemplate = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, nullable=False)
+    comandos = Column(Text, nullable=False)
 
 class TrajetoORM(Base):
     __tablename__ = "trajeto"
 
     idTrajeto = Column(Integer, primary_key=True, index=True)
-    comandosEnviados = Column(Text, nullable=False)
+    # Nulo quando o trajeto referencia um template (idTemplate).
+    comandosEnviados = Column(Text, nullable=True)
     comandosExecutados = Column(Text, nullable=True)
     status = Column(Boolean, nullable=True)
-    tempo = Column(Integer, nullable=True)
\ No newline at end of file
+    tempo = Column(Integer, nullable=True)
+    idTemplate = Column(Integer, ForeignKey("rota_template.idTemplate"), nullable=True, index=True)
+    deviceId = Column(String, nullable=True, index=True)
+    bateria = Column(Float, nullable=True)
+    tempoEstimado = Column(Integer, nullable=True)
+    traceId = Column(String(32), nullable=True, index=True)
+
+    template = relationship(RotaTemplateORM)
+
+    @property
+    def comandos(self) -> str:
+        """Comandos enviados, resolvidos a partir do template quando necessário."""
+        if self.comandosEnviados is not None or self.template is None:
+            return self.comandosEnviados
+        return self.template.comandos
+
+
+class TelemetriaORM(Base):
+    __tablename__ = "telemetria"
+    __table_args__ = (Index("ix_telemetria_device_timestamp", "deviceId", "timestamp"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    deviceId = Column(String, nullable=False)
+    timestamp = Column(BigInteger, nullable=False)
+    x = Column(Integer, nullable=False)
+    y = Column(Integer, nullable=False)
+    # Centigraus, 0–35999: não cabe em SMALLINT.
+    direcao = Column(Integer, nullable=False)
+    velocidade = Column(SmallInteger, nullable=False)
+    distanciaSensor = Column(Integer, nullable=False)
+
+
+class EventoTrajetoORM(Base):
+    """
+    Log só de acréscimo do ciclo de vida dos trajetos. ``minuto`` (ms // 60000)
+    particiona as linhas no tempo: o índice por minuto, tipo e faixa de
+    latência responde às consultas agregadas sem ler as linhas.
+    """
+    __tablename__ = "evento_trajeto"
+    __table_args__ = (Index("ix_evento_trajeto_minuto", "minuto", "tipo", "faixaLatencia"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    idTrajeto = Column(Integer, nullable=False)
+    deviceId = Column(String, nullable=True)
+    tipo = Column(String(16), nullable=False)
+    timestamp = Column(BigInteger, nullable=False)
+    minuto = Column(Integer, nullable=False)
+    latenciaMs = Column(Integer, nullable=True)
+    faixaLatencia = Column(SmallInteger, nullable=True)
+
+
+class OutboxORM(Base):
+    """Mensagem MQTT gravada na mesma transação do trajeto e publicada depois pelo OutboxRelay."""
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    qos = Column(SmallInteger, nullable=False, default=1)
+    retain = Column(Boolean, nullable=False, default=False)
+    deviceId = Column(String, nullable=True)
+    idTrajeto = Column(Integer, ForeignKey("trajeto.idTrajeto", ondelete="CASCADE"), nullable=True)
+    traceId = Column(String(32), nullable=True)
+    criadoEm = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    tentativas = Column(Integer, nullable=False, default=0)
+    # Nulo enquanto não houve falha: a mensagem pode sair imediatamente.
+    proximaTentativa = Column(DateTime(timezone=True), nullable=True)
+    erro = Column(Text, nullable=True)
+    enviadoEm = Column(DateTime(timezone=True), nullable=True)
+
+# Só as mensagens pendentes interessam ao relay; as enviadas ficam fora do índice.
+Index(
+    "ix_outbox_pendente", OutboxORM.id,
+    postgresql_where=OutboxORM.enviadoEm.is_(None),
+    sqlite_where=OutboxORM.enviadoEm.is_(None),
+)
+
+
+class GrupoORM(Base):
+    __tablename__ = "grupo"
+
+    idGrupo = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, nullable=False, unique=True)
+    # Grupo estático: lista de deviceIds. Grupo por tag: só ``tag`` preenchida.
+    dispositivos = Column(JSON(none_as_null=True), nullable=True)
+    tag = Column(String, nullable=True)
+
+    @property
+    def topico(self) -> str:
+        """Tópico de comandos assinado pelos membros do grupo."""
+        if self.tag is not None:
+            return f"tags/{self.tag}/commands"
+        return f"groups/{self.nome}/commands"
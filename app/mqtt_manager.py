@@ -1,32 +1,71 @@
 import os
 import json
-from typing import Dict, Optional, Any
+import time
+from typing import Mapping, Optional, Any, Union
 from gmqtt import Client as MQTTClient
 from app.database import SessionLocal
+from app.device_registry import DeviceRegistry
+from app.events import EventLog
+from app.publisher_pool import AckingClient, PublisherPool, client_stats
+from app.recorder import MessageRecorder
 from app.repositories.trajetos import TrajetoRepository
 from app.services.trajetos import TrajetoService
+from app.services.eta import DurationModel
+from app.tracing import Tracer, trace_id_from_properties
+from app.topic_router import Handler, TopicMessage, TopicRouter
 
 MQTT_HOST: str = os.getenv("MQTT_HOST", "mqtt")
 MQTT_PORT: int = int(os.getenv("MQTT_PORT", 1883))
 CLIENT_ID: str = "fastapi_gmqtt_client"
 
 class MQTTManager:
-    devices: Dict[str, dict]
-
-    def __init__(self, client_id: str = CLIENT_ID) -> None:
-        self.devices = {}
-        self.client: MQTTClient = MQTTClient(client_id)
+    def __init__(
+        self,
+        client_id: str = CLIENT_ID,
+        duration_model: Optional[DurationModel] = None,
+        tracer: Optional[Tracer] = None,
+        recorder: Optional[MessageRecorder] = None,
+        publisher_pool: Optional[PublisherPool] = None,
+        event_log: Optional[EventLog] = None
+    ) -> None:
+        self._devices = DeviceRegistry()
+        self.recorder = recorder
+        self.publisher_pool = publisher_pool
+        self.event_log = event_log
+        self.duration_model = duration_model
+        self.tracer = tracer if tracer is not None else Tracer(export_path=None)
+        self.connected = False
+        self.router = TopicRouter()
+        self.router.register("devices/+/status", self._on_status)
+        self.router.register("devices/+/trajeto", self._on_trajeto)
+        self.client: MQTTClient = AckingClient(client_id)
         self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
 
+    @property
+    def devices(self) -> DeviceRegistry:
+        """Último status de cada dispositivo, versionado."""
+        return self._devices
+
+    @devices.setter
+    def devices(self, devices: Mapping[str, dict]) -> None:
+        self._devices.replace(devices)
+
     async def connect(self, host: str = MQTT_HOST, port: int = MQTT_PORT) -> None:
         """Conecta o cliente MQTT ao broker."""
         await self.client.connect(host, port)
+        if self.publisher_pool is not None:
+            await self.publisher_pool.connect(host, port)
+            print(f"[MQTT] {len(self.publisher_pool.clients)} conexões de publicação abertas")
         print("[MQTT] Cliente conectado")
 
     async def disconnect(self) -> None:
         """Desconecta o cliente MQTT do broker."""
+        if self.publisher_pool is not None:
+            await self.publisher_pool.disconnect()
         await self.client.disconnect()
+        self.connected = False
         print("[MQTT] Cliente desconectado")
 
     def on_connect(
@@ -37,10 +76,29 @@ class MQTTManager:
         properties: Optional[Any] = None
     ) -> None:
         """Callback chamado quando o cliente se conecta ao broker."""
-        client.subscribe("devices/+/status")
-        client.subscribe("devices/+/trajeto")
+        self.connected = True
+        for topic_filter in self.router.filters():
+            client.subscribe(topic_filter)
         print("[MQTT] on_connect")
 
+    def on_disconnect(self, client: MQTTClient, packet: Any, exc: Optional[Exception] = None) -> None:
+        """
+        Callback chamado quando a conexão com o broker cai. O gmqtt reconecta
+        sozinho; até o próximo ``on_connect`` nada deve ser publicado.
+        """
+        self.connected = False
+        print("[MQTT] on_disconnect")
+
+    def register_handler(self, topic_filter: str, handler: Handler) -> None:
+        """
+        Registra um handler para um filtro de tópico (com ``+``/``#``). Se o
+        cliente já estiver conectado, a assinatura é feita na hora.
+        """
+        is_new = topic_filter not in self.router.filters()
+        self.router.register(topic_filter, handler)
+        if self.connected and is_new:
+            self.client.subscribe(topic_filter)
+
     def on_message(
         self,
         client: MQTTClient,
@@ -49,24 +107,25 @@ class MQTTManager:
         qos: int,
         properties: Optional[Any] = None
     ) -> None:
-        payload_str = payload.decode()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(topic, payload, qos)
+        self.router.dispatch(topic, payload, qos, properties)
 
-        parts = topic.split("/")
-        if len(parts) < 3 or parts[0] != "devices":
-            return
-
-        device_id, category = parts[1], parts[2]
+    def _on_status(self, message: TopicMessage) -> None:
+        self._handle_status(message.params[0], message.payload.decode())
 
-        if category == "status":
-            self._handle_status(device_id, payload_str)
-        elif category == "trajeto":
-            self._handle_trajeto(device_id, payload_str)
+    def _on_trajeto(self, message: TopicMessage) -> None:
+        self._handle_trajeto(
+            message.params[0], message.payload.decode(), trace_id_from_properties(message.properties)
+        )
 
     def _handle_status(self, device_id: str, payload_str: str):
         status_data = json.loads(payload_str)
         self.devices[device_id] = status_data
 
-    def _handle_trajeto(self, device_id: str, payload_str: str):
+    def _handle_trajeto(self, device_id: str, payload_str: str, trace_id: Optional[str] = None):
+        arrived = time.time_ns()
         print(f"[TRAJETO] {device_id}: {payload_str}")
 
         trajeto_data = json.loads(payload_str)
@@ -81,7 +140,20 @@ class MQTTManager:
         try:
             repo = TrajetoRepository(db)
             service = TrajetoService(repo)
-            service.update_trajeto(trajeto_id, trajeto_data)
+            trajeto = service.update_trajeto(trajeto_id, trajeto_data)
+            written = time.time_ns()
+            if self.event_log is not None:
+                self.event_log.completed(trajeto.idTrajeto, device_id, trajeto.status)
+
+            # Firmwares sem MQTT v5 não ecoam o trace id; o trajeto gravado o tem.
+            trace_id = trace_id or trajeto.traceId
+            published = self.tracer.end_of(trace_id, "publish")
+            if published is not None:
+                self.tracer.record(trace_id, "car", published, arrived, deviceId=device_id, tempo=trajeto.tempo)
+            self.tracer.record(trace_id, "result_write", arrived, written, idTrajeto=trajeto_id)
+
+            if self.duration_model is not None and trajeto.status and trajeto.tempo is not None:
+                self.duration_model.observe(trajeto.deviceId, trajeto.comandos, trajeto.bateria, trajeto.tempo)
 
         except Exception as e:
             print(f"[ERROR] falha ao processar trajeto via service: {e}")
@@ -94,14 +166,30 @@ class MQTTManager:
         device = self.devices.get(device_id)
         return device is not None and device.get("online") is True
 
+    def get_battery(self, device_id: str) -> Optional[float]:
+        """Último nível de bateria reportado pelo dispositivo."""
+        return self.devices.get(device_id, {}).get("battery")
+
+    def publisher_stats(self) -> list:
+        """Publicações, confirmações pendentes e backlog de cada conexão de publicação."""
+        if self.publisher_pool is not None:
+            return self.publisher_pool.stats()
+        return [client_stats(self.client)]
+
     def publish(
         self,
         topic: str,
-        message: str,
+        message: Union[str, bytes],
         qos: int = 0,
         retain: bool = False,
         **kwargs: Any
     ):
-        """Publica uma mensagem MQTT."""
+        """
+        Publica uma mensagem MQTT. Com o pool de publicação configurado, a
+        mensagem sai pela conexão do dispositivo do tópico. Retorna um future
+        resolvido na confirmação do broker (ver :class:`AckingClient`).
+        """
+        if self.publisher_pool is not None:
+            return self.publisher_pool.publish(topic, message, qos=qos, retain=retain, **kwargs)
         return self.client.publish(topic, message, qos=qos, retain=retain, **kwargs)
 
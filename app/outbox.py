@@ -0,0 +1,199 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.commands import COMPACT_ENCODING, encode_compact
+from app.exceptions.commands import InvalidComandosException
+from app.events import EventLog
+from app.models import OutboxORM
+from app.mqtt_manager import MQTTManager
+from app.publisher_pool import MQTT_PUBACK_TIMEOUT
+from app.repositories.outbox import OutboxRepository
+from app.tracing import Tracer, trace_property
+
+OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_MS", 1000)) / 1000
+OUTBOX_MAX_BACKOFF: float = float(os.getenv("OUTBOX_MAX_BACKOFF_S", 60))
+OUTBOX_RETENTION: float = float(os.getenv("OUTBOX_RETENTION_H", 24)) * 3600
+OUTBOX_PURGE_INTERVAL: float = 300
+
+
+class OutboxRelay:
+    """
+    Publica as mensagens pendentes do outbox em lotes e as marca como enviadas.
+
+    As rotas só gravam o trajeto e a mensagem na mesma transação e chamam
+    :meth:`wake`; a publicação acontece aqui, fora da requisição. Falhas são
+    reagendadas com backoff exponencial (até ``max_backoff`` segundos), e o
+    relay também varre o outbox a cada ``poll_interval`` para retomar o que
+    ficou pendente (ex.: broker fora do ar, reinício do processo). O lote é
+    publicado sem esperar mensagem a mensagem, e só o que o broker confirmou
+    em até ``ack_timeout`` segundos é marcado como enviado. A entrega é "pelo
+    menos uma vez": uma queda entre publicar e marcar reenvia o lote.
+
+    Comandos de trajeto para dispositivos que anunciam a codificação compacta
+    no status saem nela (:func:`app.commands.encode_compact`) quando ficam
+    menores; o outbox guarda sempre o texto expandido.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        mqtt_manager: MQTTManager,
+        tracer: Optional[Tracer] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        max_backoff: float = OUTBOX_MAX_BACKOFF,
+        retention: float = OUTBOX_RETENTION,
+        ack_timeout: float = MQTT_PUBACK_TIMEOUT,
+        event_log: Optional[EventLog] = None,
+    ):
+        self.session_factory = session_factory
+        self.mqtt_manager = mqtt_manager
+        self.tracer = tracer or mqtt_manager.tracer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.ack_timeout = ack_timeout
+        self.event_log = event_log
+        self.sent = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = time.monotonic()
+
+    def wake(self) -> None:
+        """Avisa que há mensagens novas no outbox."""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Encerra o laço após publicar o que ainda estiver pendente."""
+        self._stopping = True
+        self.wake()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # Lido antes do lote: um stop pedido durante o lote ainda ganha uma última passada.
+            stopping = self._stopping
+            try:
+                while await self.relay_once() >= self.batch_size:
+                    pass
+                if time.monotonic() - self._last_purge >= OUTBOX_PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    await asyncio.to_thread(self._purge)
+            except Exception as e:
+                print(f"[ERROR] falha no relay do outbox: {e}")
+
+            if stopping:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def relay_once(self) -> int:
+        """Publica um lote de mensagens pendentes. Retorna o tamanho do lote."""
+        if not self.mqtt_manager.connected:
+            return 0
+
+        mensagens = await asyncio.to_thread(self._fetch)
+        if not mensagens:
+            return 0
+
+        sent: List[int] = []
+        failed: List[Tuple[int, int, str, datetime]] = []
+        acks: Dict[asyncio.Future, OutboxORM] = {}
+        now = datetime.now(timezone.utc)
+
+        def fail(mensagem: OutboxORM, erro: str) -> None:
+            tentativas = mensagem.tentativas + 1
+            backoff = min(self.max_backoff, 2 ** (tentativas - 1))
+            failed.append((mensagem.id, tentativas, erro, now + timedelta(seconds=backoff)))
+            print(f"[ERROR] falha ao publicar mensagem {mensagem.id} do outbox em {mensagem.topic}: {erro}")
+
+        for mensagem in mensagens:
+            kwargs = {"user_property": trace_property(mensagem.traceId)} if mensagem.traceId else {}
+            if mensagem.retain:
+                kwargs["retain"] = True
+            try:
+                with self.tracer.span(mensagem.traceId, "publish", idTrajeto=mensagem.idTrajeto):
+                    ack = self.mqtt_manager.publish(mensagem.topic, self._encode(mensagem), qos=mensagem.qos, **kwargs)
+            except Exception as e:
+                fail(mensagem, str(e))
+            else:
+                if asyncio.isfuture(ack):
+                    acks[ack] = mensagem
+                else:
+                    sent.append(mensagem.id)
+
+        if acks:
+            await asyncio.wait(acks, timeout=self.ack_timeout)
+            for ack, mensagem in acks.items():
+                if not ack.done():
+                    fail(mensagem, "confirmação do broker não recebida")
+                elif ack.exception() is not None:
+                    fail(mensagem, str(ack.exception()))
+                else:
+                    sent.append(mensagem.id)
+
+        await asyncio.to_thread(self._mark, sent, failed, now)
+        if self.event_log is not None:
+            delivered = set(sent)
+            for mensagem in mensagens:
+                if mensagem.id in delivered and mensagem.idTrajeto is not None and not mensagem.retain:
+                    self.event_log.published(mensagem.idTrajeto, mensagem.deviceId)
+        self.sent += len(sent)
+        self.failed += len(failed)
+        return len(mensagens)
+
+    def _encode(self, mensagem: OutboxORM) -> bytes:
+        if mensagem.idTrajeto is None or mensagem.retain:
+            return mensagem.payload
+        status = self.mqtt_manager.devices.get(mensagem.deviceId) or {}
+        if COMPACT_ENCODING not in (status.get("encodings") or ()):
+            return mensagem.payload
+
+        comandos = bytes(mensagem.payload).decode().rpartition("i")[0]
+        try:
+            compact = encode_compact(comandos, mensagem.idTrajeto)
+        except InvalidComandosException:
+            return mensagem.payload
+        return compact if len(compact) < len(mensagem.payload) else mensagem.payload
+
+    def _fetch(self) -> List[OutboxORM]:
+        db = self.session_factory()
+        try:
+            return OutboxRepository(db).pending(datetime.now(timezone.utc), self.batch_size)
+        finally:
+            db.close()
+
+    def _mark(self, sent: List[int], failed: List[Tuple[int, int, str, datetime]], now: datetime) -> None:
+        db = self.session_factory()
+        try:
+            OutboxRepository(db).mark(sent, failed, now)
+        finally:
+            db.close()
+
+    def _purge(self) -> int:
+        db = self.session_factory()
+        try:
+            return OutboxRepository(db).purge(datetime.now(timezone.utc) - timedelta(seconds=self.retention))
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {"enviadas": self.sent, "falhas": self.failed}
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from types import CodeType, FrameType
+from typing import Callable, Dict, Optional
+
+PROFILE_INTERVAL: float = float(os.getenv("PROFILE_INTERVAL_MS", 10)) / 1000
+PROFILE_STORE_CAPACITY = 32
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem de pilhas de todas as threads do processo.
+
+    Uma thread daemon lê ``sys._current_frames()`` a cada ``interval``
+    segundos e conta as pilhas no formato "collapsed" (``thread;f1;f2 N``),
+    aceito por flamegraph.pl e speedscope. Nada é instrumentado: o custo fica
+    na thread de amostragem e não nas threads observadas.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._labels: Dict[CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self._stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+        return label
+
+    def _collapse(self, thread_name: str, frame: Optional[FrameType]) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":"))
+        return ";".join(reversed(labels))
+
+
+def to_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class ProfileStore:
+    """Guarda os perfis por requisição mais recentes, para consulta posterior."""
+
+    def __init__(self, capacity: int = PROFILE_STORE_CAPACITY):
+        self.capacity = capacity
+        self._profiles: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> str:
+        profile_id = os.urandom(6).hex()
+        with self._lock:
+            self._profiles[profile_id] = None
+            while len(self._profiles) > self.capacity:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def put(self, profile_id: str, collapsed: str) -> None:
+        with self._lock:
+            if profile_id in self._profiles:
+                self._profiles[profile_id] = collapsed
+
+    def get(self, profile_id: str) -> Optional[str]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que amostra o processo durante uma requisição quando ela
+    traz ``X-Profile: 1`` e um token de administrador válido. A resposta
+    recebe ``X-Profile-Id``; o resultado fica em ``GET /admin/profiles/{id}``.
+
+    A amostragem cobre o processo inteiro, então requisições concorrentes
+    também aparecem no perfil. Sem o header, o custo é uma busca nos headers.
+    """
+
+    def __init__(self, app, store: Callable[[], ProfileStore], is_admin: Callable[[Optional[str]], bool]):
+        self.app = app
+        self.store = store
+        self.is_admin = is_admin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        token = headers.get(ADMIN_TOKEN_HEADER)
+        if headers.get(PROFILE_HEADER) != b"1" or not self.is_admin(token.decode() if token else None):
+            return await self.app(scope, receive, send)
+
+        store = self.store()
+        profile_id = store.reserve()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            store.put(profile_id, to_collapsed(profiler.stop()))
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import struct
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from gmqtt import Client as MQTTClient, Message
+
+MQTT_PUBLISHER_POOL_SIZE: int = int(os.getenv("MQTT_PUBLISHER_POOL_SIZE", 0))
+MQTT_PUBACK_TIMEOUT: float = float(os.getenv("MQTT_PUBACK_TIMEOUT_S", 10))
+
+
+class PublishRefused(Exception):
+    """O broker recusou a publicação (PUBACK/PUBREC/PUBCOMP com reason code >= 0x80)."""
+
+    def __init__(self, mid: int, reason_code: int):
+        super().__init__(f"broker recusou a mensagem {mid} (reason code {reason_code:#04x})")
+        self.mid = mid
+        self.reason_code = reason_code
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Falhas de publicações que ninguém aguarda não devem virar aviso no log.
+    if not future.cancelled():
+        future.exception()
+
+
+class AckingClient(MQTTClient):
+    """
+    Cliente gmqtt cujo ``publish`` devolve um future resolvido (com o message
+    id) quando o broker confirma a entrega: PUBACK no QoS 1, PUBCOMP no QoS 2.
+    No QoS 0 o future é resolvido no envio.
+
+    As publicações não esperam umas pelas outras: até o ``receive maximum``
+    anunciado pelo broker ficam aguardando confirmação (:attr:`inflight`); as
+    que passam disso entram numa fila (:attr:`backlog`), enviada em ordem à
+    medida que as confirmações liberam a janela.
+
+    Uma confirmação com reason code de erro (>= 0x80) falha o future com
+    :class:`PublishRefused`. Se a conexão cai, as publicações aguardando
+    confirmação falham com ``ConnectionError`` e liberam seus message ids (o
+    outbox as reenvia); o backlog espera a reconexão e é enviado após o CONNACK.
+    """
+
+    def __init__(self, client_id: str, **kwargs: Any) -> None:
+        super().__init__(client_id, **kwargs)
+        self.published = 0
+        self.acked = 0
+        self.refused = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._backlog: Deque[Tuple[Message, asyncio.Future]] = deque()
+        self._refusals: Dict[int, int] = {}
+        self._offline = False
+        # O gmqtt libera o message id sem olhar o reason code do PUBACK (e, no
+        # PUBREC/PUBCOMP, sem repassá-lo): anota o código antes de delegar.
+        handler = self._package_handler
+        for name in ("_handle_puback_packet", "_handle_pubrec_packet", "_handle_pubcomp_packet"):
+            setattr(handler, name, self._noting_reason(getattr(handler, name)))
+        # Queda da conexão (DISCONNECT do broker ou sintético, do gmqtt) e CONNACK.
+        disconnected, connacked = handler._handle_disconnect_packet, handler._handle_connack_packet
+
+        def on_disconnect(cmd: int, packet: bytes) -> None:
+            self._release_pending()
+            disconnected(cmd, packet)
+
+        def on_connack(cmd: int, packet: bytes) -> None:
+            connacked(cmd, packet)
+            if len(packet) >= 2 and packet[1] == 0 and self.is_connected:
+                self._offline = False
+                self._drain_backlog()
+
+        handler._handle_disconnect_packet = on_disconnect
+        handler._handle_connack_packet = on_connack
+
+    def _noting_reason(self, handle):
+        def wrapper(cmd: int, packet: bytes) -> None:
+            if len(packet) > 2 and packet[2] >= 0x80:
+                (mid,) = struct.unpack("!H", packet[:2])
+                self._refusals[mid] = packet[2]
+            return handle(cmd, packet)
+        return wrapper
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def backlog(self) -> int:
+        return len(self._backlog)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Bytes já publicados que ainda estão no buffer de escrita do socket."""
+        connection = getattr(self, "_connection", None)
+        transport = getattr(connection, "_transport", None)
+        return transport.get_write_buffer_size() if transport is not None else 0
+
+    def publish(
+        self,
+        message_or_topic: Union[Message, str],
+        payload: Any = None,
+        qos: int = 0,
+        retain: bool = False,
+        **kwargs: Any
+    ) -> asyncio.Future:
+        message = message_or_topic
+        if not isinstance(message, Message):
+            message = Message(message_or_topic, payload, qos=qos, retain=retain, **kwargs)
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        self.published += 1
+        # Com fila, a mensagem entra atrás das outras para não furar a ordem.
+        if self._backlog or not self._send(message, future):
+            self._backlog.append((message, future))
+        return future
+
+    def _send(self, message: Message, future: asyncio.Future) -> bool:
+        """Envia a mensagem; ``False`` quando a janela de confirmações está cheia ou sem conexão."""
+        if self._offline:
+            return False
+        # Mesmo corpo de gmqtt.Client.publish, guardando o message id.
+        try:
+            mid, package = self._connection.publish(message)
+        except OverflowError:
+            return False
+        if message.qos > 0:
+            self._persistent_storage.push_message(mid, package)
+            self._pending[mid] = future
+        else:
+            future.set_result(mid)
+        return True
+
+    def _drain_backlog(self) -> None:
+        while self._backlog:
+            message, future = self._backlog[0]
+            try:
+                if not self._send(message, future):
+                    return
+            except Exception as e:
+                future.set_exception(e)
+            self._backlog.popleft()
+
+    def _remove_message_from_queue(self, mid: int) -> None:
+        super()._remove_message_from_queue(mid)
+        future = self._pending.pop(mid, None)
+        reason_code = self._refusals.pop(mid, None)
+        if future is not None:
+            if reason_code is not None:
+                self.refused += 1
+                if not future.done():
+                    future.set_exception(PublishRefused(mid, reason_code))
+            else:
+                self.acked += 1
+                if not future.done():
+                    future.set_result(mid)
+        self._drain_backlog()
+
+    def _release_pending(self) -> None:
+        """
+        Falha as publicações aguardando confirmação e libera seus message ids.
+
+        Sem isso, uma reconexão com sessão limpa (na qual o gmqtt descarta as
+        mensagens guardadas sem liberar os ids) prenderia a janela para sempre.
+        Elas também saem da fila de reenvio do gmqtt: quem publicou decide se
+        reenvia.
+        """
+        self._offline = True
+        pending, self._pending = self._pending, {}
+        self._refusals = {}
+        for mid, future in pending.items():
+            self._package_handler.id_generator.free_id(mid)
+            self._persistent_storage.remove_message_by_mid(mid)
+            if not future.done():
+                future.set_exception(ConnectionError("conexão MQTT perdida antes da confirmação"))
+
+    async def disconnect(self, reason_code: int = 0, **properties: Any) -> None:
+        await super().disconnect(reason_code, **properties)
+        self._release_pending()
+        backlog = [future for _, future in self._backlog]
+        self._backlog.clear()
+        for future in backlog:
+            if not future.done():
+                future.set_exception(ConnectionError("cliente MQTT desconectado antes da confirmação"))
+
+
+def client_stats(client: AckingClient) -> dict:
+    return {
+        "clientId": client._client_id,
+        "conectado": client.is_connected,
+        "publicadas": client.published,
+        "confirmadas": client.acked,
+        "recusadas": client.refused,
+        "inflight": client.inflight,
+        "backlog": client.backlog,
+        "bufferBytes": client.buffered_bytes,
+    }
+
+
+def affinity_key(topic: str) -> str:
+    """``devices/{id}/...`` usa o id do dispositivo; os demais tópicos usam o próprio tópico."""
+    levels = topic.split("/", 2)
+    if len(levels) >= 2 and levels[0] == "devices":
+        return levels[1]
+    return topic
+
+
+class PublisherPool:
+    """
+    Conexões MQTT dedicadas à publicação, cada uma com o seu client id.
+
+    Cada dispositivo é sempre publicado pela mesma conexão (hash estável do
+    id), o que preserva a ordem das mensagens por dispositivo; dispositivos
+    diferentes se espalham pelas conexões e pelas janelas de QoS 1 de cada uma.
+    """
+
+    def __init__(self, size: int, client_id_prefix: str, client_factory=AckingClient) -> None:
+        if size < 1:
+            raise ValueError("o pool precisa de pelo menos uma conexão")
+        self.clients: List[AckingClient] = [
+            client_factory(f"{client_id_prefix}-pub-{i}") for i in range(size)
+        ]
+
+    async def connect(self, host: str, port: int) -> None:
+        await asyncio.gather(*(client.connect(host, port) for client in self.clients))
+
+    async def disconnect(self) -> None:
+        await asyncio.gather(*(client.disconnect() for client in self.clients))
+
+    def client_for(self, key: str) -> AckingClient:
+        return self.clients[zlib.crc32(key.encode()) % len(self.clients)]
+
+    def publish(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int = 0,
+        retain: bool = False,
+        key: Optional[str] = None,
+        **kwargs: Any
+    ) -> asyncio.Future:
+        client = self.client_for(key if key is not None else affinity_key(topic))
+        return client.publish(topic, payload, qos=qos, retain=retain, **kwargs)
+
+    def stats(self) -> List[dict]:
+        return [client_stats(client) for client in self.clients]
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from app.exceptions.rate_limit import RateLimitExceededException
+
+DEVICE_RATE: float = float(os.getenv("RATE_LIMIT_DEVICE_RATE", 2))
+DEVICE_BURST: float = float(os.getenv("RATE_LIMIT_DEVICE_BURST", 5))
+GLOBAL_RATE: float = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", 50))
+GLOBAL_BURST: float = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", 100))
+SWEEP_INTERVAL: float = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 60))
+
+
+class RateLimiter:
+    """
+    Token bucket por dispositivo e global para comandos enviados aos carrinhos.
+
+    Cada chave guarda apenas ``(tokens, ultimo_instante)``; os tokens são
+    reabastecidos preguiçosamente a cada consulta. Um bucket que já estaria
+    cheio é indistinguível de um bucket novo, então chaves ociosas são
+    removidas periodicamente sem alterar o comportamento.
+    """
+
+    def __init__(
+        self,
+        device_rate: float = DEVICE_RATE,
+        device_burst: float = DEVICE_BURST,
+        global_rate: float = GLOBAL_RATE,
+        global_burst: float = GLOBAL_BURST,
+        sweep_interval: float = SWEEP_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._global: Tuple[float, float] = (global_burst, clock())
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _refill(bucket: Tuple[float, float], rate: float, burst: float, now: float) -> float:
+        tokens, last = bucket
+        return min(burst, tokens + (now - last) * rate)
+
+    def acquire(self, device_id: str, cost: float = 1.0) -> None:
+        """
+        Consome ``cost`` tokens do dispositivo e do bucket global.
+
+        Os tokens só são debitados se ambos os buckets tiverem saldo, para que
+        uma rejeição global não penalize o dispositivo.
+
+        Raises:
+            RateLimitExceededException: se algum dos buckets estiver vazio.
+        """
+        self.acquire_many([device_id], cost)
+
+    def acquire_many(self, device_ids: Iterable[str], cost: float = 1.0) -> None:
+        """
+        Consome ``cost`` tokens de cada dispositivo (``cost`` por ocorrência)
+        e o total correspondente do bucket global, tudo ou nada: se algum
+        bucket não tiver saldo, nenhum token é debitado.
+
+        Raises:
+            RateLimitExceededException: se algum dos buckets estiver vazio.
+        """
+        demand = Counter(device_ids)
+        with self._lock:
+            now = self._clock()
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+            tokens: Dict[str, float] = {}
+            wait = 0.0
+            message = ""
+            for device_id, count in demand.items():
+                bucket = self._buckets.get(device_id)
+                tokens[device_id] = (
+                    self.device_burst if bucket is None
+                    else self._refill(bucket, self.device_rate, self.device_burst, now)
+                )
+                if tokens[device_id] < cost * count:
+                    device_wait = self._wait_time(tokens[device_id], cost * count, self.device_rate)
+                    if device_wait > wait:
+                        wait, message = device_wait, f"Limite de comandos excedido para {device_id}"
+
+            total = cost * sum(demand.values())
+            global_tokens = self._refill(self._global, self.global_rate, self.global_burst, now)
+            if global_tokens < total:
+                global_wait = self._wait_time(global_tokens, total, self.global_rate)
+                if global_wait > wait:
+                    wait, message = global_wait, "Limite global de comandos excedido"
+
+            if wait > 0:
+                # Persiste o reabastecimento para não recalcular desde o início.
+                for device_id, device_tokens in tokens.items():
+                    self._buckets[device_id] = (device_tokens, now)
+                self._global = (global_tokens, now)
+                raise RateLimitExceededException(
+                    retry_after=wait,
+                    message=message,
+                )
+
+            for device_id, count in demand.items():
+                self._buckets[device_id] = (tokens[device_id] - cost * count, now)
+            self._global = (global_tokens - total, now)
+
+    @staticmethod
+    def _wait_time(tokens: float, cost: float, rate: float) -> float:
+        if rate <= 0:
+            return float("inf")
+        return (cost - tokens) / rate
+
+    def _sweep(self, now: float) -> None:
+        """Remove buckets que já teriam se reabastecido por completo."""
+        full_after = self.device_burst / self.device_rate if self.device_rate > 0 else None
+        if full_after is not None:
+            idle = [key for key, (_, last) in self._buckets.items() if now - last >= full_after]
+            for key in idle:
+                del self._buckets[key]
+        self._last_sweep = now
+
+    def remaining(self, device_id: str) -> Optional[float]:
+        """Tokens disponíveis para o dispositivo, ou None se não houver bucket ativo."""
+        with self._lock:
+            bucket = self._buckets.get(device_id)
+            if bucket is None:
+                return None
+            return self._refill(bucket, self.device_rate, self.device_burst, self._clock())
+
+    def __len__(self) -> int:
+        return len(self._buckets)
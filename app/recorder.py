@@ -0,0 +1,110 @@
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional
+
+MQTT_RECORD_FILE: Optional[str] = os.getenv("MQTT_RECORD_FILE") or None
+MQTT_RECORD_DIR: str = os.getenv("MQTT_RECORD_DIR", "recordings")
+
+MAGIC = b"MQREC1\n"
+# Registro: chegada (ns desde a época) u64 | qos u8 | tamanho do tópico u16 | tamanho do payload u32
+RECORD = struct.Struct("<QBHI")
+
+
+@dataclass(frozen=True)
+class RecordedMessage:
+    timestamp_ns: int
+    topic: str
+    payload: bytes
+    qos: int
+
+
+class MessageRecorder:
+    """
+    Grava cada mensagem MQTT recebida em um log binário só de acréscimo:
+    um cabeçalho de tamanho fixo seguido do tópico e do payload, sem
+    codificação extra. A escrita passa pelo buffer do arquivo e só vai ao
+    disco em blocos (ou em :meth:`close`).
+    """
+
+    def __init__(self, path: str, clock: Callable[[], int] = time.time_ns):
+        self.path = path
+        self.clock = clock
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file: Optional[BinaryIO] = open(path, "ab", buffering=1 << 16)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def record(self, topic: str, payload: bytes, qos: int) -> None:
+        topic_bytes = topic.encode()
+        header = RECORD.pack(self.clock(), qos, len(topic_bytes), len(payload))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(header)
+            self._file.write(topic_bytes)
+            self._file.write(payload)
+            self.messages += 1
+            self.bytes += RECORD.size + len(topic_bytes) + len(payload)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {"arquivo": self.path, "mensagens": self.messages, "bytes": self.bytes}
+
+
+def read_recording(path: str) -> Iterator[RecordedMessage]:
+    """Lê uma gravação; um registro final truncado (gravação interrompida) é ignorado."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} não é uma gravação MQTT")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, qos, topic_size, payload_size = RECORD.unpack(header)
+            topic = f.read(topic_size)
+            payload = f.read(payload_size)
+            if len(topic) < topic_size or len(payload) < payload_size:
+                return
+            yield RecordedMessage(timestamp, topic.decode(), payload, qos)
+
+
+def replay(
+    messages: Iterable[RecordedMessage],
+    on_message: Callable[[str, bytes, int], None],
+    speed: float = 0,
+) -> List[int]:
+    """
+    Entrega as mensagens a ``on_message`` respeitando os intervalos gravados
+    divididos por ``speed`` (``0`` entrega o mais rápido possível). Retorna a
+    latência de cada chamada, em ns.
+    """
+    latencies: List[int] = []
+    start = time.perf_counter_ns()
+    first: Optional[int] = None
+
+    for message in messages:
+        if speed > 0:
+            if first is None:
+                first = message.timestamp_ns
+            delay = start + (message.timestamp_ns - first) / speed - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+
+        before = time.perf_counter_ns()
+        on_message(message.topic, message.payload, message.qos)
+        latencies.append(time.perf_counter_ns() - before)
+
+    return latencies
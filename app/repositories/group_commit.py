@@ -0,0 +1,97 @@
+import asyncio
+import os
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models import TrajetoORM
+from app.repositories.trajetos import TrajetoRepository
+
+GROUP_COMMIT_MS: float = float(os.getenv("TRAJETO_GROUP_COMMIT_MS", 0))
+GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("TRAJETO_GROUP_COMMIT_MAX_BATCH", 256))
+
+
+class TrajetoGroupCommitter:
+    """
+    Agrupa criações de trajeto concorrentes em uma única transação.
+
+    A primeira requisição abre uma janela de ``window_ms``; todas as que chegam
+    durante a janela (ou até ``max_batch``) são gravadas com um único
+    INSERT ... RETURNING e um único commit, executados fora do event loop.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        window_ms: float = GROUP_COMMIT_MS,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+    ) -> None:
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    async def create(
+        self,
+        comandos_enviados: str,
+        device_id: Optional[str] = None,
+        bateria: Optional[float] = None,
+        tempo_estimado: Optional[int] = None,
+        trace_id: Optional[str] = None,
+    ) -> TrajetoORM:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        valores = {
+            "comandosEnviados": comandos_enviados,
+            "deviceId": device_id,
+            "bateria": bateria,
+            "tempoEstimado": tempo_estimado,
+            "traceId": trace_id,
+        }
+        self._pending.append((valores, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._commit(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            trajetos = await asyncio.to_thread(self._write, [valores for valores, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), trajeto in zip(batch, trajetos):
+            if not future.done():
+                future.set_result(trajeto)
+
+    def _write(self, valores: List[dict]) -> List[TrajetoORM]:
+        db = self.session_factory()
+        try:
+            return TrajetoRepository(db).create_many(valores)
+        finally:
+            db.close()
+
+    async def drain(self) -> None:
+        """Grava o lote pendente e aguarda os commits em andamento."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
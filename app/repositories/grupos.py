@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import GrupoORM
+from app.exceptions.grupos import GrupoAlreadyExistsException, GrupoNotFoundException
+from app.repositories.outbox import OutboxRepository
+
+class GrupoRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create(self, nome: str, dispositivos: Optional[List[str]] = None, tag: Optional[str] = None) -> GrupoORM:
+        """
+        Cria o grupo e, se for estático, enfileira no outbox (mesma transação)
+        a nova lista de grupos de cada membro.
+        """
+        stmt = (
+            insert(GrupoORM)
+            .values(nome=nome, dispositivos=dispositivos, tag=tag)
+            .returning(GrupoORM)
+        )
+        try:
+            grupo = self.db.scalars(stmt).one()
+        except IntegrityError:
+            self.db.rollback()
+            raise GrupoAlreadyExistsException()
+
+        if dispositivos:
+            OutboxRepository(self.db).add_memberships(self._memberships(dispositivos))
+        self.db.commit()
+        return grupo
+
+    def get(self, nome: str) -> GrupoORM:
+        grupo = self.db.scalars(select(GrupoORM).where(GrupoORM.nome == nome)).one_or_none()
+
+        if not grupo:
+            raise GrupoNotFoundException()
+
+        return grupo
+
+    def list_all(self) -> list[GrupoORM]:
+        return self.db.query(GrupoORM).all()
+
+    def delete(self, nome: str) -> None:
+        grupo = self.get(nome)
+        dispositivos = grupo.dispositivos
+        self.db.execute(delete(GrupoORM).where(GrupoORM.idGrupo == grupo.idGrupo))
+        if dispositivos:
+            OutboxRepository(self.db).add_memberships(self._memberships(dispositivos))
+        self.db.commit()
+
+    def _memberships(self, device_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Grupos estáticos de cada dispositivo, segundo o estado atual da transação."""
+        memberships: Dict[str, List[str]] = {device_id: [] for device_id in device_ids}
+        stmt = select(GrupoORM.nome, GrupoORM.dispositivos).where(GrupoORM.dispositivos.is_not(None))
+        for nome, dispositivos in self.db.execute(stmt):
+            for device_id in dispositivos:
+                if device_id in memberships:
+                    memberships[device_id].append(nome)
+        return memberships
@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from app.models import OutboxORM, TrajetoORM
+
+
+def command_topic(device_id: str) -> str:
+    return f"devices/{device_id}/commands"
+
+
+def membership_topic(device_id: str) -> str:
+    """Tópico retido com a lista de grupos estáticos do dispositivo."""
+    return f"devices/{device_id}/grupos"
+
+
+class OutboxRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_commands(self, trajetos: Iterable[TrajetoORM], comandos: Optional[str] = None) -> None:
+        """
+        Enfileira o comando de cada trajeto (``{comandos}i{idTrajeto}``) sem
+        fazer commit: as mensagens entram na transação de quem criou os trajetos.
+        ``comandos`` substitui ``comandosEnviados`` (trajetos de template).
+        """
+        rows = [
+            {
+                "topic": command_topic(t.deviceId),
+                "payload": f"{comandos or t.comandosEnviados}i{t.idTrajeto}".encode(),
+                "qos": 1,
+                "deviceId": t.deviceId,
+                "idTrajeto": t.idTrajeto,
+                "traceId": t.traceId,
+            }
+            for t in trajetos
+            if t.deviceId is not None
+        ]
+        if rows:
+            self.db.execute(insert(OutboxORM), rows)
+
+    def add_memberships(self, memberships: Dict[str, List[str]]) -> None:
+        """Enfileira, retida, a lista de grupos estáticos de cada dispositivo (sem commit)."""
+        rows = [
+            {
+                "topic": membership_topic(device_id),
+                "payload": json.dumps(grupos).encode(),
+                "qos": 1,
+                "retain": True,
+                "deviceId": device_id,
+            }
+            for device_id, grupos in memberships.items()
+        ]
+        if rows:
+            self.db.execute(insert(OutboxORM), rows)
+
+    def pending(self, now: datetime, limit: int) -> List[OutboxORM]:
+        stmt = (
+            select(OutboxORM)
+            .where(
+                OutboxORM.enviadoEm.is_(None),
+                or_(OutboxORM.proximaTentativa.is_(None), OutboxORM.proximaTentativa <= now),
+            )
+            .order_by(OutboxORM.id)
+            .limit(limit)
+        )
+        return list(self.db.scalars(stmt))
+
+    def mark(self, sent: List[int], failed: List[Tuple[int, int, str, datetime]], now: datetime) -> None:
+        """
+        Registra o resultado de um lote em uma única transação. ``failed`` traz
+        ``(id, tentativas, erro, proximaTentativa)`` de cada mensagem que falhou.
+        """
+        if sent:
+            self.db.execute(update(OutboxORM).where(OutboxORM.id.in_(sent)).values(enviadoEm=now))
+        if failed:
+            self.db.execute(update(OutboxORM), [
+                {"id": id_, "tentativas": tentativas, "erro": erro, "proximaTentativa": proxima}
+                for id_, tentativas, erro, proxima in failed
+            ])
+        self.db.commit()
+
+    def purge(self, before: datetime) -> int:
+        """Remove as mensagens enviadas antes de ``before``."""
+        result = self.db.execute(
+            delete(OutboxORM).where(OutboxORM.enviadoEm.is_not(None), OutboxORM.enviadoEm < before)
+        )
+        self.db.commit()
+        return result.rowcount
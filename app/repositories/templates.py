@@ -0,0 +1,29 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import RotaTemplateORM
+from app.exceptions.templates import TemplateNotFoundException
+
+class TemplateRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create(self, nome: str, comandos: str) -> RotaTemplateORM:
+        stmt = (
+            insert(RotaTemplateORM)
+            .values(nome=nome, comandos=comandos)
+            .returning(RotaTemplateORM)
+        )
+        template = self.db.scalars(stmt).one()
+        self.db.commit()
+        return template
+
+    def get(self, template_id: int) -> RotaTemplateORM:
+        template = self.db.get(RotaTemplateORM, template_id)
+
+        if not template:
+            raise TemplateNotFoundException()
+
+        return template
+
+    def list_all(self) -> list[RotaTemplateORM]:
+        return self.db.query(RotaTemplateORM).all()
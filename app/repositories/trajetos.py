@@ -1,24 +1,76 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
 from app.models import TrajetoORM
 from app.exceptions.trajetos import TrajetoNotFoundException
+from app.repositories.outbox import OutboxRepository
 
 class TrajetoRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create(self, comandos_enviados: str) -> TrajetoORM:
-        trajeto = TrajetoORM(comandosEnviados=comandos_enviados)
-        self.db.add(trajeto)
+    def create(
+        self,
+        comandos_enviados: str,
+        device_id: Optional[str] = None,
+        bateria: Optional[float] = None,
+        tempo_estimado: Optional[int] = None,
+        trace_id: Optional[str] = None,
+    ) -> TrajetoORM:
+        stmt = (
+            insert(TrajetoORM)
+            .values(
+                comandosEnviados=comandos_enviados,
+                deviceId=device_id,
+                bateria=bateria,
+                tempoEstimado=tempo_estimado,
+                traceId=trace_id,
+            )
+            .returning(TrajetoORM)
+        )
+        trajeto = self.db.scalars(stmt).one()
+        OutboxRepository(self.db).add_commands([trajeto])
         self.db.commit()
-        self.db.refresh(trajeto)
         return trajeto
 
+    def create_many(self, valores: list[dict], comandos: Optional[str] = None) -> list[TrajetoORM]:
+        """
+        Insere vários trajetos em uma única transação, na ordem recebida.
+        Os comandos dos trajetos com dispositivo entram no outbox na mesma transação.
+        """
+        if not valores:
+            return []
+
+        stmt = insert(TrajetoORM).returning(TrajetoORM, sort_by_parameter_order=True)
+        trajetos = list(self.db.scalars(stmt, valores))
+        OutboxRepository(self.db).add_commands(trajetos, comandos)
+        self.db.commit()
+        return trajetos
+
+    def create_for_template(self, template_id: int, valores: list[dict], comandos: str) -> list[TrajetoORM]:
+        """
+        Cria um trajeto por item de ``valores`` referenciando o template, em uma
+        única transação; ``comandos`` é o payload compilado enviado a cada dispositivo.
+        """
+        return self.create_many([{**v, "idTemplate": template_id} for v in valores], comandos)
+
     def update(self, trajeto_id: int, update_data: dict) -> TrajetoORM:
-        trajeto = self.get(trajeto_id)
-        for key, value in update_data.items():
-            setattr(trajeto, key, value)
+        if not update_data:
+            return self.get(trajeto_id)
+
+        stmt = (
+            update(TrajetoORM)
+            .where(TrajetoORM.idTrajeto == trajeto_id)
+            .values(**update_data)
+            .returning(TrajetoORM)
+        )
+        trajeto = self.db.scalars(stmt).one_or_none()
+
+        if not trajeto:
+            self.db.rollback()
+            raise TrajetoNotFoundException()
+
         self.db.commit()
-        self.db.refresh(trajeto)
         return trajeto
 
     def get(self, trajeto_id: int) -> TrajetoORM:
@@ -30,7 +82,9 @@ class TrajetoRepository:
         return trajeto
 
     def list_all(self) -> list[TrajetoORM]:
-        return self.db.query(TrajetoORM).all()
+        # A resposta lê ``comandos``, que recorre ao template quando o trajeto não
+        # guarda os próprios comandos: carrega os templates numa só consulta.
+        return self.db.query(TrajetoORM).options(selectinload(TrajetoORM.template)).all()
 
     def delete(self, trajeto_id: int) -> None:
         trajeto = self.get(trajeto_id)
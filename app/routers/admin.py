@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.dependencies import get_event_log, get_mqtt_manager, get_profile_store, get_telemetry_writer, require_admin
+from app.mqtt_manager import MQTTManager
+from app.telemetry import TelemetryWriter
+from app.events import EventLog
+from app.recorder import MQTT_RECORD_DIR, MessageRecorder
+from app.profiler import ProfileStore, SamplingProfiler, to_collapsed
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+_profile_lock = asyncio.Lock()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = Query(5, gt=0, le=60),
+    interval_ms: float = Query(10, ge=1, le=1000)
+):
+    """
+    Amostra as pilhas de todas as threads (event loop e callbacks MQTT
+    inclusos) durante ``seconds`` e retorna no formato collapsed, pronto
+    para flamegraph.pl ou speedscope.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="Já existe um profiling em andamento")
+
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stacks = profiler.stop()
+
+    return PlainTextResponse(to_collapsed(stacks), headers={"X-Profile-Samples": str(profiler.samples)})
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str, store: ProfileStore = Depends(get_profile_store)):
+    """Perfil de uma requisição feita com ``X-Profile: 1``."""
+    collapsed = store.get(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return collapsed
+
+@router.get("/mqtt/handlers")
+async def get_mqtt_handler_stats(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
+    """Filtros registrados no roteador de tópicos e o tempo gasto em cada handler."""
+    return mqtt_manager.router.stats()
+
+@router.get("/mqtt/publicadores")
+async def get_publisher_stats(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
+    """Conexões de publicação: mensagens publicadas, confirmadas, recusadas, aguardando PUBACK e bytes no buffer."""
+    return mqtt_manager.publisher_stats()
+
+@router.get("/telemetria")
+async def get_telemetry_stats(writer: TelemetryWriter = Depends(get_telemetry_writer)):
+    """Contadores do gravador de telemetria (recebidas, gravadas, descartadas, pendentes)."""
+    return writer.stats()
+
+@router.get("/eventos")
+async def get_event_log_stats(event_log: EventLog = Depends(get_event_log)):
+    """Contadores do log de eventos de trajeto (recebidos, gravados, descartados, pendentes)."""
+    return event_log.stats()
+
+@router.post("/mqtt/gravacao", status_code=201)
+async def start_recording(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
+    """
+    Passa a gravar todas as mensagens MQTT recebidas em ``MQTT_RECORD_DIR``,
+    para reprodução com ``python -m benchmarks.replay``.
+    """
+    if mqtt_manager.recorder is not None:
+        raise HTTPException(status_code=409, detail="Já existe uma gravação em andamento")
+
+    path = os.path.join(MQTT_RECORD_DIR, f"mqtt-{time.strftime('%Y%m%d-%H%M%S')}.rec")
+    mqtt_manager.recorder = MessageRecorder(path)
+    return mqtt_manager.recorder.stats()
+
+@router.delete("/mqtt/gravacao")
+async def stop_recording(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
+    recorder = mqtt_manager.recorder
+    if recorder is None:
+        raise HTTPException(status_code=404, detail="Nenhuma gravação em andamento")
+
+    mqtt_manager.recorder = None
+    recorder.close()
+    return recorder.stats()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.schemas import RelatorioDesvios, RelatorioEventos
+from app.dependencies import get_db
+from app.services.deviation import DeviationAnalyzer
+from app.services.eventos import GRANULARIDADES, EventStats
+from typing import Literal, Optional
+
+# Maior número de intervalos devolvidos por consulta (uma semana por minuto).
+MAX_BUCKETS = 7 * 24 * 60
+
+router = APIRouter(prefix="/analise", tags=["analise"])
+
+@router.get("/desvios", response_model=RelatorioDesvios)
+def get_desvios(
+    device_id: Optional[str] = None,
+    piores: int = Query(10, ge=0, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Compara comandos enviados e executados dos trajetos concluídos e
+    agrega as métricas de desvio por dispositivo.
+    """
+    return DeviationAnalyzer(db, piores=piores).analyze(device_id)
+
+def _utc(moment: datetime) -> datetime:
+    """Datas sem fuso são tratadas como UTC."""
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+@router.get("/eventos", response_model=RelatorioEventos)
+def get_eventos(
+    inicio: Optional[datetime] = Query(None, description="Padrão: uma hora antes de fim"),
+    fim: Optional[datetime] = Query(None, description="Padrão: agora"),
+    granularidade: Literal["minuto", "hora"] = "minuto",
+    tipo: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Trajetos despachados, publicados, concluídos e interrompidos por minuto
+    ou hora, com os percentis da latência desde o despacho.
+    """
+    fim = _utc(fim) if fim else datetime.now(timezone.utc)
+    inicio = _utc(inicio) if inicio else fim - timedelta(hours=1)
+    minutes = (fim - inicio).total_seconds() / 60
+    if minutes <= 0:
+        raise HTTPException(status_code=400, detail="inicio deve ser anterior a fim")
+    if minutes / GRANULARIDADES[granularidade] > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Intervalo longo demais: máximo de {MAX_BUCKETS} {granularidade}s")
+    return EventStats(db).throughput(inicio, fim, granularidade, tipo)
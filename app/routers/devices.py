@@ -1,19 +1,73 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from app.dependencies import get_mqtt_manager, MQTTManager
+from fastapi import APIRouter, Depends, Header, Query, Response, status, HTTPException
+from fastapi.responses import JSONResponse
+from app.dependencies import get_mqtt_manager, get_rate_limiter, MQTTManager
+from app.rate_limiter import RateLimiter
+from app.exceptions.rate_limit import RateLimitExceededException
+from app.schemas import BroadcastResponse
+from app.services.grupos import stop_fleet
+from typing import Optional
+
+VERSION_HEADER = "X-Devices-Version"
+COMPLETE_HEADER = "X-Devices-Complete"
 
 router = APIRouter(
     prefix="/devices",
     tags=["devices"]
 )
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 @router.get("/")
-async def get_all_devices(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
-    return mqtt_manager.devices
+async def get_all_devices(
+    since: Optional[int] = Query(None, ge=0, description="Versão já conhecida; retorna só o que mudou depois dela"),
+    if_none_match: Optional[str] = Header(None),
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager)
+):
+    """
+    Status de cada dispositivo. A versão do registro vai no ETag e em
+    ``X-Devices-Version``: com ``If-None-Match`` igual à versão atual a
+    resposta é 304, e com ``?since=<versão>`` só os dispositivos alterados
+    depois dela são retornados (ou o registro completo, sinalizado por
+    ``X-Devices-Complete``, quando o delta não é possível).
+    """
+    registry = mqtt_manager.devices
+    etag = f'"{registry.version}"'
+    headers = {"ETag": etag, VERSION_HEADER: str(registry.version)}
+
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if since is None:
+        return Response(registry.snapshot_json(), media_type="application/json", headers=headers)
+
+    changed, complete = registry.changed_since(since)
+    if complete:
+        headers[COMPLETE_HEADER] = "true"
+    return JSONResponse(changed, headers=headers)
+
+@router.post("/stop", response_model=BroadcastResponse)
+async def stop_all_devices(mqtt_manager: MQTTManager = Depends(get_mqtt_manager)):
+    """
+    Parada de emergência da frota: uma publicação em ``fleet/commands``, mais
+    uma por dispositivo online cujo firmware não assina tópicos de grupo.
+    """
+    try:
+        return stop_fleet(mqtt_manager)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Falha ao enviar comando MQTT para a frota: {e}"
+        )
 
 @router.post("/{device_id}/stop", status_code=status.HTTP_200_OK)
 async def stop_device(
     device_id: str,
-    mqtt_manager: MQTTManager = Depends(get_mqtt_manager)
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager),
+    rate_limiter: RateLimiter = Depends(get_rate_limiter)
 ):
     """
     Envia comando de parada para um carrinho específico via MQTT.
@@ -25,6 +79,11 @@ async def stop_device(
             detail=f"Dispositivo {device_id} não está online"
         )
 
+    try:
+        rate_limiter.acquire(device_id)
+    except RateLimitExceededException as e:
+        raise HTTPException(status_code=e.code, detail=e.message, headers=e.headers)
+
     topic = f"devices/{device_id}/commands"
     message = "STOP"
 
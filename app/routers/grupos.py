@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.schemas import BroadcastResponse, GrupoCreate, GrupoResponse
+from app.dependencies import get_db, get_mqtt_manager, get_outbox_relay
+from app.services.grupos import GrupoService
+from app.repositories.grupos import GrupoRepository
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.exceptions.grupos import GrupoAlreadyExistsException, GrupoNotFoundException
+from typing import List
+
+router = APIRouter(prefix="/grupos", tags=["grupos"])
+
+@router.post("/", response_model=GrupoResponse, status_code=status.HTTP_201_CREATED)
+async def create_grupo(
+    grupo: GrupoCreate,
+    db: Session = Depends(get_db),
+    outbox_relay: OutboxRelay = Depends(get_outbox_relay)
+):
+    """
+    Cria um grupo estático (lista de dispositivos) ou por tag. Os membros de
+    grupos estáticos recebem, pelo outbox, a lista retida dos seus grupos.
+    """
+    service = GrupoService(GrupoRepository(db))
+    try:
+        grupo_obj = service.create_grupo(grupo.nome, grupo.dispositivos, grupo.tag)
+    except GrupoAlreadyExistsException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+    outbox_relay.wake()
+    return grupo_obj
+
+@router.get("/", response_model=List[GrupoResponse])
+async def list_grupos(db: Session = Depends(get_db)):
+    service = GrupoService(GrupoRepository(db))
+    return service.list_grupos()
+
+@router.get("/{nome}", response_model=GrupoResponse)
+async def get_grupo(nome: str, db: Session = Depends(get_db)):
+    service = GrupoService(GrupoRepository(db))
+    try:
+        return service.get_grupo(nome)
+    except GrupoNotFoundException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+@router.delete("/{nome}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_grupo(
+    nome: str,
+    db: Session = Depends(get_db),
+    outbox_relay: OutboxRelay = Depends(get_outbox_relay)
+):
+    service = GrupoService(GrupoRepository(db))
+    try:
+        service.delete_grupo(nome)
+    except GrupoNotFoundException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+    outbox_relay.wake()
+
+@router.post("/{nome}/stop", response_model=BroadcastResponse)
+async def stop_grupo(
+    nome: str,
+    db: Session = Depends(get_db),
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager)
+):
+    """
+    Parada de emergência do grupo: uma publicação no tópico do grupo, mais uma
+    por membro que ainda não o assina. Não passa pelo rate limiter.
+    """
+    service = GrupoService(GrupoRepository(db))
+    try:
+        return service.stop_grupo(nome, mqtt_manager)
+    except GrupoNotFoundException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Falha ao enviar comando MQTT para o grupo {nome}: {e}")
@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.schemas import RotaTemplateCreate, RotaTemplateDispatch, RotaTemplateResponse, TrajetoResponse
+from app.dependencies import (
+    get_db, get_mqtt_manager, get_rate_limiter, get_template_cache, get_duration_model, get_tracer,
+    get_outbox_relay, get_event_log
+)
+from app.services.templates import TemplateCache, TemplateService
+from app.repositories.templates import TemplateRepository
+from app.repositories.trajetos import TrajetoRepository
+from app.mqtt_manager import MQTTManager
+from app.rate_limiter import RateLimiter
+from app.services.eta import DurationModel
+from app.outbox import OutboxRelay
+from app.events import EventLog
+from app.tracing import Tracer
+from app.exceptions.commands import InvalidComandosException
+from app.exceptions.templates import TemplateNotFoundException
+from app.exceptions.rate_limit import RateLimitExceededException
+from typing import List
+import time
+
+router = APIRouter(prefix="/templates", tags=["templates"])
+
+@router.post("/", response_model=RotaTemplateResponse, status_code=status.HTTP_201_CREATED)
+async def create_template(
+    template: RotaTemplateCreate,
+    db: Session = Depends(get_db),
+    cache: TemplateCache = Depends(get_template_cache)
+):
+    service = TemplateService(TemplateRepository(db), cache)
+    try:
+        return service.create_template(template.nome, template.comandos)
+    except InvalidComandosException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+@router.get("/", response_model=List[RotaTemplateResponse])
+async def list_templates(
+    db: Session = Depends(get_db),
+    cache: TemplateCache = Depends(get_template_cache)
+):
+    service = TemplateService(TemplateRepository(db), cache)
+    return service.list_templates()
+
+@router.get("/{template_id}", response_model=RotaTemplateResponse)
+async def get_template(
+    template_id: int,
+    db: Session = Depends(get_db),
+    cache: TemplateCache = Depends(get_template_cache)
+):
+    service = TemplateService(TemplateRepository(db), cache)
+    try:
+        return service.get_template(template_id)
+    except TemplateNotFoundException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+@router.post("/{template_id}/dispatch", response_model=List[TrajetoResponse], status_code=status.HTTP_201_CREATED)
+async def dispatch_template(
+    template_id: int,
+    dispatch: RotaTemplateDispatch,
+    db: Session = Depends(get_db),
+    cache: TemplateCache = Depends(get_template_cache),
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager),
+    rate_limiter: RateLimiter = Depends(get_rate_limiter),
+    duration_model: DurationModel = Depends(get_duration_model),
+    tracer: Tracer = Depends(get_tracer),
+    outbox_relay: OutboxRelay = Depends(get_outbox_relay),
+    event_log: EventLog = Depends(get_event_log)
+):
+    """
+    Cria um trajeto por dispositivo referenciando o template e enfileira no
+    outbox o payload compilado (em cache) para cada um, na mesma transação.
+    """
+    offline = [d for d in dispatch.devices if not mqtt_manager.is_device_online(d)]
+    if offline:
+        raise HTTPException(status_code=400, detail=f"Dispositivos não estão online: {', '.join(offline)}")
+
+    service = TemplateService(TemplateRepository(db), cache)
+    try:
+        payload = service.get_payload(template_id)
+    except TemplateNotFoundException as e:
+        raise HTTPException(status_code=e.code, detail=e.message)
+
+    try:
+        rate_limiter.acquire_many(dispatch.devices)
+    except RateLimitExceededException as e:
+        raise HTTPException(status_code=e.code, detail=e.message, headers=e.headers)
+
+    valores = []
+    for device_id in dispatch.devices:
+        bateria = mqtt_manager.get_battery(device_id)
+        valores.append({
+            "deviceId": device_id,
+            "bateria": bateria,
+            "tempoEstimado": duration_model.predict(device_id, payload, bateria),
+            "traceId": tracer.new_trace_id(),
+        })
+
+    start = time.time_ns()
+    trajetos = service.create_trajetos(TrajetoRepository(db), template_id, valores)
+    end = time.time_ns()
+
+    for device_id, trajeto_obj in zip(dispatch.devices, trajetos):
+        # O insert é compartilhado; cada trace recebe o mesmo span.
+        tracer.record(trajeto_obj.traceId, "db_insert", start, end, deviceId=device_id, lote=len(trajetos))
+
+    event_log.dispatched(trajetos)
+    outbox_relay.wake()
+    return trajetos
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.dependencies import get_tracer
+from app.tracing import Tracer
+from typing import List
+
+router = APIRouter(prefix="/traces", tags=["traces"])
+
+@router.get("/", response_model=List[str])
+async def list_traces(
+    limit: int = Query(100, ge=1, le=10_000),
+    tracer: Tracer = Depends(get_tracer)
+):
+    """Trace ids mais recentes, do mais novo para o mais antigo."""
+    return tracer.recent(limit)
+
+@router.get("/{trace_id}")
+async def get_trace(trace_id: str, tracer: Tracer = Depends(get_tracer)):
+    """
+    Linha do tempo de um despacho: db_insert, publish, car e result_write,
+    ordenados pelo início.
+    """
+    spans = tracer.get(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace não encontrado")
+    return spans
@@ -1,12 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.schemas import TrajetoResponse, TrajetoCreate
-from app.dependencies import get_db, get_mqtt_manager
+from app.schemas import TrajetoResponse, TrajetoCreate, EtaRequest, EtaResponse
+from app.dependencies import (
+    get_db, get_mqtt_manager, get_rate_limiter, get_group_committer, get_duration_model, get_tracer,
+    get_outbox_relay, get_event_log
+)
 from app.services.trajetos import TrajetoService
 from app.repositories.trajetos import TrajetoRepository
+from app.repositories.group_commit import TrajetoGroupCommitter
 from app.mqtt_manager import MQTTManager
 from app.exceptions.trajetos import TrajetoNotFoundException
-from typing import List
+from app.exceptions.rate_limit import RateLimitExceededException
+from app.rate_limiter import RateLimiter
+from app.services.eta import DurationModel
+from app.outbox import OutboxRelay
+from app.events import EventLog
+from app.tracing import Tracer
+from typing import List, Optional
 
 router = APIRouter(prefix="/trajetos", tags=["trajetos"])
 
@@ -15,24 +25,61 @@ async def create_trajeto(
     device_id: str,
     trajeto: TrajetoCreate,
     db: Session = Depends(get_db),
-    mqtt_manager: MQTTManager = Depends(get_mqtt_manager)
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager),
+    rate_limiter: RateLimiter = Depends(get_rate_limiter),
+    group_committer: Optional[TrajetoGroupCommitter] = Depends(get_group_committer),
+    duration_model: DurationModel = Depends(get_duration_model),
+    tracer: Tracer = Depends(get_tracer),
+    outbox_relay: OutboxRelay = Depends(get_outbox_relay),
+    event_log: EventLog = Depends(get_event_log)
 ):
+    """
+    Grava o trajeto e o comando MQTT no outbox em uma única transação; a
+    publicação fica a cargo do relay do outbox.
+    """
     if not mqtt_manager.is_device_online(device_id):
         raise HTTPException(status_code=400, detail=f"Dispositivo {device_id} não está online")
 
-    service = TrajetoService(TrajetoRepository(db))
-    trajeto_obj = service.create_trajeto(trajeto.comandosEnviados)
+    try:
+        rate_limiter.acquire(device_id)
+    except RateLimitExceededException as e:
+        raise HTTPException(status_code=e.code, detail=e.message, headers=e.headers)
 
-    topic = f"devices/{device_id}/commands"
-    message = f"{trajeto.comandosEnviados}i{trajeto_obj.idTrajeto}"
+    bateria = mqtt_manager.get_battery(device_id)
+    tempo_estimado = duration_model.predict(device_id, trajeto.comandosEnviados, bateria)
 
-    try:
-        mqtt_manager.publish(topic, message, qos=1)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Falha ao enviar comandos MQTT: {e}")
+    trace_id = tracer.new_trace_id()
+
+    with tracer.span(trace_id, "db_insert", deviceId=device_id):
+        if group_committer is not None:
+            trajeto_obj = await group_committer.create(
+                trajeto.comandosEnviados, device_id, bateria, tempo_estimado, trace_id
+            )
+        else:
+            service = TrajetoService(TrajetoRepository(db))
+            trajeto_obj = service.create_trajeto(
+                trajeto.comandosEnviados, device_id, bateria, tempo_estimado, trace_id
+            )
 
+    event_log.dispatched([trajeto_obj])
+    outbox_relay.wake()
     return trajeto_obj
 
+@router.post("/{device_id}/eta", response_model=EtaResponse)
+async def predict_eta(
+    device_id: str,
+    request: EtaRequest,
+    mqtt_manager: MQTTManager = Depends(get_mqtt_manager),
+    duration_model: DurationModel = Depends(get_duration_model)
+):
+    """
+    Estima o tempo de execução dos comandos no dispositivo, sem enviá-los.
+    """
+    tempo_estimado, modelo = duration_model.predict_with_source(
+        device_id, request.comandosEnviados, mqtt_manager.get_battery(device_id)
+    )
+    return EtaResponse(deviceId=device_id, tempoEstimado=tempo_estimado, modelo=modelo)
+
 @router.get("/", response_model=List[TrajetoResponse])
 async def list_trajetos(db: Session = Depends(get_db)):
     service = TrajetoService(TrajetoRepository(db))
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import AliasChoices, BaseModel, Field, model_validator
+from datetime import datetime
+from typing import Dict, List, Optional
 
 
 class TrajetoCreate(BaseModel):
@@ -23,11 +24,123 @@ class TrajetoUpdate(BaseModel):
 
 class TrajetoResponse(BaseModel):
     idTrajeto: int
-    comandosEnviados: str
+    comandosEnviados: str = Field(validation_alias=AliasChoices("comandos", "comandosEnviados"))
     comandosExecutados: Optional[str]
     status: Optional[bool]
     tempo: Optional[int]
+    idTemplate: Optional[int] = None
+    deviceId: Optional[str] = None
+    tempoEstimado: Optional[int] = Field(None, description="Estimated execution time in milliseconds")
+    traceId: Optional[str] = None
 
     model_config = {
         "from_attributes": True
-    }
\ No newline at end of file
+    }
+
+class EtaRequest(BaseModel):
+    comandosEnviados: str = Field(..., min_length=1, description="Command string sent to ESP32")
+
+class EtaResponse(BaseModel):
+    deviceId: str
+    tempoEstimado: int = Field(..., description="Estimated execution time in milliseconds")
+    modelo: str = Field(..., description="dispositivo, global ou nominal")
+
+class RotaTemplateCreate(BaseModel):
+    nome: str = Field(..., min_length=1, description="Nome do template")
+    comandos: str = Field(..., min_length=1, description="Command string sent to ESP32")
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                { "nome": "Ronda do pátio", "comandos": "a1000da0001e" }
+            ]
+        }
+    }
+
+class RotaTemplateResponse(BaseModel):
+    idTemplate: int
+    nome: str
+    comandos: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class RotaTemplateDispatch(BaseModel):
+    devices: List[str] = Field(..., min_length=1, description="Dispositivos que receberão o trajeto")
+
+# Nomes de grupo e tags viram um nível de tópico MQTT.
+TOPIC_LEVEL_PATTERN = r"^[A-Za-z0-9_-]+$"
+
+class GrupoCreate(BaseModel):
+    nome: str = Field(..., pattern=TOPIC_LEVEL_PATTERN, description="Nome do grupo")
+    dispositivos: Optional[List[str]] = Field(None, min_length=1, description="Membros de um grupo estático")
+    tag: Optional[str] = Field(None, pattern=TOPIC_LEVEL_PATTERN, description="Tag anunciada pelos membros")
+
+    @model_validator(mode="after")
+    def check_membership(self):
+        if (self.dispositivos is None) == (self.tag is None):
+            raise ValueError("Informe exatamente um entre dispositivos e tag")
+        return self
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                { "nome": "patio", "dispositivos": ["esp32-1", "esp32-2"] },
+                { "nome": "galpao-a", "tag": "galpao-a" }
+            ]
+        }
+    }
+
+class GrupoResponse(BaseModel):
+    idGrupo: int
+    nome: str
+    dispositivos: Optional[List[str]]
+    tag: Optional[str]
+    topico: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class BroadcastResponse(BaseModel):
+    topico: str
+    viaTopico: int = Field(..., description="Membros online alcançados pela publicação no tópico do grupo")
+    individuais: List[str] = Field(..., description="Membros que receberam o comando no próprio tópico")
+
+class DesvioDispositivo(BaseModel):
+    trajetos: int
+    desviados: int
+    taxaDesvio: float
+    distanciaEdicaoMedia: float
+    faltaDistanciaMedia: float
+    faltaDistanciaMaxima: int
+    razaoTempoMedia: Optional[float]
+    razaoTempoP95: Optional[float]
+
+class DesvioTrajeto(BaseModel):
+    idTrajeto: int
+    deviceId: Optional[str]
+    distanciaEdicao: int
+    faltaDistancia: int
+    razaoTempo: Optional[float]
+
+class RelatorioDesvios(BaseModel):
+    trajetos: int
+    desviados: int
+    porDispositivo: Dict[str, DesvioDispositivo]
+    piores: List[DesvioTrajeto]
+
+class EventoBucket(BaseModel):
+    inicio: datetime
+    tipo: str = Field(..., description="despachado, publicado, concluido ou interrompido")
+    total: int
+    latenciaP50Ms: Optional[float] = Field(None, description="Latência desde o despacho (ms)")
+    latenciaP90Ms: Optional[float] = None
+    latenciaP99Ms: Optional[float] = None
+
+class RelatorioEventos(BaseModel):
+    granularidade: str
+    inicio: datetime
+    fim: datetime
+    buckets: List[EventoBucket]
@@ -0,0 +1,292 @@
+"""
+Análise de desvio entre comandos enviados e executados.
+
+Os trajetos são lidos em blocos colunares (paginação por chave em
+``idTrajeto``) e as métricas são calculadas por bloco com NumPy:
+
+- ``distanciaEdicao``: distância de edição (Levenshtein) no nível de comando;
+- ``faltaDistancia``: unidades de avanço enviadas e não executadas;
+- ``razaoTempo``: ``tempo`` real dividido pelo tempo nominal dos comandos.
+
+Uso como comando:
+    python -m app.services.deviation --database-url sqlite:///dados.db
+"""
+import argparse
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.commands import MS_PER_DISTANCE_UNIT, MS_PER_TURN, TOKEN_PATTERN
+from app.models import RotaTemplateORM, TrajetoORM
+
+CHUNK_SIZE = 50_000
+EDIT_BATCH_SIZE = 4_096
+SEM_DISPOSITIVO = ""
+
+_TURN_CODES = {"d": 1, "e": 2}
+_DISTANCE_OFFSET = 3
+
+
+@lru_cache(maxsize=65_536)
+def encode_commands(comandos: str) -> Tuple[np.ndarray, int, int]:
+    """
+    Codifica a string como inteiros comparáveis (um por comando) e retorna
+    também a distância total e o número de giros. Rotas se repetem muito,
+    então o resultado fica em cache por string.
+    """
+    codes = []
+    distance = 0
+    turns = 0
+    for digits, turn in TOKEN_PATTERN.findall(comandos):
+        if digits:
+            value = int(digits)
+            codes.append(_DISTANCE_OFFSET + value)
+            distance += value
+        else:
+            codes.append(_TURN_CODES[turn])
+            turns += 1
+    return np.asarray(codes, dtype=np.int32), distance, turns
+
+
+def _pad(sequences: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+    width = int(lengths.max(initial=0))
+    padded = np.full((len(sequences), width), -1, dtype=np.int32)
+    if width:
+        padded[np.arange(width) < lengths[:, None]] = np.concatenate(sequences)
+    return padded, lengths
+
+
+def batch_edit_distance(
+    sources: List[np.ndarray], targets: List[np.ndarray], batch_size: int = EDIT_BATCH_SIZE
+) -> np.ndarray:
+    """
+    Distância de edição entre pares de sequências, vetorizada sobre os pares.
+
+    Os pares são ordenados por tamanho e processados em lotes, para que uma
+    rota longa não faça o bloco inteiro ser preenchido até o seu tamanho.
+    """
+    sizes = np.fromiter((len(a) + len(b) for a, b in zip(sources, targets)), dtype=np.int64, count=len(sources))
+    order = np.argsort(sizes, kind="stable")
+    result = np.empty(len(sources), dtype=np.int64)
+    for start in range(0, len(order), batch_size):
+        index = order[start:start + batch_size]
+        result[index] = _edit_distance_batch([sources[i] for i in index], [targets[i] for i in index])
+    return result
+
+
+def _edit_distance_batch(sources: List[np.ndarray], targets: List[np.ndarray]) -> np.ndarray:
+    """
+    Percorre apenas as linhas da matriz de programação dinâmica; cada linha é
+    calculada para todos os pares de uma vez. A dependência da inserção
+    (``cur[j - 1] + 1``) é resolvida com ``minimum.accumulate``, já que
+    ``cur[j] = min_k(cand[k] + j - k)``.
+    """
+    a, len_a = _pad(sources)
+    b, len_b = _pad(targets)
+    n, width = len(sources), b.shape[1]
+    columns = np.arange(width + 1, dtype=np.int64)
+    rows = np.arange(n)
+
+    result = np.where(len_a == 0, len_b, 0)
+    prev = np.broadcast_to(columns, (n, width + 1)).copy()
+
+    for i in range(1, a.shape[1] + 1):
+        cost = (b != a[:, i - 1:i]).astype(np.int64)
+        cand = np.empty_like(prev)
+        cand[:, 0] = i
+        cand[:, 1:] = np.minimum(prev[:, 1:] + 1, prev[:, :-1] + cost)
+        cur = np.minimum.accumulate(cand - columns, axis=1) + columns
+
+        done = len_a == i
+        result[done] = cur[rows[done], len_b[done]]
+        prev = cur
+
+    return result
+
+
+@dataclass
+class _DeviceAccumulator:
+    trajetos: int = 0
+    desviados: int = 0
+    soma_edicao: int = 0
+    soma_falta: int = 0
+    max_falta: int = 0
+    razoes: List[np.ndarray] = field(default_factory=list)
+
+
+class DeviationAnalyzer:
+    def __init__(self, db: Session, chunk_size: int = CHUNK_SIZE, piores: int = 10):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.piores = piores
+
+    def iter_chunks(self, device_id: Optional[str] = None) -> Iterator[Dict[str, list]]:
+        """Lê trajetos concluídos em blocos colunares, em ordem de ``idTrajeto``."""
+        comandos = func.coalesce(TrajetoORM.comandosEnviados, RotaTemplateORM.comandos)
+        stmt = (
+            select(
+                TrajetoORM.idTrajeto,
+                TrajetoORM.deviceId,
+                comandos,
+                TrajetoORM.comandosExecutados,
+                TrajetoORM.tempo,
+            )
+            .outerjoin(RotaTemplateORM, TrajetoORM.idTemplate == RotaTemplateORM.idTemplate)
+            .where(TrajetoORM.comandosExecutados.is_not(None), TrajetoORM.tempo.is_not(None))
+            .order_by(TrajetoORM.idTrajeto)
+            .limit(self.chunk_size)
+        )
+        if device_id is not None:
+            stmt = stmt.where(TrajetoORM.deviceId == device_id)
+
+        last_id = 0
+        while True:
+            rows = self.db.execute(stmt.where(TrajetoORM.idTrajeto > last_id)).all()
+            if not rows:
+                return
+            ids, devices, enviados, executados, tempos = zip(*rows)
+            yield {
+                "idTrajeto": ids,
+                "deviceId": devices,
+                "comandosEnviados": enviados,
+                "comandosExecutados": executados,
+                "tempo": tempos,
+            }
+            last_id = ids[-1]
+
+    @staticmethod
+    def compute_chunk(chunk: Dict[str, list]) -> Dict[str, np.ndarray]:
+        """Calcula as métricas por trajeto de um bloco."""
+        sent = [encode_commands(c or "") for c in chunk["comandosEnviados"]]
+        executed = [encode_commands(c) for c in chunk["comandosExecutados"]]
+
+        sent_distance = np.fromiter((s[1] for s in sent), dtype=np.int64, count=len(sent))
+        sent_turns = np.fromiter((s[2] for s in sent), dtype=np.int64, count=len(sent))
+        executed_distance = np.fromiter((e[1] for e in executed), dtype=np.int64, count=len(executed))
+        tempo = np.asarray(chunk["tempo"], dtype=np.float64)
+
+        expected = sent_distance * MS_PER_DISTANCE_UNIT + sent_turns * MS_PER_TURN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(expected > 0, tempo / expected, np.nan)
+
+        return {
+            "idTrajeto": np.asarray(chunk["idTrajeto"], dtype=np.int64),
+            "distanciaEdicao": batch_edit_distance([s[0] for s in sent], [e[0] for e in executed]),
+            "faltaDistancia": sent_distance - executed_distance,
+            "razaoTempo": ratio,
+        }
+
+    def analyze(self, device_id: Optional[str] = None) -> dict:
+        devices: Dict[str, _DeviceAccumulator] = {}
+        worst_ids = np.empty(0, dtype=np.int64)
+        worst_devices = np.empty(0, dtype=object)
+        worst_edit = np.empty(0, dtype=np.int64)
+        worst_falta = np.empty(0, dtype=np.int64)
+        worst_ratio = np.empty(0, dtype=np.float64)
+
+        for chunk in self.iter_chunks(device_id):
+            metrics = self.compute_chunk(chunk)
+            edit = metrics["distanciaEdicao"]
+            falta = metrics["faltaDistancia"]
+            ratio = metrics["razaoTempo"]
+
+            labels = np.asarray([d or SEM_DISPOSITIVO for d in chunk["deviceId"]], dtype=object)
+            names, inverse = np.unique(labels, return_inverse=True)
+            counts = np.bincount(inverse)
+            deviated = np.bincount(inverse, weights=edit > 0)
+            edit_sum = np.bincount(inverse, weights=edit)
+            falta_sum = np.bincount(inverse, weights=falta)
+            falta_max = np.full(len(names), np.iinfo(np.int64).min)
+            np.maximum.at(falta_max, inverse, falta)
+
+            ratios_by_device = np.split(ratio[np.argsort(inverse, kind="stable")], np.cumsum(counts)[:-1])
+
+            for index, name in enumerate(names):
+                acc = devices.setdefault(name, _DeviceAccumulator())
+                acc.trajetos += int(counts[index])
+                acc.desviados += int(deviated[index])
+                acc.soma_edicao += int(edit_sum[index])
+                acc.soma_falta += int(falta_sum[index])
+                acc.max_falta = max(acc.max_falta, int(falta_max[index]))
+                acc.razoes.append(ratios_by_device[index])
+
+            if self.piores <= 0:
+                continue
+            worst_ids = np.concatenate([worst_ids, metrics["idTrajeto"]])
+            worst_devices = np.concatenate([worst_devices, labels])
+            worst_edit = np.concatenate([worst_edit, edit])
+            worst_falta = np.concatenate([worst_falta, falta])
+            worst_ratio = np.concatenate([worst_ratio, ratio])
+            if len(worst_ids) > self.piores:
+                keep = np.argpartition(-worst_edit, self.piores - 1)[:self.piores]
+                worst_ids, worst_devices = worst_ids[keep], worst_devices[keep]
+                worst_edit, worst_falta, worst_ratio = worst_edit[keep], worst_falta[keep], worst_ratio[keep]
+
+        order = np.lexsort((worst_ids, -worst_edit))
+        return {
+            "trajetos": sum(acc.trajetos for acc in devices.values()),
+            "desviados": sum(acc.desviados for acc in devices.values()),
+            "porDispositivo": {
+                name: self._summarize(acc) for name, acc in sorted(devices.items())
+            },
+            "piores": [
+                {
+                    "idTrajeto": int(worst_ids[i]),
+                    "deviceId": worst_devices[i] or None,
+                    "distanciaEdicao": int(worst_edit[i]),
+                    "faltaDistancia": int(worst_falta[i]),
+                    "razaoTempo": _finite(worst_ratio[i]),
+                }
+                for i in order
+            ],
+        }
+
+    @staticmethod
+    def _summarize(acc: _DeviceAccumulator) -> dict:
+        ratios = np.concatenate(acc.razoes)
+        ratios = ratios[~np.isnan(ratios)]
+        return {
+            "trajetos": acc.trajetos,
+            "desviados": acc.desviados,
+            "taxaDesvio": acc.desviados / acc.trajetos,
+            "distanciaEdicaoMedia": acc.soma_edicao / acc.trajetos,
+            "faltaDistanciaMedia": acc.soma_falta / acc.trajetos,
+            "faltaDistanciaMaxima": acc.max_falta,
+            "razaoTempoMedia": _finite(ratios.mean()) if ratios.size else None,
+            "razaoTempoP95": _finite(np.percentile(ratios, 95)) if ratios.size else None,
+        }
+
+
+def _finite(value: float) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def main() -> None:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Relatório de desvio dos trajetos executados.")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--device", default=None, help="restringe a análise a um dispositivo")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--piores", type=int, default=10)
+    args = parser.parse_args()
+
+    db = sessionmaker(bind=create_engine(args.database_url))()
+    try:
+        report = DeviationAnalyzer(db, args.chunk_size, args.piores).analyze(args.device)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
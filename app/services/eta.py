@@ -0,0 +1,117 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.commands import MS_PER_DISTANCE_UNIT, MS_PER_TURN, command_totals
+from app.models import RotaTemplateORM, TrajetoORM
+
+ETA_MIN_SAMPLES: int = int(os.getenv("ETA_MIN_SAMPLES", 8))
+DEFAULT_BATTERY = 100.0
+RIDGE = 1.0
+HISTORY_CHUNK = 50_000
+
+NOMINAL = (0.0, float(MS_PER_DISTANCE_UNIT), float(MS_PER_TURN), 0.0)
+
+Coefficients = Tuple[float, float, float, float]
+
+
+class _Stats:
+    """Estatísticas suficientes da regressão: ``XᵀX``, ``Xᵀy`` e o número de amostras."""
+
+    __slots__ = ("xtx", "xty", "n", "coef")
+
+    def __init__(self):
+        self.xtx = np.zeros((4, 4))
+        self.xty = np.zeros(4)
+        self.n = 0
+        self.coef: Optional[Coefficients] = None
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.xtx += x.T @ x
+        self.xty += x.T @ y
+        self.n += len(y)
+        # Ridge leve para o sistema continuar bem-posto quando uma feature não
+        # varia (ex.: bateria sempre cheia) ou há poucas amostras.
+        coef = np.linalg.solve(self.xtx + RIDGE * np.eye(4), self.xty)
+        self.coef = tuple(float(c) for c in coef)
+
+
+class DurationModel:
+    """
+    Regressão linear por dispositivo: ``tempo ≈ b0 + b1·distância + b2·giros + b3·bateria``.
+
+    O ajuste é incremental (só as estatísticas suficientes são guardadas) e
+    os coeficientes ficam prontos após cada observação, então a previsão é
+    um produto escalar em Python puro. Dispositivos com poucas amostras usam
+    o modelo global e, sem histórico, os tempos nominais do firmware.
+    """
+
+    def __init__(self, min_samples: int = ETA_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._devices: Dict[str, _Stats] = {}
+        self._global = _Stats()
+
+    @staticmethod
+    def _features(comandos: str, bateria: Optional[float]) -> Tuple[float, float, float, float]:
+        distance, turns = command_totals(comandos)
+        return 1.0, float(distance), float(turns), DEFAULT_BATTERY if bateria is None else float(bateria)
+
+    def coefficients(self, device_id: Optional[str]) -> Tuple[str, Coefficients]:
+        stats = self._devices.get(device_id) if device_id is not None else None
+        if stats is not None and stats.n >= self.min_samples:
+            return "dispositivo", stats.coef
+        if self._global.n >= self.min_samples:
+            return "global", self._global.coef
+        return "nominal", NOMINAL
+
+    def predict(self, device_id: Optional[str], comandos: str, bateria: Optional[float] = None) -> int:
+        """Tempo estimado, em milissegundos."""
+        return self.predict_with_source(device_id, comandos, bateria)[0]
+
+    def predict_with_source(
+        self, device_id: Optional[str], comandos: str, bateria: Optional[float] = None
+    ) -> Tuple[int, str]:
+        source, (b0, b1, b2, b3) = self.coefficients(device_id)
+        _, distance, turns, battery = self._features(comandos, bateria)
+        return max(0, round(b0 + b1 * distance + b2 * turns + b3 * battery)), source
+
+    def observe(self, device_id: Optional[str], comandos: str, bateria: Optional[float], tempo: int) -> None:
+        """Incorpora um trajeto concluído ao modelo."""
+        x = np.array([self._features(comandos, bateria)])
+        y = np.array([float(tempo)])
+        self._add(device_id, x, y)
+
+    def _add(self, device_id: Optional[str], x: np.ndarray, y: np.ndarray) -> None:
+        if device_id is not None:
+            self._devices.setdefault(device_id, _Stats()).add(x, y)
+        self._global.add(x, y)
+
+    def fit_history(self, db: Session, chunk_size: int = HISTORY_CHUNK) -> int:
+        """Ajusta o modelo com os trajetos concluídos já gravados. Retorna o número de amostras."""
+        comandos = func.coalesce(TrajetoORM.comandosEnviados, RotaTemplateORM.comandos)
+        stmt = (
+            select(TrajetoORM.idTrajeto, TrajetoORM.deviceId, comandos, TrajetoORM.bateria, TrajetoORM.tempo)
+            .outerjoin(RotaTemplateORM, TrajetoORM.idTemplate == RotaTemplateORM.idTemplate)
+            .where(TrajetoORM.status.is_(True), TrajetoORM.tempo.is_not(None))
+            .order_by(TrajetoORM.idTrajeto)
+            .limit(chunk_size)
+        )
+
+        total = 0
+        last_id = 0
+        while True:
+            rows = db.execute(stmt.where(TrajetoORM.idTrajeto > last_id)).all()
+            if not rows:
+                return total
+            last_id = rows[-1][0]
+
+            by_device: Dict[Optional[str], list] = {}
+            for _, device_id, cmds, bateria, tempo in rows:
+                by_device.setdefault(device_id, []).append((self._features(cmds or "", bateria), tempo))
+            for device_id, samples in by_device.items():
+                features, tempos = zip(*samples)
+                self._add(device_id, np.array(features), np.array(tempos, dtype=np.float64))
+            total += len(rows)
@@ -0,0 +1,90 @@
+"""
+Vazão e latência do ciclo de vida dos trajetos por minuto ou por hora.
+
+A consulta agrupa por (intervalo, tipo, faixa de latência) dentro de um
+intervalo de ``minuto``, tudo coberto pelo índice ``ix_evento_trajeto_minuto``:
+o banco devolve só contagens, e os percentis saem do histograma de faixas
+(resolução de ~19%, ver :func:`app.events.bin_value`).
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.events import bin_value
+from app.models import EventoTrajetoORM
+
+GRANULARIDADES = {"minuto": 1, "hora": 60}
+PERCENTIS = (("latenciaP50Ms", 0.5), ("latenciaP90Ms", 0.9), ("latenciaP99Ms", 0.99))
+
+
+def _minute(moment: datetime, round_up: bool = False) -> int:
+    seconds = moment.timestamp()
+    return math.ceil(seconds / 60) if round_up else math.floor(seconds / 60)
+
+
+def _percentiles(histogram: List[Tuple[int, int]]) -> Dict[str, Optional[float]]:
+    """Percentis a partir de ``(faixa, contagem)`` ordenado por faixa."""
+    total = sum(count for _, count in histogram)
+    result: Dict[str, Optional[float]] = {}
+    for name, q in PERCENTIS:
+        if not total:
+            result[name] = None
+            continue
+        target = q * total
+        seen = 0
+        for faixa, count in histogram:
+            seen += count
+            if seen >= target:
+                result[name] = round(bin_value(faixa), 1)
+                break
+    return result
+
+
+class EventStats:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def throughput(
+        self,
+        inicio: datetime,
+        fim: datetime,
+        granularidade: str = "minuto",
+        tipo: Optional[str] = None,
+    ) -> dict:
+        """
+        Eventos por intervalo e tipo entre ``inicio`` e ``fim`` (minutos
+        parciais nas pontas entram inteiros), com os percentis de latência.
+        """
+        step = GRANULARIDADES[granularidade]
+        start, end = _minute(inicio), _minute(fim, round_up=True)
+        bucket = EventoTrajetoORM.minuto - EventoTrajetoORM.minuto % step if step > 1 else EventoTrajetoORM.minuto
+
+        stmt = (
+            select(bucket.label("bucket"), EventoTrajetoORM.tipo, EventoTrajetoORM.faixaLatencia, func.count())
+            .where(EventoTrajetoORM.minuto >= start, EventoTrajetoORM.minuto < end)
+            .group_by(bucket, EventoTrajetoORM.tipo, EventoTrajetoORM.faixaLatencia)
+        )
+        if tipo is not None:
+            stmt = stmt.where(EventoTrajetoORM.tipo == tipo)
+
+        totals: Dict[Tuple[int, str], int] = defaultdict(int)
+        histograms: Dict[Tuple[int, str], List[Tuple[int, int]]] = defaultdict(list)
+        for minuto, tipo_evento, faixa, count in self.db.execute(stmt):
+            totals[(minuto, tipo_evento)] += count
+            if faixa is not None:
+                histograms[(minuto, tipo_evento)].append((faixa, count))
+
+        buckets = []
+        for key in sorted(totals):
+            minuto, tipo_evento = key
+            buckets.append({
+                "inicio": datetime.fromtimestamp(minuto * 60, tz=timezone.utc),
+                "tipo": tipo_evento,
+                "total": totals[key],
+                **_percentiles(sorted(histograms[key])),
+            })
+        return {"granularidade": granularidade, "inicio": inicio, "fim": fim, "buckets": buckets}
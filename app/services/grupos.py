@@ -0,0 +1,71 @@
+from typing import Callable, Dict, List, Optional
+from app.models import GrupoORM
+from app.mqtt_manager import MQTTManager
+from app.repositories.grupos import GrupoRepository
+from app.repositories.outbox import command_topic
+
+FLEET_TOPIC = "fleet/commands"
+STOP_COMMAND = "STOP"
+
+def _groups_of(status: dict) -> Optional[List[str]]:
+    """Grupos anunciados no status; ``None`` para firmwares sem suporte a tópicos de grupo."""
+    return status.get("grupos")
+
+class GrupoService:
+    def __init__(self, repo: GrupoRepository):
+        self.repo = repo
+
+    def create_grupo(self, nome: str, dispositivos: Optional[List[str]] = None, tag: Optional[str] = None):
+        return self.repo.create(nome, dispositivos, tag)
+
+    def list_grupos(self):
+        return self.repo.list_all()
+
+    def get_grupo(self, nome: str):
+        return self.repo.get(nome)
+
+    def delete_grupo(self, nome: str):
+        self.repo.delete(nome)
+
+    @staticmethod
+    def members(grupo: GrupoORM, devices: Dict[str, dict]) -> List[str]:
+        """Membros online do grupo."""
+        if grupo.tag is not None:
+            return [d for d, s in devices.items() if s.get("online") is True and grupo.tag in (s.get("tags") or ())]
+        return [d for d in grupo.dispositivos if devices.get(d, {}).get("online") is True]
+
+    def stop_grupo(self, nome: str, mqtt_manager: MQTTManager) -> dict:
+        grupo = self.repo.get(nome)
+        members = self.members(grupo, mqtt_manager.devices)
+
+        if grupo.tag is not None:
+            # Quem anuncia a tag já assina o tópico dela.
+            return broadcast(mqtt_manager, grupo.topico, members, lambda status: True, STOP_COMMAND)
+        return broadcast(
+            mqtt_manager, grupo.topico, members, lambda status: nome in (_groups_of(status) or ()), STOP_COMMAND
+        )
+
+def stop_fleet(mqtt_manager: MQTTManager) -> dict:
+    online = [d for d, s in mqtt_manager.devices.items() if s.get("online") is True]
+    return broadcast(mqtt_manager, FLEET_TOPIC, online, lambda status: _groups_of(status) is not None, STOP_COMMAND)
+
+def broadcast(
+    mqtt_manager: MQTTManager,
+    topic: str,
+    members: List[str],
+    reached: Callable[[dict], bool],
+    message: str,
+) -> dict:
+    """
+    Publica ``message`` uma vez no tópico do grupo e, para os membros que não
+    o assinam (firmware antigo ou lista de grupos ainda não sincronizada),
+    publica no tópico de cada um. As publicações individuais são enfileiradas
+    em sequência sem esperar o PUBACK de cada uma.
+    """
+    mqtt_manager.publish(topic, message, qos=1)
+
+    individual = [d for d in members if not reached(mqtt_manager.devices.get(d, {}))]
+    for device_id in individual:
+        mqtt_manager.publish(command_topic(device_id), message, qos=1)
+
+    return {"topico": topic, "viaTopico": len(members) - len(individual), "individuais": individual}
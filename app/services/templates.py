@@ -0,0 +1,46 @@
+from typing import Dict, List
+from app.commands import compile_commands
+from app.repositories.templates import TemplateRepository
+from app.repositories.trajetos import TrajetoRepository
+
+class TemplateCache:
+    """Payloads MQTT compilados por template. Templates são imutáveis, então nunca expiram."""
+
+    def __init__(self):
+        self._payloads: Dict[int, str] = {}
+
+    def get(self, template_id: int):
+        return self._payloads.get(template_id)
+
+    def put(self, template_id: int, payload: str) -> None:
+        self._payloads[template_id] = payload
+
+class TemplateService:
+    def __init__(self, repo: TemplateRepository, cache: TemplateCache):
+        self.repo = repo
+        self.cache = cache
+
+    def create_template(self, nome: str, comandos: str):
+        compiled = compile_commands(comandos)
+        template = self.repo.create(nome, compiled)
+        self.cache.put(template.idTemplate, compiled)
+        return template
+
+    def list_templates(self):
+        return self.repo.list_all()
+
+    def get_template(self, template_id: int):
+        return self.repo.get(template_id)
+
+    def get_payload(self, template_id: int) -> str:
+        payload = self.cache.get(template_id)
+        if payload is None:
+            # Já validado na criação; basta carregar uma vez.
+            payload = self.repo.get(template_id).comandos
+            self.cache.put(template_id, payload)
+        return payload
+
+    def create_trajetos(self, trajeto_repo: TrajetoRepository, template_id: int, valores: List[dict]):
+        """Garante que o template existe e cria os trajetos que o referenciam."""
+        payload = self.get_payload(template_id)
+        return trajeto_repo.create_for_template(template_id, valores, payload)
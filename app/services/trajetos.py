@@ -1,12 +1,20 @@
 from app.repositories.trajetos import TrajetoRepository
 from app.schemas import TrajetoUpdate
+from typing import Optional
 
 class TrajetoService:
     def __init__(self, repo: TrajetoRepository):
         self.repo = repo
 
-    def create_trajeto(self, comandos_enviados: str):
-        return self.repo.create(comandos_enviados)
+    def create_trajeto(
+        self,
+        comandos_enviados: str,
+        device_id: Optional[str] = None,
+        bateria: Optional[float] = None,
+        tempo_estimado: Optional[int] = None,
+        trace_id: Optional[str] = None,
+    ):
+        return self.repo.create(comandos_enviados, device_id, bateria, tempo_estimado, trace_id)
 
     def update_trajeto(self, trajeto_id: int, data: dict):
         update_data = TrajetoUpdate.model_validate(data, strict=False).model_dump(exclude_unset=True)
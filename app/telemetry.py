@@ -0,0 +1,215 @@
+import csv
+import io
+import os
+import struct
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.exceptions.telemetry import InvalidTelemetryException
+from app.models import TelemetriaORM
+from app.topic_router import TopicMessage
+
+TELEMETRY_VERSION = 1
+# Payload de ``devices/+/telemetry`` (little-endian), um lote de amostras por mensagem:
+#   cabeçalho: versão u8 | flags u8 | quantidade u16 | timestamp base (ms) u64
+#   amostra:   dt (ms) u16 | x (mm) i32 | y (mm) i32 | direção (centigraus, 0–35999) u16
+#              | velocidade (mm/s) i16 | distância do sensor (mm) u16
+HEADER = struct.Struct("<BBHQ")
+SAMPLE_DTYPE = np.dtype([
+    ("dt", "<u2"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("direcao", "<u2"),
+    ("velocidade", "<i2"),
+    ("distanciaSensor", "<u2"),
+])
+
+TELEMETRY_BATCH_SIZE: int = int(os.getenv("TELEMETRY_BATCH_SIZE", 5000))
+TELEMETRY_FLUSH_INTERVAL: float = float(os.getenv("TELEMETRY_FLUSH_MS", 1000)) / 1000
+TELEMETRY_MAX_BUFFER: int = int(os.getenv("TELEMETRY_MAX_BUFFER", 500_000))
+
+COLUMNS = ("deviceId", "timestamp", "x", "y", "direcao", "velocidade", "distanciaSensor")
+
+
+def encode_telemetry(base_timestamp_ms: int, samples: Sequence[Tuple[int, int, int, int, int, int]]) -> bytes:
+    """Monta um payload a partir de ``(dt, x, y, direcao, velocidade, distanciaSensor)``."""
+    body = np.array([tuple(s) for s in samples], dtype=SAMPLE_DTYPE)
+    return HEADER.pack(TELEMETRY_VERSION, 0, len(body), base_timestamp_ms) + body.tobytes()
+
+
+def decode_telemetry(payload: bytes) -> Tuple[int, np.ndarray]:
+    """
+    Retorna ``(timestamp_base_ms, amostras)``; ``amostras`` é uma view
+    estruturada sobre o próprio payload.
+
+    Raises:
+        InvalidTelemetryException: cabeçalho, versão ou tamanho inválidos.
+    """
+    if len(payload) < HEADER.size:
+        raise InvalidTelemetryException("Payload de telemetria menor que o cabeçalho")
+
+    version, _, count, base = HEADER.unpack_from(payload)
+    if version != TELEMETRY_VERSION:
+        raise InvalidTelemetryException(f"Versão de telemetria não suportada: {version}")
+    if len(payload) != HEADER.size + count * SAMPLE_DTYPE.itemsize:
+        raise InvalidTelemetryException("Tamanho do payload não corresponde à quantidade de amostras")
+
+    return base, np.frombuffer(payload, dtype=SAMPLE_DTYPE, count=count, offset=HEADER.size)
+
+
+class TelemetryWriter:
+    """
+    Acumula amostras decodificadas e as grava em lotes numa thread própria,
+    a cada ``flush_interval`` segundos ou quando ``batch_size`` amostras
+    se acumulam. Se o banco ficar indisponível, o buffer é limitado a
+    ``max_buffer`` amostras e os lotes mais antigos são descartados.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_interval: float = TELEMETRY_FLUSH_INTERVAL,
+        max_buffer: int = TELEMETRY_MAX_BUFFER,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self._buffer: List[Tuple[str, int, np.ndarray]] = []
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def handle(self, message: TopicMessage) -> None:
+        """Handler MQTT para ``devices/+/telemetry``."""
+        base, samples = decode_telemetry(message.payload)
+        self.add(message.params[0], base, samples)
+
+    def add(self, device_id: str, base_timestamp_ms: int, samples: np.ndarray) -> None:
+        with self._lock:
+            self._buffer.append((device_id, base_timestamp_ms, samples))
+            self._buffered += len(samples)
+            self.received += len(samples)
+            self._trim()
+            full = self._buffered >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        """Descarta os lotes mais antigos enquanto o buffer passar de ``max_buffer``."""
+        while self._buffered > self.max_buffer and len(self._buffer) > 1:
+            _, _, oldest = self._buffer.pop(0)
+            self._buffered -= len(oldest)
+            self.dropped += len(oldest)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            # Falha do banco no desligamento não deve interromper o resto do teardown.
+            print(f"[ERROR] falha ao gravar telemetria no desligamento: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] falha ao gravar telemetria: {e}")
+
+    def flush(self) -> int:
+        """Grava tudo o que está no buffer. Retorna o número de amostras gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._buffered = 0
+            if not batch:
+                return 0
+
+            try:
+                columns = self._columns(batch)
+                if self.engine.dialect.name == "postgresql":
+                    self._copy(columns)
+                else:
+                    self._executemany(columns)
+            except Exception:
+                # Devolve o lote ao início do buffer para a próxima tentativa,
+                # respeitando o limite: com o banco fora, o buffer não cresce sem fim.
+                with self._lock:
+                    self._buffer[:0] = batch
+                    self._buffered += sum(len(samples) for _, _, samples in batch)
+                    self._trim()
+                raise
+
+            written = len(columns[0])
+            self.written += written
+            self.flushes += 1
+            return written
+
+    @staticmethod
+    def _columns(batch: List[Tuple[str, int, np.ndarray]]) -> List[list]:
+        samples = np.concatenate([s for _, _, s in batch])
+        lengths = [len(s) for _, _, s in batch]
+        devices = np.repeat(np.array([d for d, _, _ in batch], dtype=object), lengths)
+        bases = np.repeat(np.array([b for _, b, _ in batch], dtype=np.int64), lengths)
+        return [
+            devices.tolist(),
+            (bases + samples["dt"]).tolist(),
+            samples["x"].tolist(),
+            samples["y"].tolist(),
+            samples["direcao"].tolist(),
+            samples["velocidade"].tolist(),
+            samples["distanciaSensor"].tolist(),
+        ]
+
+    def _copy(self, columns: List[list]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(zip(*columns))
+        buffer.seek(0)
+
+        table = TelemetriaORM.__tablename__
+        column_list = ", ".join(f'"{c}"' for c in COLUMNS)
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _executemany(self, columns: List[list]) -> None:
+        rows = [dict(zip(COLUMNS, values)) for values in zip(*columns)]
+        with self.engine.begin() as connection:
+            connection.execute(insert(TelemetriaORM), rows)
+
+    def stats(self) -> dict:
+        return {
+            "recebidas": self.received,
+            "gravadas": self.written,
+            "descartadas": self.dropped,
+            "pendentes": self._buffered,
+            "lotes": self.flushes,
+        }
@@ -0,0 +1,172 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MATCH_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class TopicMessage:
+    """Mensagem MQTT entregue a um handler; ``params`` traz os níveis casados por ``+``/``#``."""
+    topic: str
+    params: Tuple[str, ...]
+    payload: bytes
+    qos: int
+    properties: Optional[Dict[str, Any]] = None
+
+
+Handler = Callable[[TopicMessage], None]
+
+
+class HandlerStats:
+    __slots__ = ("calls", "errors", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "chamadas": self.calls,
+            "erros": self.errors,
+            "mediaMs": self.total_ns / self.calls / 1e6 if self.calls else 0.0,
+            "maximoMs": self.max_ns / 1e6,
+        }
+
+
+class _Route:
+    __slots__ = ("filter", "handler", "name", "stats")
+
+    def __init__(self, topic_filter: str, handler: Handler, name: str):
+        self.filter = topic_filter
+        self.handler = handler
+        self.name = name
+        self.stats = HandlerStats()
+
+
+class _Node:
+    __slots__ = ("children", "routes", "hash_routes")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.routes: List[_Route] = []
+        # Rotas cujo filtro termina em "#" neste nível.
+        self.hash_routes: List[_Route] = []
+
+
+def validate_filter(topic_filter: str) -> List[str]:
+    levels = topic_filter.split("/")
+    for index, level in enumerate(levels):
+        if level == "#" and index != len(levels) - 1:
+            raise ValueError(f"'#' deve ser o último nível do filtro: {topic_filter}")
+        if level not in ("+", "#") and ("+" in level or "#" in level):
+            raise ValueError(f"Curinga deve ocupar um nível inteiro: {topic_filter}")
+    return levels
+
+
+class TopicRouter:
+    """
+    Registro de handlers por filtro de tópico MQTT, com curingas ``+`` e ``#``.
+
+    Os filtros ficam em uma trie por nível, então o custo de casar um tópico
+    depende da profundidade do tópico e não do número de handlers. Os
+    resultados são memorizados por tópico concreto (os tópicos de cada
+    dispositivo se repetem), e a memória é descartada a cada novo registro.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._routes: List[_Route] = []
+        self._cache: Dict[str, List[Tuple[_Route, Tuple[str, ...]]]] = {}
+
+    def register(self, topic_filter: str, handler: Handler, name: Optional[str] = None) -> None:
+        levels = validate_filter(topic_filter)
+        route = _Route(topic_filter, handler, name or getattr(handler, "__name__", repr(handler)))
+
+        node = self._root
+        for level in levels:
+            if level == "#":
+                node.hash_routes.append(route)
+                break
+            node = node.children.setdefault(level, _Node())
+        else:
+            node.routes.append(route)
+
+        self._routes.append(route)
+        self._cache.clear()
+
+    def route(self, topic_filter: str) -> Callable[[Handler], Handler]:
+        """Versão decorador de :meth:`register`."""
+        def decorator(handler: Handler) -> Handler:
+            self.register(topic_filter, handler)
+            return handler
+        return decorator
+
+    def filters(self) -> List[str]:
+        """Filtros registrados, na ordem de registro e sem repetição (as assinaturas necessárias)."""
+        return list(dict.fromkeys(route.filter for route in self._routes))
+
+    def match(self, topic: str) -> List[Tuple[_Route, Tuple[str, ...]]]:
+        matches = self._cache.get(topic)
+        if matches is None:
+            matches = []
+            levels = topic.split("/")
+            # Tópicos de sistema ($SYS/...) não casam com curingas no primeiro nível.
+            self._walk(self._root, levels, 0, (), matches, topic.startswith("$"))
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[topic] = matches
+        return matches
+
+    def _walk(self, node: _Node, levels: List[str], index: int, params: Tuple[str, ...],
+              matches: list, system: bool) -> None:
+        wildcards = not (system and index == 0)
+
+        if wildcards:
+            remainder = "/".join(levels[index:])
+            for route in node.hash_routes:
+                matches.append((route, params + (remainder,)))
+
+        if index == len(levels):
+            for route in node.routes:
+                matches.append((route, params))
+            return
+
+        level = levels[index]
+        child = node.children.get(level)
+        if child is not None:
+            self._walk(child, levels, index + 1, params, matches, system)
+        if wildcards:
+            child = node.children.get("+")
+            if child is not None:
+                self._walk(child, levels, index + 1, params + (level,), matches, system)
+
+    def dispatch(self, topic: str, payload: bytes, qos: int = 0, properties: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Entrega a mensagem a todos os handlers cujo filtro casa com o tópico.
+        Erros de um handler são registrados e não impedem os demais.
+        Retorna o número de handlers chamados.
+        """
+        matches = self.match(topic)
+        for route, params in matches:
+            stats = route.stats
+            start = time.perf_counter_ns()
+            try:
+                route.handler(TopicMessage(topic, params, payload, qos, properties))
+            except Exception as e:
+                stats.errors += 1
+                print(f"[ERROR] handler {route.name} falhou para {topic}: {e}")
+            elapsed = time.perf_counter_ns() - start
+            stats.calls += 1
+            stats.total_ns += elapsed
+            if elapsed > stats.max_ns:
+                stats.max_ns = elapsed
+        return len(matches)
+
+    def stats(self) -> List[dict]:
+        return [
+            {"filtro": route.filter, "handler": route.name, **route.stats.as_dict()}
+            for route in self._routes
+        ]
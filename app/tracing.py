@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_CAPACITY: int = int(os.getenv("TRACE_CAPACITY", 10_000))
+TRACE_FILE: Optional[str] = os.getenv("TRACE_FILE") or None
+TRACE_FLUSH_EVERY: int = 256
+TRACE_PROPERTY = "trace_id"
+
+
+def trace_property(trace_id: str) -> list:
+    """User property MQTT v5 que carrega o trace id."""
+    return [(TRACE_PROPERTY, trace_id)]
+
+
+def trace_id_from_properties(properties: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Extrai o trace id das propriedades de uma mensagem recebida pelo gmqtt."""
+    if not properties:
+        return None
+    for key, value in properties.get("user_property", ()):
+        if key == TRACE_PROPERTY:
+            return value
+    return None
+
+
+class Tracer:
+    """
+    Registra spans cronometrados por trace id (um trace por despacho de trajeto).
+
+    Os traces mais recentes ficam em memória (no máximo ``capacity``) para
+    consulta pela API; se ``export_path`` for definido, cada span também é
+    acrescentado em JSON Lines ao arquivo, em lotes gravados por uma thread
+    própria, fora do lock e do event loop.
+    """
+
+    def __init__(self, capacity: int = TRACE_CAPACITY, export_path: Optional[str] = TRACE_FILE):
+        self.capacity = capacity
+        self.export_path = export_path
+        self._traces: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        # Um único worker: os lotes chegam ao arquivo na ordem em que saíram.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+    @staticmethod
+    def new_trace_id() -> str:
+        return os.urandom(8).hex()
+
+    def record(self, trace_id: Optional[str], name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+        if trace_id is None:
+            return
+
+        span = {
+            "traceId": trace_id,
+            "nome": name,
+            "inicio": start_ns,
+            "duracaoMs": (end_ns - start_ns) / 1e6,
+            **attributes,
+        }
+
+        batch = None
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                if len(self._traces) > self.capacity:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+
+            if self.export_path is not None:
+                self._pending.append(json.dumps(span))
+                if len(self._pending) >= TRACE_FLUSH_EVERY:
+                    batch, self._pending = self._pending, []
+        if batch:
+            self._export(batch)
+
+    @contextmanager
+    def span(self, trace_id: Optional[str], name: str, **attributes: Any) -> Iterator[None]:
+        """Cronometra o bloco como um span; exceções são registradas e propagadas."""
+        start = time.time_ns()
+        try:
+            yield
+        except Exception as e:
+            self.record(trace_id, name, start, time.time_ns(), erro=str(e), **attributes)
+            raise
+        self.record(trace_id, name, start, time.time_ns(), **attributes)
+
+    def get(self, trace_id: str) -> List[dict]:
+        with self._lock:
+            return sorted(self._traces.get(trace_id, ()), key=lambda s: s["inicio"])
+
+    def end_of(self, trace_id: Optional[str], name: str) -> Optional[int]:
+        """Instante (ns) em que o último span ``name`` do trace terminou."""
+        if trace_id is None:
+            return None
+        with self._lock:
+            for span in reversed(self._traces.get(trace_id, ())):
+                if span["nome"] == name:
+                    return span["inicio"] + int(span["duracaoMs"] * 1e6)
+        return None
+
+    def recent(self, limit: int = 100) -> List[str]:
+        with self._lock:
+            return list(self._traces)[-limit:][::-1]
+
+    def flush(self) -> None:
+        """Grava os spans pendentes e espera a escrita (e as anteriores) terminar."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        self._export(batch).result()
+
+    def _export(self, batch: List[str]) -> Future:
+        return self._writer.submit(self._write, batch)
+
+    def _write(self, batch: List[str]) -> None:
+        if not batch or self.export_path is None:
+            return
+        try:
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(batch) + "\n")
+        except OSError as e:
+            print(f"[ERROR] falha ao exportar spans: {e}")
@@ -0,0 +1,68 @@
+"""
+Mede a vazão de publicação QoS 1 contra um broker local com 1, 2, 4 e 8
+conexões no pool de publicação: as mensagens são publicadas sem esperar
+PUBACK (até ``--window`` pendentes por vez) e a latência vai da publicação
+à confirmação do broker.
+
+Uso:
+    docker compose up -d mqtt
+    python -m benchmarks.publish_pool --host localhost --messages 20000 --devices 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import numpy as np
+
+
+async def run(pool_size: int, args) -> dict:
+    from app.publisher_pool import PublisherPool
+
+    pool = PublisherPool(pool_size, f"bench-{uuid.uuid4().hex[:8]}")
+    await pool.connect(args.host, args.port)
+    devices = [f"bench{i}" for i in range(args.devices)]
+    payload = b"a1000da0500ei0"
+    latencies = np.zeros(args.messages)
+    window = asyncio.Semaphore(args.window)
+
+    def acked(i: int, published: int):
+        def callback(_):
+            latencies[i] = time.perf_counter_ns() - published
+            window.release()
+        return callback
+
+    start = time.perf_counter()
+    acks = []
+    for i in range(args.messages):
+        await window.acquire()
+        ack = pool.publish(f"devices/{devices[i % len(devices)]}/commands", payload, qos=1)
+        ack.add_done_callback(acked(i, time.perf_counter_ns()))
+        acks.append(ack)
+    await asyncio.wait_for(asyncio.gather(*acks), args.timeout)
+    elapsed = time.perf_counter() - start
+
+    await pool.disconnect()
+    p50, p99 = np.percentile(latencies / 1e6, [50, 99])
+    return {"conexoes": pool_size, "vazao": args.messages / elapsed, "p50": p50, "p99": p99}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--window", type=int, default=1000, help="publicações aguardando PUBACK ao mesmo tempo")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--sizes", default="1,2,4,8")
+    args = parser.parse_args()
+
+    print(f"{'conexões':>9}{'msg/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        result = await run(size, args)
+        print(f"{result['conexoes']:>9}{result['vazao']:>10.0f}{result['p50']:>10.2f}{result['p99']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,32 +1,61 @@
 import sys
 import json
+import math
+import struct
 import time
 import random
 import datetime
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 import threading
 
+# Mesmo formato de app/telemetry.py: cabeçalho + amostras little-endian.
+TELEMETRY_HEADER = struct.Struct("<BBHQ")
+TELEMETRY_SAMPLE = struct.Struct("<HiiHhH")
+
+# Codificação compacta "c1" de app/commands.py: marcador 0xC1 + id do trajeto,
+# seguidos de 0x01 u16 (avança), 0x02/0x03 (gira d/e) e 0x04 u8 u16 (repete bloco).
+COMPACT_ENCODING = "c1"
+COMPACT_MARKER = 0xC1
+COMPACT_HEADER = struct.Struct("<BI")
+COMPACT_FORWARD = struct.Struct("<BH")
+COMPACT_REPEAT = struct.Struct("<BBH")
+
 class ESP32Simulator:
     """
     Simula uma ESP32 com conexão MQTT, gerenciamento de bateria, LWT e
     processamento de comandos de movimentação.
     """
 
-    def __init__(self, device_id, broker="localhost", port=1883):
+    def __init__(self, device_id, broker="localhost", port=1883, telemetry_hz=0, tags=()):
         """
-        Inicializa o dispositivo virtual.
+        Inicializa o dispositivo virtual. Com ``telemetry_hz`` > 0, publica
+        telemetria binária nessa frequência enquanto estiver conectado. As
+        ``tags`` são anunciadas no status e definem os grupos por tag.
         """
         self.device_id = device_id
         self.broker = broker
         self.port = port
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=device_id)
+        self.client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2, client_id=device_id, protocol=mqtt.MQTTv5
+        )
         
         self.battery = 100.0
         self.online = False
+        self.moving = False
+        self.telemetry_hz = telemetry_hz
+        self.telemetry_thread = None
+        self.tags = list(tags)
+        self.groups = []
+        self.stop_event = threading.Event()
         
         self.topic_commands = f"devices/{self.device_id}/commands"
+        self.topic_groups = f"devices/{self.device_id}/grupos"
+        self.topic_fleet = "fleet/commands"
         self.topic_status = f"devices/{self.device_id}/status"
         self.topic_trajeto = f"devices/{self.device_id}/trajeto"
+        self.topic_telemetry = f"devices/{self.device_id}/telemetry"
 
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
@@ -55,17 +84,55 @@ class ESP32Simulator:
         if reason_code == 0:
             print(f"[{self.device_id}] Conectado ao broker MQTT.")
             self.online = True
-            client.subscribe(self.topic_commands)
-            print(f"[{self.device_id}] Inscrito em: {self.topic_commands}")
+            topics = [self.topic_commands, self.topic_fleet, self.topic_groups]
+            topics += [f"tags/{tag}/commands" for tag in self.tags]
+            topics += [f"groups/{group}/commands" for group in self.groups]
+            for topic in topics:
+                client.subscribe(topic, qos=1)
+            print(f"[{self.device_id}] Inscrito em: {', '.join(topics)}")
             self.publish_status()
+
+            if self.telemetry_hz > 0 and not (self.telemetry_thread and self.telemetry_thread.is_alive()):
+                self.telemetry_thread = threading.Thread(target=self.stream_telemetry, daemon=True)
+                self.telemetry_thread.start()
         else:
             print(f"[{self.device_id}] Falha na conexão. Código: {reason_code}")
 
+    def expand_compact(self, payload, start=COMPACT_HEADER.size, end=None):
+        """
+        Expande as instruções de um payload compacto para a string de
+        comandos, repetindo os blocos de repetição.
+        """
+        end = len(payload) if end is None else end
+        commands = []
+        index = start
+        while index < end:
+            op = payload[index]
+            if op == 1:
+                commands.append(f"a{COMPACT_FORWARD.unpack_from(payload, index)[1]:04d}")
+                index += COMPACT_FORWARD.size
+            elif op in (2, 3):
+                commands.append("d" if op == 2 else "e")
+                index += 1
+            elif op == 4:
+                _, count, size = COMPACT_REPEAT.unpack_from(payload, index)
+                index += COMPACT_REPEAT.size
+                commands.append(self.expand_compact(payload, index, index + size) * count)
+                index += size
+            else:
+                raise ValueError(f"instrução inválida no byte {index}")
+        return "".join(commands)
+
     def process_commands(self, command_str):
         """
         Analisa a string de comandos recebida, simula o tempo de execução
-        e separa o ID do trajeto.
+        e separa o ID do trajeto. Payloads na codificação compacta (bytes
+        iniciados por 0xC1) são expandidos antes.
         """
+        if isinstance(command_str, bytes):
+            _, traj_id = COMPACT_HEADER.unpack_from(command_str)
+            command_str = f"{self.expand_compact(command_str)}i{traj_id}"
+
         index = 0
         commands_executed = ""
         trajectory_id = None
@@ -108,23 +175,37 @@ class ESP32Simulator:
 
         return commands_executed, trajectory_id, total_simulated_time_ms
 
-    def execute_trajectory(self, cmds_exec, traj_id, sim_time_ms):
+    def execute_trajectory(self, cmds_exec, traj_id, sim_time_ms, user_properties=None):
         """
         Executa o trajeto simulando o tempo de execução. Recebe tempo em ms.
+        As user properties recebidas com o comando (ex.: trace_id) são ecoadas
+        no resultado.
         """
         print(f"[{self.device_id}] Executando trajeto... (Aguardando {sim_time_ms}ms)")
-        time.sleep(sim_time_ms / 1000)
+        self.moving = True
+        self.stop_event.clear()
+        start = time.monotonic()
+        stopped = self.stop_event.wait(sim_time_ms / 1000)
+        if stopped:
+            sim_time_ms = int((time.monotonic() - start) * 1000)
+            print(f"[{self.device_id}] Trajeto interrompido por STOP após {sim_time_ms}ms")
+        self.moving = False
 
         self.battery = max(0, self.battery - (sim_time_ms * 0.0005))
 
         result_payload = json.dumps({
             "idTrajeto": traj_id,
             "comandosExecutados": cmds_exec,
-            "status": True,
+            "status": not stopped,
             "tempo": sim_time_ms
         })
         
-        self.client.publish(self.topic_trajeto, result_payload, qos=1)
+        properties = None
+        if user_properties:
+            properties = Properties(PacketTypes.PUBLISH)
+            properties.UserProperty = user_properties
+
+        self.client.publish(self.topic_trajeto, result_payload, qos=1, properties=properties)
         print(f"[{self.device_id}] Trajeto finalizado. Publicado em {self.topic_trajeto}")
         
         self.publish_status()
@@ -134,29 +215,94 @@ class ESP32Simulator:
         """
         Callback executado ao receber uma mensagem no tópico inscrito.
         """
+        if msg.payload[:1] == bytes([COMPACT_MARKER]):
+            print(f"[{self.device_id}] Comando compacto recebido em {msg.topic}: {len(msg.payload)} bytes")
+            self.start_trajectory(msg.payload, msg.properties)
+            return
+
         payload_str = msg.payload.decode('utf-8')
-        print(f"[{self.device_id}] Comando recebido: {payload_str}")
 
-        cmds_exec, traj_id, sim_time = self.process_commands(payload_str)
+        if msg.topic == self.topic_groups:
+            self.update_groups(json.loads(payload_str) if payload_str else [])
+            return
+
+        print(f"[{self.device_id}] Comando recebido em {msg.topic}: {payload_str}")
+
+        if payload_str == "STOP":
+            self.stop_event.set()
+            return
+
+        self.start_trajectory(payload_str, msg.properties)
+
+    def start_trajectory(self, payload, properties):
+        """Interpreta os comandos e executa o trajeto em outra thread."""
+        cmds_exec, traj_id, sim_time = self.process_commands(payload)
+        user_properties = getattr(properties, "UserProperty", None)
 
         if traj_id:
             threading.Thread(
                 target=self.execute_trajectory, 
-                args=(cmds_exec, traj_id, sim_time),
+                args=(cmds_exec, traj_id, sim_time, user_properties),
                 daemon=True
             ).start()
 
+    def update_groups(self, groups):
+        """
+        Ajusta as assinaturas aos grupos estáticos recebidos (mensagem retida
+        em ``devices/{id}/grupos``) e anuncia a nova lista no status.
+        """
+        for group in set(self.groups) - set(groups):
+            self.client.unsubscribe(f"groups/{group}/commands")
+        for group in set(groups) - set(self.groups):
+            self.client.subscribe(f"groups/{group}/commands", qos=1)
+        self.groups = list(groups)
+        print(f"[{self.device_id}] Grupos: {self.groups}")
+        self.publish_status()
+
     def publish_status(self):
         """
-        Publica o estado atual da bateria e conectividade.
+        Publica o estado atual da bateria e conectividade, com as tags e os
+        grupos assinados (o servidor usa ``grupos`` para saber quem recebe
+        comandos pelos tópicos de grupo) e as codificações de comando aceitas.
         """
         payload = json.dumps({
             "battery": round(self.battery, 2),
             "online": self.online,
-            "timestamp": self._get_timestamp()
+            "timestamp": self._get_timestamp(),
+            "tags": self.tags,
+            "grupos": self.groups,
+            "encodings": [COMPACT_ENCODING]
         })
         self.client.publish(self.topic_status, payload, retain=True)
 
+    def stream_telemetry(self, batch_interval=0.1):
+        """
+        Publica amostras de posição, direção, velocidade e sensor de distância
+        em ``telemetry_hz``, agrupadas em uma mensagem a cada ``batch_interval``
+        segundos (QoS 0, formato binário).
+        """
+        x = y = 0.0
+        heading = 0.0
+        period = 1 / self.telemetry_hz
+        per_batch = max(1, round(self.telemetry_hz * batch_interval))
+
+        while self.online:
+            base = int(time.time() * 1000)
+            samples = []
+            for i in range(per_batch):
+                speed = random.uniform(250, 350) if self.moving else 0.0
+                heading = (heading + random.uniform(-2, 2)) % 360
+                x += speed * period * math.cos(math.radians(heading))
+                y += speed * period * math.sin(math.radians(heading))
+                samples.append(TELEMETRY_SAMPLE.pack(
+                    int(i * period * 1000), int(x), int(y), int(heading * 100) % 36000,
+                    int(speed), random.randint(50, 4000)
+                ))
+                time.sleep(period)
+
+            payload = TELEMETRY_HEADER.pack(1, 0, len(samples), base) + b"".join(samples)
+            self.client.publish(self.topic_telemetry, payload, qos=0)
+
     def run(self):
         """
         Inicia o loop principal do dispositivo.
@@ -193,5 +339,8 @@ if __name__ == "__main__":
     else:
         my_id = "esp32_default"
 
-    device = ESP32Simulator(device_id=my_id)
+    telemetry_hz = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    tags = [t for t in sys.argv[3].split(",") if t] if len(sys.argv) > 3 else []
+
+    device = ESP32Simulator(device_id=my_id, telemetry_hz=telemetry_hz, tags=tags)
     device.run()
\ No newline at end of file
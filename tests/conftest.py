@@ -6,8 +6,13 @@ from sqlalchemy.pool import StaticPool
 from unittest.mock import MagicMock, AsyncMock
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db, get_mqtt_manager
+from app.dependencies import get_db, get_mqtt_manager, get_rate_limiter, get_group_committer, get_template_cache, get_duration_model, get_tracer, get_outbox_relay, get_event_log
 from app.mqtt_manager import MQTTManager, MQTTClient
+from app.outbox import OutboxRelay
+from app.events import EventLog
+from app.rate_limiter import RateLimiter
+from app.services.templates import TemplateCache
+from app.services.eta import DurationModel
 
 TEST_DATABASE_URL = "sqlite://"
 
@@ -31,6 +36,10 @@ def db_session():
         db.close()
         Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture
+def session_factory(db_session: Session):
+    return sessionmaker(bind=db_session.get_bind(), expire_on_commit=False)
+
 @pytest.fixture
 def mqtt_manager_mock():
     """Fornece uma instância de MQTTManager com client interno mocado."""
@@ -44,16 +53,57 @@ def mqtt_manager_mock():
     manager_instance.client = mock_client_instance
     return manager_instance
 
+@pytest.fixture
+def rate_limiter():
+    """Fornece um rate limiter novo por teste, para não vazar estado entre testes."""
+    return RateLimiter()
+
+@pytest.fixture
+def template_cache():
+    return TemplateCache()
+
+@pytest.fixture
+def duration_model():
+    return DurationModel()
+
+@pytest.fixture
+def outbox_relay(session_factory, mqtt_manager_mock: MQTTManager):
+    """Relay não iniciado: os testes publicam o outbox com ``relay_once``."""
+    return OutboxRelay(session_factory, mqtt_manager_mock)
+
+@pytest.fixture
+def event_log(db_session: Session):
+    """Log de eventos não iniciado: os testes gravam com ``flush``."""
+    return EventLog(db_session.get_bind())
+
 @pytest.fixture(name="client")
-def client_fixture(db_session: Session, mqtt_manager_mock: MQTTManager):
+def client_fixture(
+    db_session: Session,
+    mqtt_manager_mock: MQTTManager,
+    rate_limiter: RateLimiter,
+    template_cache: TemplateCache,
+    duration_model: DurationModel,
+    outbox_relay: OutboxRelay,
+    event_log: EventLog,
+):
     def get_db_override():
         return db_session
 
     def get_mqtt_override():
         return mqtt_manager_mock
 
+    def get_rate_limiter_override():
+        return rate_limiter
+
     app.dependency_overrides[get_db] = get_db_override
     app.dependency_overrides[get_mqtt_manager] = get_mqtt_override
+    app.dependency_overrides[get_rate_limiter] = get_rate_limiter_override
+    app.dependency_overrides[get_group_committer] = lambda: None
+    app.dependency_overrides[get_template_cache] = lambda: template_cache
+    app.dependency_overrides[get_duration_model] = lambda: duration_model
+    app.dependency_overrides[get_tracer] = lambda: mqtt_manager_mock.tracer
+    app.dependency_overrides[get_outbox_relay] = lambda: outbox_relay
+    app.dependency_overrides[get_event_log] = lambda: event_log
 
     client = TestClient(app)
 
@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy.orm import Session
+from app.commands import COMPACT_ENCODING, decode_compact, encode_compact
+from app.exceptions.commands import InvalidComandosException
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.repositories.trajetos import TrajetoRepository
+
+RONDA = "a1000da0001e" * 50 + "a0500" + ("a0100d" * 3 + "a0200e") * 20
+
+
+@pytest.mark.parametrize("comandos", ["a0001", "de", "a1000da0001e", RONDA, "a9999" * 300 + "d"])
+def test_compact_roundtrip(comandos):
+    assert decode_compact(encode_compact(comandos, 42)) == (comandos, 42)
+
+def test_compact_loops_shrink_repeated_routes():
+    payload = encode_compact(RONDA, 42)
+
+    assert len(payload) < 50
+    assert len(payload) * 20 < len(f"{RONDA}i42")
+
+def test_compact_packs_distances_without_repeats():
+    payload = encode_compact("a1234da0007e", 1)
+
+    # 5 de cabeçalho + 3 por avanço + 1 por giro
+    assert len(payload) == 5 + 3 + 1 + 3 + 1
+
+def test_compact_rejects_invalid_commands():
+    with pytest.raises(InvalidComandosException):
+        encode_compact("a10x", 1)
+
+@pytest.mark.parametrize("payload", [b"", b"a0100i1", bytes([0xC1, 1, 0, 0, 0, 9]), bytes([0xC1, 1, 0, 0, 0, 4, 2, 9, 0, 2])])
+def test_decode_compact_rejects_malformed(payload):
+    with pytest.raises(InvalidComandosException):
+        decode_compact(payload)
+
+@pytest.fixture
+def connected_mqtt(mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    return mqtt_manager_mock
+
+@pytest.mark.asyncio
+async def test_relay_sends_compact_only_to_devices_that_advertise_it(
+    session_factory, connected_mqtt, db_session: Session
+):
+    connected_mqtt.devices["esp-novo"] = {"online": True, "encodings": [COMPACT_ENCODING]}
+    connected_mqtt.devices["esp-antigo"] = {"online": True}
+    novo, antigo = TrajetoRepository(db_session).create_many([
+        {"comandosEnviados": RONDA, "deviceId": "esp-novo"},
+        {"comandosEnviados": RONDA, "deviceId": "esp-antigo"},
+    ])
+
+    await OutboxRelay(session_factory, connected_mqtt).relay_once()
+
+    payloads = {c.args[0]: c.args[1] for c in connected_mqtt.publish.call_args_list}
+    assert decode_compact(payloads["devices/esp-novo/commands"]) == (RONDA, novo.idTrajeto)
+    assert payloads["devices/esp-antigo/commands"] == f"{RONDA}i{antigo.idTrajeto}".encode()
+    db_session.refresh(novo)
+    assert novo.comandosEnviados == RONDA
+
+@pytest.mark.asyncio
+async def test_relay_keeps_text_when_compact_is_not_smaller(session_factory, connected_mqtt, db_session: Session):
+    connected_mqtt.devices["esp-novo"] = {"online": True, "encodings": [COMPACT_ENCODING]}
+    trajeto = TrajetoRepository(db_session).create("d", device_id="esp-novo")
+
+    await OutboxRelay(session_factory, connected_mqtt).relay_once()
+
+    connected_mqtt.publish.assert_called_once()
+    assert connected_mqtt.publish.call_args.args[1] == f"di{trajeto.idTrajeto}".encode()
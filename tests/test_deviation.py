@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.models import RotaTemplateORM, TrajetoORM
+from app.services.deviation import DeviationAnalyzer, batch_edit_distance, encode_commands
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        prev, row[0] = row[:], i
+        for j, y in enumerate(b, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (x != y))
+    return row[-1]
+
+def test_encode_commands_distance_and_turns():
+    codes, distance, turns = encode_commands("a1000da0001e")
+
+    assert len(codes) == 4
+    assert distance == 1001
+    assert turns == 2
+
+@pytest.mark.parametrize("sent, executed", [
+    ("a1000da0001e", "a1000da0001e"),
+    ("a1000da0001e", "a1000d"),
+    ("a1000da0001e", ""),
+    ("", "dd"),
+    ("a0100ea0200d", "a0100da0200e"),
+    ("deded", "eded"),
+])
+def test_batch_edit_distance_matches_reference(sent, executed):
+    a, b = encode_commands(sent)[0], encode_commands(executed)[0]
+
+    assert batch_edit_distance([a], [b])[0] == levenshtein(list(a), list(b))
+
+def test_batch_edit_distance_random_pairs():
+    rng = np.random.default_rng(0)
+    sources = [rng.integers(1, 5, rng.integers(0, 10)).astype(np.int32) for _ in range(200)]
+    targets = [rng.integers(1, 5, rng.integers(0, 10)).astype(np.int32) for _ in range(200)]
+
+    result = batch_edit_distance(sources, targets, batch_size=32)
+
+    assert list(result) == [levenshtein(list(a), list(b)) for a, b in zip(sources, targets)]
+
+def seed_trajetos(db_session: Session):
+    template = RotaTemplateORM(nome="Ronda", comandos="a0100d")
+    db_session.add(template)
+    db_session.flush()
+    db_session.add_all([
+        TrajetoORM(deviceId="esp32-1", comandosEnviados="a1000da0001e", comandosExecutados="a1000da0001e", tempo=12010),
+        TrajetoORM(deviceId="esp32-1", comandosEnviados="a1000da0001e", comandosExecutados="a1000d", tempo=11000),
+        TrajetoORM(deviceId="esp32-2", idTemplate=template.idTemplate, comandosExecutados="a0100d", tempo=4000),
+        TrajetoORM(deviceId="esp32-2", comandosEnviados="a0100", comandosExecutados=None, tempo=None),
+    ])
+    db_session.commit()
+
+def test_analyze_aggregates_per_device_across_chunks(db_session: Session):
+    seed_trajetos(db_session)
+
+    report = DeviationAnalyzer(db_session, chunk_size=1).analyze()
+
+    assert report["trajetos"] == 3
+    assert report["desviados"] == 1
+
+    esp1 = report["porDispositivo"]["esp32-1"]
+    assert esp1["trajetos"] == 2
+    assert esp1["taxaDesvio"] == 0.5
+    assert esp1["distanciaEdicaoMedia"] == 1.0
+    assert esp1["faltaDistanciaMaxima"] == 1
+    assert esp1["razaoTempoMedia"] == pytest.approx((12010 / 12010 + 11000 / 12010) / 2)
+
+    esp2 = report["porDispositivo"]["esp32-2"]
+    assert esp2["trajetos"] == 1
+    assert esp2["razaoTempoMedia"] == pytest.approx(2.0)
+
+    assert report["piores"][0]["deviceId"] == "esp32-1"
+    assert report["piores"][0]["distanciaEdicao"] == 2
+
+def test_analyze_filters_by_device(db_session: Session):
+    seed_trajetos(db_session)
+
+    report = DeviationAnalyzer(db_session).analyze("esp32-2")
+
+    assert list(report["porDispositivo"]) == ["esp32-2"]
+
+def test_desvios_endpoint(client: TestClient, db_session: Session):
+    seed_trajetos(db_session)
+
+    response = client.get("/analise/desvios", params={"piores": 1})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["trajetos"] == 3
+    assert len(data["piores"]) == 1
+    assert set(data["porDispositivo"]) == {"esp32-1", "esp32-2"}
+
+def test_desvios_endpoint_empty(client: TestClient):
+    response = client.get("/analise/desvios")
+
+    assert response.status_code == 200
+    assert response.json() == {"trajetos": 0, "desviados": 0, "porDispositivo": {}, "piores": []}
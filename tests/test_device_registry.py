@@ -0,0 +1,116 @@
+from fastapi.testclient import TestClient
+from app.device_registry import COUNTER_BITS, DeviceRegistry
+from app.mqtt_manager import MQTTManager
+
+def online(battery):
+    return {"online": True, "battery": battery}
+
+def test_version_grows_only_on_changes():
+    registry = DeviceRegistry(epoch=3)
+    assert registry.version == 3 << COUNTER_BITS
+
+    registry["esp1"] = online(90)
+    registry["esp1"] = online(90)
+    registry["esp2"] = online(80)
+
+    assert registry.version == (3 << COUNTER_BITS) + 2
+    assert dict(registry) == {"esp1": online(90), "esp2": online(80)}
+
+def test_changed_since_returns_only_newer_devices_in_change_order():
+    registry = DeviceRegistry()
+    for i in range(5):
+        registry[f"esp{i}"] = online(100)
+    since = registry.version
+    registry["esp3"] = online(50)
+    registry["esp1"] = online(40)
+
+    assert registry.changed_since(since) == ({"esp3": online(50), "esp1": online(40)}, False)
+    assert registry.changed_since(registry.version) == ({}, False)
+
+def test_changed_since_returns_everything_when_delta_is_impossible():
+    registry = DeviceRegistry()
+    registry["esp1"] = online(90)
+    before_removal = registry.version
+    registry["esp2"] = online(80)
+    del registry["esp1"]
+
+    assert registry.changed_since(before_removal) == ({"esp2": online(80)}, True)
+    # Versão de outra execução do processo, à frente da atual.
+    assert registry.changed_since(registry.version + 10)[1] is True
+
+def test_versions_from_another_process_are_never_deltas():
+    # A época sorteada pode ficar abaixo ou acima da execução anterior; em
+    # nenhum dos casos a numeração de uma cruza a da outra.
+    previous = DeviceRegistry(epoch=1)
+    previous["esp1"] = online(90)
+    for epoch in (0, 2):
+        registry = DeviceRegistry(epoch=epoch)
+        for i in range(20):
+            registry["esp2"] = online(100 - i)
+
+        assert registry.changed_since(previous.version) == ({"esp2": online(81)}, True)
+
+def test_snapshot_is_reused_until_version_changes():
+    registry = DeviceRegistry()
+    registry["esp1"] = online(90)
+
+    first = registry.snapshot_json()
+    assert registry.snapshot_json() is first
+
+    registry["esp1"] = online(89)
+    assert registry.snapshot_json() != first
+
+def test_status_messages_bump_version(mqtt_manager_mock: MQTTManager):
+    version = mqtt_manager_mock.devices.version
+
+    mqtt_manager_mock._handle_status("esp1", '{"online": true, "battery": 90}')
+
+    assert mqtt_manager_mock.devices.version == version + 1
+
+def test_get_devices_etag_and_not_modified(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.devices = {"esp1": online(90)}
+
+    response = client.get("/devices/")
+    etag = response.headers["etag"]
+
+    assert response.json() == {"esp1": online(90)}
+    assert etag == f'"{mqtt_manager_mock.devices.version}"'
+
+    not_modified = client.get("/devices/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    mqtt_manager_mock.devices["esp1"] = online(89)
+    assert client.get("/devices/", headers={"If-None-Match": etag}).status_code == 200
+
+def test_get_devices_delta(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.devices = {f"esp{i}": online(100) for i in range(1000)}
+    version = int(client.get("/devices/").headers["x-devices-version"])
+    mqtt_manager_mock.devices["esp7"] = online(70)
+
+    response = client.get("/devices/", params={"since": version})
+
+    assert response.json() == {"esp7": online(70)}
+    assert "x-devices-complete" not in response.headers
+    assert int(response.headers["x-devices-version"]) == version + 1
+
+def test_get_devices_delta_after_reset_is_complete(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.devices = {"esp1": online(90)}
+    version = mqtt_manager_mock.devices.version
+    mqtt_manager_mock.devices = {"esp2": online(80)}
+
+    response = client.get("/devices/", params={"since": version})
+
+    assert response.json() == {"esp2": online(80)}
+    assert response.headers["x-devices-complete"] == "true"
+
+def test_get_devices_etag_from_another_process_is_modified(client: TestClient, mqtt_manager_mock: MQTTManager):
+    previous = DeviceRegistry(epoch=1)
+    previous["esp1"] = online(90)
+    mqtt_manager_mock._devices = DeviceRegistry(epoch=2)
+    mqtt_manager_mock.devices["esp1"] = online(90)
+
+    response = client.get("/devices/", headers={"If-None-Match": f'"{previous.version}"'})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != f'"{previous.version}"'
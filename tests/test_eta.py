@@ -0,0 +1,87 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from app.models import TrajetoORM
+from app.mqtt_manager import MQTTManager
+from app.services.eta import DurationModel
+
+def true_tempo(distance, turns, battery):
+    return 200 + 12 * distance + 900 * turns + 5 * (100 - battery)
+
+def route(distance, turns):
+    return f"a{distance:04d}" + "d" * turns
+
+def train(model: DurationModel, device_id: str, samples: int = 20):
+    for i in range(samples):
+        distance, turns, battery = 100 + 37 * i, i % 4, 100 - 3 * i
+        model.observe(device_id, route(distance, turns), battery, true_tempo(distance, turns, battery))
+
+def test_predict_without_history_uses_nominal_times():
+    model = DurationModel()
+
+    assert model.predict_with_source("esp32-1", "a1000da0001e") == (10 * 1001 + 2 * 1000, "nominal")
+
+def test_predict_learns_device_coefficients():
+    model = DurationModel(min_samples=5)
+    train(model, "esp32-1")
+
+    tempo, source = model.predict_with_source("esp32-1", route(500, 2), 80)
+
+    assert source == "dispositivo"
+    assert tempo == pytest.approx(true_tempo(500, 2, 80), rel=0.02)
+
+def test_unknown_device_falls_back_to_global_model():
+    model = DurationModel(min_samples=5)
+    train(model, "esp32-1")
+
+    _, source = model.predict_with_source("esp32-9", route(500, 2), 80)
+
+    assert source == "global"
+
+def test_fit_history_uses_completed_trajetos(db_session: Session):
+    for i in range(10):
+        distance, turns, battery = 100 + 50 * i, i % 3, 90.0
+        db_session.add(TrajetoORM(
+            deviceId="esp32-1", comandosEnviados=route(distance, turns), bateria=battery,
+            status=True, tempo=true_tempo(distance, turns, battery),
+        ))
+    db_session.add(TrajetoORM(deviceId="esp32-1", comandosEnviados="a9999", status=None, tempo=None))
+    db_session.commit()
+
+    model = DurationModel(min_samples=5)
+
+    assert model.fit_history(db_session, chunk_size=3) == 10
+    assert model.predict("esp32-1", route(300, 1), 90) == pytest.approx(true_tempo(300, 1, 90), rel=0.02)
+
+def test_handle_trajeto_refits_model(db_session: Session, mqtt_manager_mock: MQTTManager):
+    trajeto = TrajetoORM(deviceId="esp32-1", comandosEnviados="a1000d", bateria=75.0)
+    db_session.add(trajeto)
+    db_session.commit()
+
+    mqtt_manager_mock.duration_model = MagicMock(spec=DurationModel)
+    payload = json.dumps({"idTrajeto": trajeto.idTrajeto, "status": True, "tempo": 11000})
+
+    with patch("app.mqtt_manager.SessionLocal", return_value=db_session):
+        mqtt_manager_mock._handle_trajeto("esp32-1", payload)
+
+    mqtt_manager_mock.duration_model.observe.assert_called_once_with("esp32-1", "a1000d", 75.0, 11000)
+
+def test_eta_endpoint(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.devices = {"esp32-1": {"online": True, "battery": 50}}
+
+    response = client.post("/trajetos/esp32-1/eta", json={"comandosEnviados": "a1000da0001e"})
+
+    assert response.status_code == 200
+    assert response.json() == {"deviceId": "esp32-1", "tempoEstimado": 12010, "modelo": "nominal"}
+
+def test_create_trajeto_records_eta_and_battery(client: TestClient, mqtt_manager_mock: MQTTManager, db_session: Session):
+    mqtt_manager_mock.devices = {"esp32-1": {"online": True, "battery": 50}}
+    mqtt_manager_mock.publish = MagicMock()
+
+    response = client.post("/trajetos/esp32-1", json={"comandosEnviados": "a1000da0001e"})
+
+    assert response.status_code == 201
+    assert response.json()["tempoEstimado"] == 12010
+    assert db_session.get(TrajetoORM, response.json()["idTrajeto"]).bateria == 50
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.events import EventLog, bin_value, latency_bin
+from app.models import EventoTrajetoORM
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.repositories.trajetos import TrajetoRepository
+from app.services.eventos import EventStats
+
+# 2025-01-01 00:00:00 UTC
+T0 = 1735689600.0
+
+
+class Clock:
+    def __init__(self, now: float = T0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize("latency", [1, 7, 50, 333, 1000, 12_345, 600_000])
+def test_latency_bin_estimate_is_close(latency):
+    assert abs(bin_value(latency_bin(latency)) - latency) / latency < 0.1
+    assert latency_bin(latency) <= latency_bin(latency + 1)
+
+def test_lifecycle_latencies_from_dispatch(db_session: Session, mqtt_manager_mock: MQTTManager):
+    clock = Clock()
+    log = EventLog(db_session.get_bind(), clock=clock)
+    trajeto = TrajetoRepository(db_session).create("a0100", device_id="esp1")
+
+    log.dispatched([trajeto])
+    clock.now += 0.25
+    log.published(trajeto.idTrajeto, "esp1")
+    clock.now += 3
+    log.completed(trajeto.idTrajeto, "esp1", False)
+
+    assert log.flush() == 3
+    eventos = db_session.query(EventoTrajetoORM).order_by(EventoTrajetoORM.id).all()
+    assert [(e.tipo, e.latenciaMs) for e in eventos] == [
+        ("despachado", None), ("publicado", 250), ("interrompido", 3250)
+    ]
+    assert {e.minuto for e in eventos} == {int(T0) // 60}
+    assert log.stats() == {"recebidos": 3, "gravados": 3, "descartados": 0, "pendentes": 0}
+
+def test_buffer_drops_oldest_when_full(db_session: Session):
+    log = EventLog(db_session.get_bind(), max_buffer=2)
+    for i in range(5):
+        log.published(i, "esp1")
+
+    log.flush()
+
+    assert [e.idTrajeto for e in db_session.query(EventoTrajetoORM)] == [3, 4]
+    assert log.stats()["descartados"] == 3
+
+def test_failed_flush_keeps_batch(db_session: Session):
+    log = EventLog(db_session.get_bind())
+    log.published(1, "esp1")
+
+    with patch.object(log, "engine") as engine:
+        engine.begin.side_effect = RuntimeError("banco fora")
+        with pytest.raises(RuntimeError):
+            log.flush()
+
+    assert log.stats()["pendentes"] == 1
+    assert log.flush() == 1
+
+def test_failed_flush_respects_max_buffer(db_session: Session):
+    log = EventLog(db_session.get_bind(), max_buffer=3)
+    log.published(1, "esp1")
+    log.published(2, "esp1")
+
+    def fail():
+        # Eventos que chegam enquanto o banco está fora.
+        log.published(3, "esp1")
+        log.published(4, "esp1")
+        raise RuntimeError("banco fora")
+
+    with patch.object(log, "engine") as engine:
+        engine.begin.side_effect = fail
+        with pytest.raises(RuntimeError):
+            log.flush()
+
+    assert log.stats() == {"recebidos": 4, "gravados": 0, "descartados": 1, "pendentes": 3}
+    log.flush()
+    assert [e.idTrajeto for e in db_session.query(EventoTrajetoORM).order_by(EventoTrajetoORM.id)] == [2, 3, 4]
+
+def test_stop_survives_database_error(db_session: Session):
+    log = EventLog(db_session.get_bind())
+    log.published(1, "esp1")
+
+    with patch.object(log, "engine") as engine:
+        engine.begin.side_effect = RuntimeError("banco fora")
+        log.stop()
+
+    assert log.stats()["pendentes"] == 1
+
+def test_relay_and_result_record_events(session_factory, db_session: Session, mqtt_manager_mock: MQTTManager):
+    log = EventLog(db_session.get_bind())
+    trajeto = TrajetoRepository(db_session).create("a0100", device_id="esp1")
+    log.dispatched([trajeto])
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    mqtt_manager_mock.event_log = log
+
+    asyncio.run(OutboxRelay(session_factory, mqtt_manager_mock, event_log=log).relay_once())
+    with patch("app.mqtt_manager.SessionLocal", session_factory):
+        mqtt_manager_mock._handle_trajeto(
+            "esp1", json.dumps({"idTrajeto": trajeto.idTrajeto, "status": True, "tempo": 900})
+        )
+    log.flush()
+
+    eventos = db_session.query(EventoTrajetoORM).order_by(EventoTrajetoORM.id).all()
+    assert [e.tipo for e in eventos] == ["despachado", "publicado", "concluido"]
+    assert all(e.latenciaMs is not None for e in eventos[1:])
+
+def test_throughput_by_minute_and_hour(db_session: Session):
+    clock = Clock()
+    log = EventLog(db_session.get_bind(), clock=clock)
+    for minute, latencies in [(0, [100, 100, 100, 1000]), (1, [200]), (61, [400, 400])]:
+        clock.now = T0 + minute * 60
+        for i, latency in enumerate(latencies):
+            trajeto = MagicMock(idTrajeto=minute * 100 + i, deviceId="esp1")
+            log.dispatched([trajeto])
+            clock.now += latency / 1000
+            log.completed(trajeto.idTrajeto, "esp1", True)
+            clock.now -= latency / 1000
+    log.flush()
+
+    inicio = datetime.fromtimestamp(T0, tz=timezone.utc)
+    fim = datetime.fromtimestamp(T0 + 3 * 3600, tz=timezone.utc)
+    por_minuto = EventStats(db_session).throughput(inicio, fim, "minuto", tipo="concluido")["buckets"]
+
+    assert [(b["inicio"], b["total"]) for b in por_minuto] == [
+        (datetime.fromtimestamp(T0 + m * 60, tz=timezone.utc), n) for m, n in [(0, 4), (1, 1), (61, 2)]
+    ]
+    assert por_minuto[0]["latenciaP50Ms"] == pytest.approx(100, rel=0.1)
+    assert por_minuto[0]["latenciaP99Ms"] == pytest.approx(1000, rel=0.1)
+
+    por_hora = EventStats(db_session).throughput(inicio, fim, "hora")["buckets"]
+    assert [(b["tipo"], b["total"]) for b in por_hora] == [
+        ("concluido", 5), ("despachado", 5), ("concluido", 2), ("despachado", 2)
+    ]
+    assert por_hora[0]["latenciaP50Ms"] == pytest.approx(100, rel=0.1)
+    assert por_hora[1]["latenciaP50Ms"] is None
+
+def test_dispatch_endpoint_records_event_and_report(client: TestClient, mqtt_manager_mock, event_log: EventLog):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+
+    assert client.post("/trajetos/esp1", json={"comandosEnviados": "a0100"}).status_code == 201
+    event_log.flush()
+
+    response = client.get("/analise/eventos")
+    assert response.status_code == 200
+    assert [(b["tipo"], b["total"]) for b in response.json()["buckets"]] == [("despachado", 1)]
+
+@pytest.mark.parametrize("params", [
+    {"inicio": "2025-01-02T00:00:00", "fim": "2025-01-01T00:00:00"},
+    {"inicio": "2024-01-01T00:00:00", "fim": "2025-01-01T00:00:00"},
+])
+def test_eventos_rejects_invalid_ranges(client: TestClient, params):
+    assert client.get("/analise/eventos", params=params).status_code == 400
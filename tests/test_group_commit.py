@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.main import app
+from app.dependencies import get_group_committer
+from app.models import TrajetoORM
+from app.outbox import OutboxRelay
+from app.repositories.group_commit import TrajetoGroupCommitter
+from app.repositories.trajetos import TrajetoRepository
+
+
+def test_create_many_preserves_order(db_session: Session):
+    repo = TrajetoRepository(db_session)
+
+    trajetos = repo.create_many([{"comandosEnviados": c} for c in ["a0001", "a0002", "a0003"]])
+
+    assert [t.comandosEnviados for t in trajetos] == ["a0001", "a0002", "a0003"]
+    assert all(t.idTrajeto is not None for t in trajetos)
+    assert db_session.query(TrajetoORM).count() == 3
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_share_one_transaction(session_factory):
+    committer = TrajetoGroupCommitter(session_factory, window_ms=20, max_batch=100)
+
+    original = TrajetoRepository.create_many
+    with patch.object(TrajetoRepository, "create_many", autospec=True, side_effect=original) as create_many:
+        trajetos = await asyncio.gather(*(committer.create(f"a{i:04d}") for i in range(10)))
+
+    assert create_many.call_count == 1
+    assert [t.comandosEnviados for t in trajetos] == [f"a{i:04d}" for i in range(10)]
+    assert len({t.idTrajeto for t in trajetos}) == 10
+
+@pytest.mark.asyncio
+async def test_max_batch_flushes_immediately(session_factory):
+    committer = TrajetoGroupCommitter(session_factory, window_ms=60_000, max_batch=2)
+
+    trajetos = await asyncio.wait_for(
+        asyncio.gather(committer.create("a0001"), committer.create("a0002")),
+        timeout=5,
+    )
+
+    assert len(trajetos) == 2
+
+@pytest.mark.asyncio
+async def test_write_failure_propagates_to_every_caller(session_factory):
+    committer = TrajetoGroupCommitter(session_factory, window_ms=5)
+    committer._write = MagicMock(side_effect=RuntimeError("db down"))
+
+    results = await asyncio.gather(
+        committer.create("a0001"), committer.create("a0002"), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_create_trajeto_route_uses_group_committer(
+    client: TestClient, mqtt_manager_mock, session_factory, outbox_relay: OutboxRelay
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    app.dependency_overrides[get_group_committer] = lambda: TrajetoGroupCommitter(session_factory, window_ms=1)
+
+    response = client.post("/trajetos/esp32-1", json={"comandosEnviados": "a1000da0001e"})
+
+    assert response.status_code == 201
+    assert response.json()["comandosEnviados"] == "a1000da0001e"
+    assert response.json()["deviceId"] == "esp32-1"
+    data = response.json()
+    asyncio.run(outbox_relay.relay_once())
+    mqtt_manager_mock.publish.assert_called_once_with(
+        "devices/esp32-1/commands", f"a1000da0001ei{data['idTrajeto']}".encode(),
+        qos=1, user_property=[("trace_id", data["traceId"])]
+    )
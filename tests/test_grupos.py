@@ -0,0 +1,110 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, call
+from sqlalchemy.orm import Session
+from app.models import OutboxORM
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+
+def online(**extra):
+    return {"online": True, "battery": 90, **extra}
+
+def test_create_static_group_pushes_retained_membership(
+    client: TestClient, mqtt_manager_mock: MQTTManager, outbox_relay: OutboxRelay
+):
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+
+    client.post("/grupos/", json={"nome": "patio", "dispositivos": ["esp32-1", "esp32-2"]})
+    response = client.post("/grupos/", json={"nome": "ronda", "dispositivos": ["esp32-2"]})
+
+    assert response.status_code == 201
+    assert response.json()["topico"] == "groups/ronda/commands"
+
+    asyncio.run(outbox_relay.relay_once())
+    mqtt_manager_mock.publish.assert_has_calls([
+        call("devices/esp32-1/grupos", json.dumps(["patio"]).encode(), qos=1, retain=True),
+        call("devices/esp32-2/grupos", json.dumps(["patio"]).encode(), qos=1, retain=True),
+        call("devices/esp32-2/grupos", json.dumps(["patio", "ronda"]).encode(), qos=1, retain=True),
+    ])
+
+def test_create_group_validation(client: TestClient):
+    assert client.post("/grupos/", json={"nome": "g"}).status_code == 422
+    assert client.post("/grupos/", json={"nome": "g", "tag": "t", "dispositivos": ["a"]}).status_code == 422
+    assert client.post("/grupos/", json={"nome": "a/b", "tag": "t"}).status_code == 422
+
+def test_create_group_duplicate_name(client: TestClient):
+    assert client.post("/grupos/", json={"nome": "galpao", "tag": "galpao"}).status_code == 201
+
+    response = client.post("/grupos/", json={"nome": "galpao", "tag": "outra"})
+
+    assert response.status_code == 409
+
+def test_list_get_and_delete_group(client: TestClient, db_session: Session):
+    client.post("/grupos/", json={"nome": "patio", "dispositivos": ["esp32-1"]})
+
+    assert [g["nome"] for g in client.get("/grupos/").json()] == ["patio"]
+    assert client.get("/grupos/patio").json()["dispositivos"] == ["esp32-1"]
+
+    assert client.delete("/grupos/patio").status_code == 204
+    assert client.get("/grupos/patio").status_code == 404
+    ultima = db_session.query(OutboxORM).order_by(OutboxORM.id.desc()).first()
+    assert (ultima.topic, ultima.payload) == ("devices/esp32-1/grupos", b"[]")
+
+def test_stop_static_group_falls_back_for_unsubscribed_members(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.publish = MagicMock()
+    mqtt_manager_mock.devices = {
+        "esp32-1": online(grupos=["patio"]),
+        "esp32-2": online(),
+        "esp32-3": {"online": False, "battery": None},
+    }
+    client.post("/grupos/", json={"nome": "patio", "dispositivos": ["esp32-1", "esp32-2", "esp32-3"]})
+
+    response = client.post("/grupos/patio/stop")
+
+    assert response.status_code == 200
+    assert response.json() == {"topico": "groups/patio/commands", "viaTopico": 1, "individuais": ["esp32-2"]}
+    assert mqtt_manager_mock.publish.call_args_list == [
+        call("groups/patio/commands", "STOP", qos=1),
+        call("devices/esp32-2/commands", "STOP", qos=1),
+    ]
+
+def test_stop_tag_group(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.publish = MagicMock()
+    mqtt_manager_mock.devices = {
+        "esp32-1": online(tags=["galpao-a"], grupos=[]),
+        "esp32-2": online(tags=["galpao-b"], grupos=[]),
+        "esp32-3": online(tags=None, grupos=[]),
+    }
+    client.post("/grupos/", json={"nome": "galpao", "tag": "galpao-a"})
+
+    response = client.post("/grupos/galpao/stop")
+
+    assert response.json() == {"topico": "tags/galpao-a/commands", "viaTopico": 1, "individuais": []}
+    mqtt_manager_mock.publish.assert_called_once_with("tags/galpao-a/commands", "STOP", qos=1)
+
+def test_stop_unknown_group(client: TestClient):
+    assert client.post("/grupos/nenhum/stop").status_code == 404
+
+def test_stop_fleet(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.publish = MagicMock()
+    mqtt_manager_mock.devices = {f"esp{i}": online(grupos=[]) for i in range(1000)}
+    mqtt_manager_mock.devices["legado"] = online()
+
+    response = client.post("/devices/stop")
+
+    assert response.status_code == 200
+    assert response.json() == {"topico": "fleet/commands", "viaTopico": 1000, "individuais": ["legado"]}
+    assert mqtt_manager_mock.publish.call_args_list == [
+        call("fleet/commands", "STOP", qos=1),
+        call("devices/legado/commands", "STOP", qos=1),
+    ]
+
+def test_stop_fleet_publish_failure(client: TestClient, mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.publish = MagicMock(side_effect=Exception("MQTT error"))
+    mqtt_manager_mock.devices = {}
+
+    response = client.post("/devices/stop")
+
+    assert response.status_code == 500
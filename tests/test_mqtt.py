@@ -66,7 +66,7 @@ def test_on_message_trajeto_routes_to_handle_trajeto(mqtt_manager_mock: MQTTMana
         mqtt_manager_mock.on_message(mqtt_manager_mock.client, topic, payload, 0, None)
 
         handle_trajeto_mock.assert_called_once_with(
-            device_id, payload.decode()
+            device_id, payload.decode(), None
         )
 
 def test_handle_trajeto_calls_service_update(mqtt_manager_mock: MQTTManager):
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from app.models import OutboxORM, TrajetoORM
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.repositories.outbox import OutboxRepository
+from app.repositories.trajetos import TrajetoRepository
+
+
+@pytest.fixture
+def connected_mqtt(mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    return mqtt_manager_mock
+
+def test_create_enqueues_command_in_same_transaction(db_session: Session):
+    trajeto = TrajetoRepository(db_session).create("a0100", device_id="esp32-1", trace_id="t1")
+
+    mensagem = db_session.query(OutboxORM).one()
+    assert mensagem.topic == "devices/esp32-1/commands"
+    assert mensagem.payload == f"a0100i{trajeto.idTrajeto}".encode()
+    assert (mensagem.idTrajeto, mensagem.traceId, mensagem.enviadoEm) == (trajeto.idTrajeto, "t1", None)
+
+def test_trajeto_without_device_is_not_enqueued(db_session: Session):
+    TrajetoRepository(db_session).create("a0100")
+
+    assert db_session.query(OutboxORM).count() == 0
+
+def test_outbox_failure_rolls_back_trajeto(db_session: Session):
+    with patch.object(OutboxRepository, "add_commands", side_effect=RuntimeError("falha")):
+        with pytest.raises(RuntimeError):
+            TrajetoRepository(db_session).create("a0100", device_id="esp32-1")
+    db_session.rollback()
+
+    assert db_session.query(TrajetoORM).count() == 0
+
+@pytest.mark.asyncio
+async def test_relay_publishes_pending_and_marks_sent(session_factory, connected_mqtt, db_session: Session):
+    repo = TrajetoRepository(db_session)
+    trajetos = repo.create_many([{"comandosEnviados": f"a000{i}", "deviceId": f"esp{i}"} for i in range(3)])
+    relay = OutboxRelay(session_factory, connected_mqtt, batch_size=2)
+
+    assert await relay.relay_once() == 2
+    assert await relay.relay_once() == 1
+    assert await relay.relay_once() == 0
+
+    assert [c.args[1] for c in connected_mqtt.publish.call_args_list] == [
+        f"a000{i}i{t.idTrajeto}".encode() for i, t in enumerate(trajetos)
+    ]
+    assert db_session.query(OutboxORM).filter(OutboxORM.enviadoEm.is_(None)).count() == 0
+    assert relay.stats() == {"enviadas": 3, "falhas": 0}
+
+@pytest.mark.asyncio
+async def test_relay_waits_for_broker_connection(session_factory, connected_mqtt, db_session: Session):
+    TrajetoRepository(db_session).create("a0100", device_id="esp32-1")
+    connected_mqtt.connected = False
+
+    assert await OutboxRelay(session_factory, connected_mqtt).relay_once() == 0
+    connected_mqtt.publish.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_relay_stops_when_broker_connection_drops(session_factory, mqtt_manager_mock, db_session: Session):
+    TrajetoRepository(db_session).create("a1000d", device_id="esp32-1")
+    mqtt_manager_mock.publish = MagicMock()
+    mqtt_manager_mock.on_connect(mqtt_manager_mock.client, flags={}, rc=0)
+    mqtt_manager_mock.on_disconnect(mqtt_manager_mock.client, packet=None)
+
+    assert await OutboxRelay(session_factory, mqtt_manager_mock).relay_once() == 0
+    mqtt_manager_mock.publish.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_relay_retries_failures_with_backoff(session_factory, connected_mqtt, db_session: Session):
+    TrajetoRepository(db_session).create("a0100", device_id="esp32-1")
+    connected_mqtt.publish.side_effect = [Exception("broker fora"), None]
+
+    await OutboxRelay(session_factory, connected_mqtt).relay_once()
+    # Reagendada para daqui a 1 s: ainda não volta no próximo lote.
+    assert await OutboxRelay(session_factory, connected_mqtt).relay_once() == 0
+
+    relay = OutboxRelay(session_factory, connected_mqtt, max_backoff=0)
+    db_session.query(OutboxORM).update({"proximaTentativa": None})
+    db_session.commit()
+    assert await relay.relay_once() == 1
+
+    mensagem = db_session.query(OutboxORM).one()
+    db_session.refresh(mensagem)
+    assert mensagem.tentativas == 1
+    assert mensagem.enviadoEm is not None
+
+def test_purge_removes_old_sent_messages(db_session: Session):
+    TrajetoRepository(db_session).create_many([
+        {"comandosEnviados": "a0001", "deviceId": "esp1"},
+        {"comandosEnviados": "a0002", "deviceId": "esp2"},
+    ])
+    repo = OutboxRepository(db_session)
+    antigo = datetime.now(timezone.utc) - timedelta(days=2)
+    primeira = repo.pending(datetime.now(timezone.utc), 1)[0]
+    repo.mark([primeira.id], [], antigo)
+
+    assert repo.purge(datetime.now(timezone.utc) - timedelta(days=1)) == 1
+    assert db_session.query(OutboxORM).count() == 1
+
+@pytest.mark.asyncio
+async def test_relay_loop_publishes_on_wake_and_drains_on_stop(session_factory, connected_mqtt, db_session: Session):
+    relay = OutboxRelay(session_factory, connected_mqtt, poll_interval=60)
+    relay.start()
+
+    TrajetoRepository(db_session).create("a0100", device_id="esp32-1")
+    relay.wake()
+    for _ in range(100):
+        if relay.stats()["enviadas"]:
+            break
+        await asyncio.sleep(0.01)
+    connected_mqtt.publish.assert_called_once()
+
+    TrajetoRepository(db_session).create("a0200", device_id="esp32-1")
+    await relay.stop()
+    assert connected_mqtt.publish.call_count == 2
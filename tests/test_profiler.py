@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+import app.dependencies as dependencies
+from app.profiler import SamplingProfiler, to_collapsed
+
+ADMIN = {"X-Admin-Token": "segredo"}
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_TOKEN", "segredo")
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampling_profiler_captures_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="worker")
+    worker.start()
+
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    stacks = profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    worker_stacks = [s for s in stacks if s.startswith("worker;")]
+    assert any("busy_loop (test_profiler.py:" in s for s in worker_stacks)
+    assert not any(s.startswith("sampling-profiler") for s in stacks)
+
+def test_to_collapsed_orders_by_count():
+    profiler = SamplingProfiler()
+    profiler._stacks.update({"main;a": 1, "main;a;b": 3})
+
+    assert to_collapsed(profiler._stacks) == "main;a;b 3\nmain;a 1\n"
+
+def test_profile_requires_admin_token(client: TestClient):
+    assert client.get("/admin/profile", params={"seconds": 0.01}).status_code == 403
+
+def test_profile_disabled_without_configured_token(client: TestClient, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_TOKEN", None)
+
+    assert client.get("/admin/profile", params={"seconds": 0.01}, headers=ADMIN).status_code == 403
+
+def test_profile_returns_collapsed_stacks(client: TestClient, admin_token):
+    response = client.get("/admin/profile", params={"seconds": 0.1, "interval_ms": 1}, headers=ADMIN)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
+
+def test_request_profiling_header(client: TestClient, admin_token):
+    response = client.get("/health", headers={**ADMIN, "X-Profile": "1"})
+
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/admin/profiles/{profile_id}", headers=ADMIN)
+    assert profile.status_code == 200
+
+def test_request_profiling_ignored_without_admin_token(client: TestClient, admin_token):
+    response = client.get("/health", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+def test_request_profile_not_found(client: TestClient, admin_token):
+    assert client.get("/admin/profiles/inexistente", headers=ADMIN).status_code == 404
@@ -0,0 +1,263 @@
+import asyncio
+import struct
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.models import OutboxORM
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.publisher_pool import AckingClient, PublishRefused, PublisherPool, affinity_key
+
+
+class FakeConnection:
+    """Conexão sem broker: guarda o que foi publicado e numera as mensagens pelo id generator do cliente."""
+
+    def __init__(self, ids, receive_maximum: int = 65535):
+        self.sent = []
+        self.ids = ids
+        # O gmqtt para de alocar com ``_max - 1`` ids em uso.
+        self.ids._max = receive_maximum + 1
+        self._transport = None
+
+    @property
+    def inflight(self):
+        return len(self.ids._used_ids)
+
+    def publish(self, message):
+        mid = self.ids.next_id() if message.qos > 0 else 0
+        self.sent.append((message.topic.decode(), message.payload))
+        return mid, b"package"
+
+    def puback(self, client, mid):
+        client._package_handler._handle_puback_packet(0x40, struct.pack("!H", mid))
+
+    def send_disconnect(self, reason_code=0, **properties):
+        pass
+
+    async def close(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def fake_client(client_id: str, receive_maximum: int = 65535) -> AckingClient:
+    client = AckingClient(client_id)
+    client._connection = FakeConnection(client._package_handler.id_generator, receive_maximum)
+    return client
+
+
+def test_publish_resolves_on_puback():
+    async def scenario():
+        client = fake_client("c")
+        ack = client.publish("devices/esp1/commands", "F10", qos=1)
+        assert not ack.done()
+        assert client.inflight == 1
+
+        client._remove_message_from_queue(1)
+        assert await ack == 1
+        assert client.inflight == 0
+        assert (client.published, client.acked) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_publish_qos0_resolves_immediately():
+    async def scenario():
+        client = fake_client("c")
+        ack = client.publish("devices/esp1/commands", "STOP")
+        assert ack.done()
+        assert client.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_window_queues_in_order():
+    async def scenario():
+        client = fake_client("c", receive_maximum=2)
+        acks = [client.publish("devices/esp1/commands", f"F{i}", qos=1) for i in range(5)]
+
+        assert (client.inflight, client.backlog) == (2, 3)
+        assert [p for _, p in client._connection.sent] == [b"F0", b"F1"]
+
+        client._connection.puback(client, 1)
+        assert (client.inflight, client.backlog) == (2, 2)
+        while client._pending:
+            client._connection.puback(client, next(iter(client._pending)))
+
+        # Os ids liberados são reaproveitados, como no gmqtt.
+        assert await asyncio.gather(*acks) == [1, 2, 1, 2, 1]
+        assert [p for _, p in client._connection.sent] == [b"F0", b"F1", b"F2", b"F3", b"F4"]
+        assert (client.inflight, client.backlog) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("handler, cmd", [("_handle_puback_packet", 0x40), ("_handle_pubrec_packet", 0x50)])
+def test_refused_ack_fails_publish(handler, cmd):
+    async def scenario():
+        client = fake_client("c")
+        refused = client.publish("devices/esp1/commands", "a0100", qos=1)
+        accepted = client.publish("devices/esp1/commands", "a0200", qos=1)
+        handle = getattr(client._package_handler, handler)
+
+        handle(cmd, struct.pack("!HB", 1, 0x87))
+        client._package_handler._handle_puback_packet(0x40, struct.pack("!HB", 2, 0x10))
+
+        with pytest.raises(PublishRefused) as error:
+            await refused
+        assert error.value.reason_code == 0x87
+        assert await accepted == 2
+        assert (client.acked, client.refused, client.inflight) == (1, 1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_relay_reschedules_refused_message(session_factory, db_session: Session, mqtt_manager_mock: MQTTManager):
+    db_session.add(OutboxORM(topic="devices/esp1/commands", payload=b"a0100i1", qos=1, deviceId="esp1"))
+    db_session.commit()
+    mqtt_manager_mock.connected = True
+    relay = OutboxRelay(session_factory, mqtt_manager_mock, ack_timeout=1)
+
+    async def scenario():
+        client = fake_client("c")
+        mqtt_manager_mock.client.publish.side_effect = client.publish
+        relaying = asyncio.ensure_future(relay.relay_once())
+        while not client.inflight:
+            await asyncio.sleep(0)
+        client._package_handler._handle_puback_packet(0x40, struct.pack("!HB", 1, 0x97))
+        return await relaying
+
+    assert asyncio.run(scenario()) == 1
+    assert relay.stats() == {"enviadas": 0, "falhas": 1}
+    db_session.expire_all()
+    mensagem = db_session.query(OutboxORM).one()
+    assert mensagem.enviadoEm is None
+    assert mensagem.tentativas == 1
+
+
+def test_disconnect_fails_pending_publishes():
+    async def scenario():
+        client = fake_client("c", receive_maximum=1)
+        sent = client.publish("devices/esp1/commands", "F10", qos=1)
+        queued = client.publish("devices/esp1/commands", "F20", qos=1)
+        await client.disconnect()
+        for ack in (sent, queued):
+            with pytest.raises(ConnectionError):
+                await ack
+        assert (client.inflight, client.backlog) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_connection_loss_releases_inflight_publishes():
+    async def scenario():
+        client = fake_client("c", receive_maximum=2)
+        inflight = [client.publish("devices/esp1/commands", f"a010{i}", qos=1) for i in range(2)]
+        queued = [client.publish("devices/esp1/commands", f"a020{i}", qos=1) for i in range(3)]
+
+        client._package_handler._handle_disconnect_packet(0xE0, b"")
+
+        for ack in inflight:
+            with pytest.raises(ConnectionError):
+                await ack
+        assert client._connection.inflight == 0
+        assert client._persistent_storage.is_empty
+        # Sem conexão nada é enviado, nem o que chega depois da queda.
+        queued.append(client.publish("devices/esp1/commands", "a0300", qos=1))
+        assert (client.inflight, client.backlog, len(client._connection.sent)) == (0, 4, 2)
+
+        # Reconexão com sessão limpa: o backlog sai em ordem após o CONNACK.
+        client._package_handler._handle_connack_packet(0x20, b"\x00\x00")
+        assert [p for _, p in client._connection.sent[2:]] == [b"a0200", b"a0201", b"a0202", b"a0300"]
+        for mid in list(client._pending):
+            client._connection.puback(client, mid)
+        assert len(await asyncio.gather(*queued)) == 4
+        assert (client.inflight, client.backlog) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_affinity_key():
+    assert affinity_key("devices/esp1/commands") == "esp1"
+    assert affinity_key("devices/esp1/grupos") == "esp1"
+    assert affinity_key("groups/sala/commands") == "groups/sala/commands"
+    assert affinity_key("fleet/commands") == "fleet/commands"
+
+
+def test_pool_keeps_device_order_on_one_connection():
+    async def scenario():
+        pool = PublisherPool(4, "api", client_factory=fake_client)
+        assert [c._client_id for c in pool.clients] == ["api-pub-0", "api-pub-1", "api-pub-2", "api-pub-3"]
+
+        devices = [f"esp{i}" for i in range(40)]
+        for step in range(3):
+            for device in devices:
+                pool.publish(f"devices/{device}/commands", f"{device}:{step}", qos=1)
+
+        for device in devices:
+            owners = [c for c in pool.clients if any(t == f"devices/{device}/commands" for t, _ in c._connection.sent)]
+            assert owners == [pool.client_for(device)]
+            payloads = [p for t, p in owners[0]._connection.sent if t == f"devices/{device}/commands"]
+            assert payloads == [f"{device}:{step}".encode() for step in range(3)]
+
+        assert all(c.published for c in pool.clients)
+        assert sum(s["inflight"] for s in pool.stats()) == 120
+
+    asyncio.run(scenario())
+
+
+def test_manager_publishes_through_pool(mqtt_manager_mock: MQTTManager):
+    async def scenario():
+        mqtt_manager_mock.publisher_pool = PublisherPool(2, "api", client_factory=fake_client)
+        ack = mqtt_manager_mock.publish("devices/esp1/commands", "F10", qos=1)
+
+        mqtt_manager_mock.client.publish.assert_not_called()
+        owner = mqtt_manager_mock.publisher_pool.client_for("esp1")
+        owner._remove_message_from_queue(1)
+        assert await ack == 1
+        assert [s["confirmadas"] for s in mqtt_manager_mock.publisher_stats()].count(1) == 1
+
+    asyncio.run(scenario())
+
+
+def test_relay_marks_only_acknowledged_messages(session_factory, db_session: Session, mqtt_manager_mock: MQTTManager):
+    db_session.add_all([
+        OutboxORM(topic="devices/esp1/commands", payload=b"F10i1", qos=1, deviceId="esp1"),
+        OutboxORM(topic="devices/esp2/commands", payload=b"F10i2", qos=1, deviceId="esp2"),
+    ])
+    db_session.commit()
+    mqtt_manager_mock.connected = True
+    relay = OutboxRelay(session_factory, mqtt_manager_mock, ack_timeout=0.05)
+
+    async def scenario():
+        def publish(topic, payload, qos=0, **kwargs):
+            ack = asyncio.get_running_loop().create_future()
+            if topic == "devices/esp1/commands":
+                ack.set_result(1)
+            return ack
+
+        mqtt_manager_mock.client.publish.side_effect = publish
+        return await relay.relay_once()
+
+    assert asyncio.run(scenario()) == 2
+    assert relay.stats() == {"enviadas": 1, "falhas": 1}
+    db_session.expire_all()
+    pendentes = {m.deviceId: m for m in db_session.query(OutboxORM)}
+    assert pendentes["esp1"].enviadoEm is not None
+    assert pendentes["esp2"].enviadoEm is None
+    assert pendentes["esp2"].tentativas == 1
+
+
+def test_admin_publisher_stats(monkeypatch, client: TestClient, mqtt_manager_mock: MQTTManager):
+    monkeypatch.setattr("app.dependencies.ADMIN_TOKEN", "segredo")
+    mqtt_manager_mock.publisher_pool = PublisherPool(2, "api", client_factory=AckingClient)
+
+    response = client.get("/admin/mqtt/publicadores", headers={"X-Admin-Token": "segredo"})
+
+    assert response.status_code == 200
+    assert [s["clientId"] for s in response.json()] == ["api-pub-0", "api-pub-1"]
+    assert response.json()[0] == {
+        "clientId": "api-pub-0", "conectado": False, "publicadas": 0,
+        "confirmadas": 0, "recusadas": 0, "inflight": 0, "backlog": 0, "bufferBytes": 0,
+    }
@@ -0,0 +1,145 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+from app.rate_limiter import RateLimiter
+from app.exceptions.rate_limit import RateLimitExceededException
+from app.mqtt_manager import MQTTManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(clock, **kwargs):
+    params = dict(device_rate=1, device_burst=2, global_rate=100, global_burst=100, sweep_interval=10)
+    params.update(kwargs)
+    return RateLimiter(clock=clock, **params)
+
+def test_acquire_allows_burst_then_rejects():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    limiter.acquire("dev_1")
+    limiter.acquire("dev_1")
+
+    with pytest.raises(RateLimitExceededException) as exc:
+        limiter.acquire("dev_1")
+
+    assert exc.value.code == 429
+    assert exc.value.message == "Limite de comandos excedido para dev_1"
+    assert exc.value.retry_after == pytest.approx(1.0)
+    assert exc.value.headers == {"Retry-After": "1"}
+
+def test_acquire_refills_over_time():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    limiter.acquire("dev_1")
+    limiter.acquire("dev_1")
+    clock.now = 1.0
+    limiter.acquire("dev_1")
+
+def test_devices_have_independent_buckets():
+    clock = FakeClock()
+    limiter = make_limiter(clock, device_burst=1)
+
+    limiter.acquire("dev_1")
+    limiter.acquire("dev_2")
+
+    with pytest.raises(RateLimitExceededException):
+        limiter.acquire("dev_1")
+
+def test_global_limit_does_not_consume_device_tokens():
+    clock = FakeClock()
+    limiter = make_limiter(clock, global_rate=1, global_burst=1)
+
+    limiter.acquire("dev_1")
+
+    with pytest.raises(RateLimitExceededException) as exc:
+        limiter.acquire("dev_2")
+
+    assert exc.value.message == "Limite global de comandos excedido"
+    clock.now = 1.0
+    limiter.acquire("dev_2")
+    assert limiter.remaining("dev_2") == pytest.approx(1.0)
+
+def test_acquire_many_is_all_or_nothing():
+    clock = FakeClock()
+    limiter = make_limiter(clock, device_burst=1)
+    limiter.acquire("dev_2")
+
+    with pytest.raises(RateLimitExceededException) as exc:
+        limiter.acquire_many(["dev_1", "dev_2", "dev_3"])
+
+    assert "dev_2" in exc.value.message
+    assert limiter.remaining("dev_1") == pytest.approx(1.0)
+    assert limiter.remaining("dev_3") == pytest.approx(1.0)
+    limiter.acquire_many(["dev_1", "dev_3"])
+
+def test_acquire_many_checks_global_for_the_whole_batch():
+    clock = FakeClock()
+    limiter = make_limiter(clock, global_rate=1, global_burst=2)
+
+    with pytest.raises(RateLimitExceededException):
+        limiter.acquire_many(["dev_1", "dev_2", "dev_3"])
+
+    limiter.acquire_many(["dev_1", "dev_2"])
+
+def test_idle_buckets_are_evicted():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    limiter.acquire("dev_1")
+    limiter.acquire("dev_2")
+    assert len(limiter) == 2
+
+    clock.now = 11.0
+    limiter.acquire("dev_3")
+
+    assert len(limiter) == 1
+    assert limiter.remaining("dev_1") is None
+
+def test_stop_device_rate_limited(client: TestClient, mqtt_manager_mock: MQTTManager, rate_limiter: RateLimiter):
+    device_id = "dev_123"
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.publish = MagicMock()
+    rate_limiter.device_burst = 1
+
+    assert client.post(f"/devices/{device_id}/stop").status_code == 200
+    response = client.post(f"/devices/{device_id}/stop")
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    mqtt_manager_mock.publish.assert_called_once()
+
+def test_create_trajeto_rate_limited(client: TestClient, mqtt_manager_mock: MQTTManager, rate_limiter: RateLimiter):
+    device_id = "esp32-1"
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.publish = MagicMock()
+    rate_limiter.device_burst = 1
+
+    trajeto = {"comandosEnviados": "a1000da0001e"}
+
+    assert client.post(f"/trajetos/{device_id}", json=trajeto).status_code == 201
+    response = client.post(f"/trajetos/{device_id}", json=trajeto)
+
+    assert response.status_code == 429
+    assert len(client.get("/trajetos/").json()) == 1
+
+def test_dispatch_template_rate_limited_keeps_tokens(
+    client: TestClient, mqtt_manager_mock: MQTTManager, rate_limiter: RateLimiter
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    rate_limiter.device_burst = 1
+    rate_limiter.acquire("esp32-2")
+    template = client.post("/templates/", json={"nome": "Ronda", "comandos": "a0500e"}).json()
+
+    response = client.post(f"/templates/{template['idTemplate']}/dispatch", json={"devices": ["esp32-1", "esp32-2"]})
+
+    assert response.status_code == 429
+    assert rate_limiter.remaining("esp32-1") == pytest.approx(1.0)
+    assert client.get("/trajetos/").json() == []
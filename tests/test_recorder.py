@@ -0,0 +1,89 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+from app.mqtt_manager import MQTTManager
+from app.recorder import MAGIC, MessageRecorder, RecordedMessage, read_recording, replay
+
+def test_record_and_read_roundtrip(tmp_path):
+    path = str(tmp_path / "trafego.rec")
+    recorder = MessageRecorder(path, clock=iter(range(1, 100)).__next__)
+    recorder.record("devices/esp1/status", b'{"online": true}', 0)
+    recorder.record("devices/esp1/telemetry", bytes(range(256)), 1)
+    recorder.close()
+
+    assert list(read_recording(path)) == [
+        RecordedMessage(1, "devices/esp1/status", b'{"online": true}', 0),
+        RecordedMessage(2, "devices/esp1/telemetry", bytes(range(256)), 1),
+    ]
+    assert recorder.stats()["mensagens"] == 2
+
+def test_reopening_appends_and_truncated_tail_is_ignored(tmp_path):
+    path = str(tmp_path / "trafego.rec")
+    for topic in ("a", "b"):
+        recorder = MessageRecorder(path)
+        recorder.record(topic, b"x", 0)
+        recorder.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02")
+
+    assert [m.topic for m in read_recording(path)] == ["a", "b"]
+
+def test_read_rejects_other_files(tmp_path):
+    path = tmp_path / "outro.bin"
+    path.write_bytes(b"nada" + MAGIC)
+
+    with pytest.raises(ValueError):
+        list(read_recording(str(path)))
+
+def test_on_message_records_before_dispatch(tmp_path, mqtt_manager_mock: MQTTManager):
+    path = str(tmp_path / "trafego.rec")
+    mqtt_manager_mock.recorder = MessageRecorder(path)
+
+    mqtt_manager_mock.on_message(mqtt_manager_mock.client, "devices/esp1/status", b'{"online": true}', 0)
+    mqtt_manager_mock.recorder.close()
+
+    assert [(m.topic, m.payload) for m in read_recording(path)] == [("devices/esp1/status", b'{"online": true}')]
+    assert mqtt_manager_mock.devices["esp1"] == {"online": True}
+
+def test_replay_respects_speed(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("app.recorder.time.sleep", sleeps.append)
+    messages = [RecordedMessage(i * 1_000_000_000, "t", b"", 0) for i in range(3)]
+    handler = MagicMock()
+
+    latencies = replay(messages, handler, speed=10)
+
+    assert handler.call_count == 3 and len(latencies) == 3
+    assert len(sleeps) == 2
+    assert all(0.05 < s <= 0.2 for s in sleeps)
+
+    sleeps.clear()
+    replay(messages, handler, speed=0)
+    assert sleeps == []
+
+def test_replay_drives_manager(mqtt_manager_mock: MQTTManager):
+    messages = [
+        RecordedMessage(0, f"devices/esp{i}/status", json.dumps({"online": True}).encode(), 0) for i in range(5)
+    ]
+
+    replay(messages, lambda t, p, q: mqtt_manager_mock.on_message(mqtt_manager_mock.client, t, p, q))
+
+    assert len(mqtt_manager_mock.devices) == 5
+
+def test_admin_recording_start_and_stop(tmp_path, monkeypatch, client: TestClient, mqtt_manager_mock: MQTTManager):
+    monkeypatch.setattr("app.dependencies.ADMIN_TOKEN", "segredo")
+    monkeypatch.setattr("app.routers.admin.MQTT_RECORD_DIR", str(tmp_path))
+    headers = {"X-Admin-Token": "segredo"}
+
+    started = client.post("/admin/mqtt/gravacao", headers=headers)
+    assert started.status_code == 201
+    assert client.post("/admin/mqtt/gravacao", headers=headers).status_code == 409
+
+    mqtt_manager_mock.on_message(mqtt_manager_mock.client, "devices/esp1/status", b'{"online": true}', 0)
+
+    stopped = client.delete("/admin/mqtt/gravacao", headers=headers)
+    assert stopped.json()["mensagens"] == 1
+    assert mqtt_manager_mock.recorder is None
+    assert len(list(read_recording(started.json()["arquivo"]))) == 1
+    assert client.delete("/admin/mqtt/gravacao", headers=headers).status_code == 404
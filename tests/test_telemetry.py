@@ -0,0 +1,140 @@
+import pytest
+import esp
+from sqlalchemy import select
+
+from app.exceptions.telemetry import InvalidTelemetryException
+from app.models import TelemetriaORM
+from app.telemetry import HEADER, TelemetryWriter, decode_telemetry, encode_telemetry
+from app.topic_router import TopicRouter
+
+BASE_TS = 1_700_000_000_000
+SAMPLES = [(0, 10, -20, 9000, 300, 1500), (100, 40, -25, 9050, 310, 1450)]
+
+
+def test_decode_roundtrip():
+    base, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+
+    assert base == BASE_TS
+    assert [tuple(int(v) for v in s) for s in samples] == SAMPLES
+
+
+def test_heading_near_full_turn_roundtrip(db_session):
+    # O simulador mantém a direção em [0, 360): perto de 359° passa do limite de i16.
+    samples = [(0, 0, 0, 35999, 300, 1500), (100, 0, 0, 35850, 300, 1500), (200, 0, 0, 0, 300, 1500)]
+    payload = encode_telemetry(BASE_TS, samples)
+    esp_payload = esp.TELEMETRY_HEADER.pack(1, 0, 3, BASE_TS) + b"".join(
+        esp.TELEMETRY_SAMPLE.pack(*s) for s in samples
+    )
+
+    assert esp_payload == payload
+    _, decoded = decode_telemetry(payload)
+    assert decoded["direcao"].tolist() == [35999, 35850, 0]
+
+    writer = TelemetryWriter(db_session.get_bind())
+    writer.add("esp32-1", BASE_TS, decoded)
+    writer.flush()
+    assert db_session.scalars(select(TelemetriaORM.direcao)).all() == [35999, 35850, 0]
+
+
+@pytest.mark.parametrize("payload", [
+    b"\x01\x00",
+    HEADER.pack(2, 0, 0, BASE_TS),
+    encode_telemetry(BASE_TS, SAMPLES)[:-1],
+])
+def test_decode_rejects_malformed_payload(payload):
+    with pytest.raises(InvalidTelemetryException):
+        decode_telemetry(payload)
+
+
+def test_writer_flushes_to_database(db_session):
+    writer = TelemetryWriter(db_session.get_bind())
+    router = TopicRouter()
+    router.register("devices/+/telemetry", writer.handle)
+
+    router.dispatch("devices/esp1/telemetry", encode_telemetry(BASE_TS, SAMPLES))
+    router.dispatch("devices/esp2/telemetry", encode_telemetry(BASE_TS + 500, SAMPLES[:1]))
+
+    assert writer.flush() == 3
+    rows = db_session.execute(
+        select(TelemetriaORM.deviceId, TelemetriaORM.timestamp, TelemetriaORM.x, TelemetriaORM.direcao)
+        .order_by(TelemetriaORM.id)
+    ).all()
+    assert rows == [
+        ("esp1", BASE_TS, 10, 9000),
+        ("esp1", BASE_TS + 100, 40, 9050),
+        ("esp2", BASE_TS + 500, 10, 9000),
+    ]
+    assert writer.stats()["gravadas"] == 3
+    assert writer.flush() == 0
+
+
+def test_writer_drops_oldest_when_buffer_is_full(db_session):
+    writer = TelemetryWriter(db_session.get_bind(), max_buffer=3)
+    _, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+
+    writer.add("esp1", BASE_TS, samples)
+    writer.add("esp1", BASE_TS + 1000, samples)
+
+    assert writer.stats()["descartadas"] == 2
+    assert writer.flush() == 2
+    timestamps = db_session.execute(select(TelemetriaORM.timestamp)).scalars().all()
+    assert min(timestamps) == BASE_TS + 1000
+
+
+def test_writer_keeps_batch_when_write_fails(db_session, monkeypatch):
+    writer = TelemetryWriter(db_session.get_bind())
+    _, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+    writer.add("esp1", BASE_TS, samples)
+
+    def fail(columns):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(writer, "_executemany", fail)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    monkeypatch.undo()
+
+    assert writer.stats()["pendentes"] == 2
+    assert writer.flush() == 2
+
+
+def test_writer_failed_flush_respects_max_buffer(db_session, monkeypatch):
+    writer = TelemetryWriter(db_session.get_bind(), max_buffer=3)
+    _, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+    writer.add("esp1", BASE_TS, samples)
+
+    def fail(columns):
+        # Amostras que chegam enquanto o banco está fora.
+        writer.add("esp2", BASE_TS, samples)
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(writer, "_executemany", fail)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    monkeypatch.undo()
+
+    assert writer.stats()["pendentes"] == 2
+    assert writer.stats()["descartadas"] == 2
+    assert writer.flush() == 2
+
+def test_writer_thread_flushes_on_stop(db_session):
+    writer = TelemetryWriter(db_session.get_bind(), flush_interval=60)
+    writer.start()
+    _, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+    writer.add("esp1", BASE_TS, samples)
+    writer.stop()
+
+    assert writer.stats()["gravadas"] == 2
+
+def test_writer_stop_survives_database_error(db_session, monkeypatch):
+    writer = TelemetryWriter(db_session.get_bind())
+    _, samples = decode_telemetry(encode_telemetry(BASE_TS, SAMPLES))
+    writer.add("esp1", BASE_TS, samples)
+
+    def fail(columns):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(writer, "_executemany", fail)
+    writer.stop()
+
+    assert writer.stats()["pendentes"] == 2
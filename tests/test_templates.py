@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, call
+from sqlalchemy.orm import Session
+from app.commands import compile_commands, parse_commands
+from app.exceptions.commands import InvalidComandosException
+from app.models import TrajetoORM
+from app.outbox import OutboxRelay
+from app.services.templates import TemplateCache
+
+def test_parse_commands_tokens():
+    assert parse_commands("a1000da0001e") == [("a", 1000), ("d", 0), ("a", 1), ("e", 0)]
+
+@pytest.mark.parametrize("comandos", ["", "a100", "x", "a1000z", "a1000i5"])
+def test_parse_commands_rejects_invalid(comandos):
+    with pytest.raises(InvalidComandosException):
+        parse_commands(comandos)
+
+def test_compile_commands_is_canonical():
+    assert compile_commands("a1000da0001e") == "a1000da0001e"
+
+def test_create_template(client: TestClient, template_cache: TemplateCache):
+    response = client.post("/templates/", json={"nome": "Ronda", "comandos": "a1000da0001e"})
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["nome"] == "Ronda"
+    assert data["comandos"] == "a1000da0001e"
+    assert template_cache.get(data["idTemplate"]) == "a1000da0001e"
+
+def test_create_template_invalid_commands(client: TestClient):
+    response = client.post("/templates/", json={"nome": "Ronda", "comandos": "a10x"})
+
+    assert response.status_code == 422
+    assert "Comandos inválidos" in response.json()["detail"]
+
+def test_list_and_get_templates(client: TestClient):
+    created = client.post("/templates/", json={"nome": "Ronda", "comandos": "a0500e"}).json()
+
+    assert len(client.get("/templates/").json()) == 1
+
+    response = client.get(f"/templates/{created['idTemplate']}")
+    assert response.status_code == 200
+    assert response.json() == created
+
+def test_get_template_not_found(client: TestClient):
+    response = client.get("/templates/9999")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Template não encontrado"
+
+def test_dispatch_template_to_many_devices(
+    client: TestClient, mqtt_manager_mock, db_session: Session, outbox_relay: OutboxRelay
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    template = client.post("/templates/", json={"nome": "Ronda", "comandos": "a1000da0001e"}).json()
+
+    response = client.post(
+        f"/templates/{template['idTemplate']}/dispatch",
+        json={"devices": ["esp32-1", "esp32-2"]},
+    )
+
+    assert response.status_code == 201
+    trajetos = response.json()
+    assert [t["idTemplate"] for t in trajetos] == [template["idTemplate"]] * 2
+    assert all(t["comandosEnviados"] == "a1000da0001e" for t in trajetos)
+
+    assert asyncio.run(outbox_relay.relay_once()) == 2
+    mqtt_manager_mock.publish.assert_has_calls([
+        call("devices/esp32-1/commands", f"a1000da0001ei{trajetos[0]['idTrajeto']}".encode(),
+             qos=1, user_property=[("trace_id", trajetos[0]["traceId"])]),
+        call("devices/esp32-2/commands", f"a1000da0001ei{trajetos[1]['idTrajeto']}".encode(),
+             qos=1, user_property=[("trace_id", trajetos[1]["traceId"])]),
+    ])
+
+    stored = db_session.get(TrajetoORM, trajetos[0]["idTrajeto"])
+    assert stored.comandosEnviados is None
+    assert stored.comandos == "a1000da0001e"
+
+def test_dispatch_template_uses_cached_payload(
+    client: TestClient, mqtt_manager_mock, template_cache: TemplateCache, outbox_relay: OutboxRelay
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+    template = client.post("/templates/", json={"nome": "Ronda", "comandos": "a0500e"}).json()
+    template_cache.put(template["idTemplate"], "compilado")
+
+    response = client.post(f"/templates/{template['idTemplate']}/dispatch", json={"devices": ["esp32-1"]})
+
+    assert response.status_code == 201
+    trajeto = response.json()[0]
+    asyncio.run(outbox_relay.relay_once())
+    mqtt_manager_mock.publish.assert_called_once_with(
+        "devices/esp32-1/commands", f"compiladoi{trajeto['idTrajeto']}".encode(),
+        qos=1, user_property=[("trace_id", trajeto["traceId"])]
+    )
+
+def test_dispatch_template_offline_device(client: TestClient, mqtt_manager_mock):
+    mqtt_manager_mock.is_device_online = MagicMock(side_effect=lambda d: d != "esp32-2")
+    mqtt_manager_mock.publish = MagicMock()
+    template = client.post("/templates/", json={"nome": "Ronda", "comandos": "a0500e"}).json()
+
+    response = client.post(
+        f"/templates/{template['idTemplate']}/dispatch",
+        json={"devices": ["esp32-1", "esp32-2"]},
+    )
+
+    assert response.status_code == 400
+    assert "esp32-2" in response.json()["detail"]
+    mqtt_manager_mock.publish.assert_not_called()
+
+def test_dispatch_template_not_found(client: TestClient, mqtt_manager_mock):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+
+    response = client.post("/templates/9999/dispatch", json={"devices": ["esp32-1"]})
+
+    assert response.status_code == 404
@@ -0,0 +1,94 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+from app.mqtt_manager import MQTTManager
+from app.topic_router import TopicRouter
+
+def make_router(*filters):
+    router = TopicRouter()
+    calls = {f: [] for f in filters}
+    for f in filters:
+        router.register(f, calls[f].append)
+    return router, calls
+
+@pytest.mark.parametrize("topic_filter, topic, expected", [
+    ("devices/+/status", "devices/esp32-1/status", ("esp32-1",)),
+    ("devices/+/status", "devices/esp32-1/trajeto", None),
+    ("devices/+/status", "devices/esp32-1/status/extra", None),
+    ("devices/#", "devices/esp32-1/logs/boot", ("esp32-1/logs/boot",)),
+    ("devices/#", "devices", ("",)),
+    ("devices/+/sensors/#", "devices/esp32-1/sensors/imu/x", ("esp32-1", "imu/x")),
+    ("#", "$SYS/broker/uptime", None),
+    ("$SYS/#", "$SYS/broker/uptime", ("broker/uptime",)),
+])
+def test_wildcard_matching(topic_filter, topic, expected):
+    router, calls = make_router(topic_filter)
+
+    router.dispatch(topic, b"x")
+
+    if expected is None:
+        assert calls[topic_filter] == []
+    else:
+        assert calls[topic_filter][0].params == expected
+
+def test_all_matching_handlers_are_called():
+    router, calls = make_router("devices/+/status", "devices/#", "devices/esp32-1/status")
+
+    assert router.dispatch("devices/esp32-1/status", b"{}", qos=1) == 3
+    assert all(len(c) == 1 for c in calls.values())
+    assert calls["devices/#"][0].qos == 1
+
+@pytest.mark.parametrize("topic_filter", ["devices/#/status", "devices/esp+/status", "devices/a#"])
+def test_invalid_filters_are_rejected(topic_filter):
+    with pytest.raises(ValueError):
+        TopicRouter().register(topic_filter, print)
+
+def test_handler_error_does_not_block_other_handlers():
+    router = TopicRouter()
+    ok = MagicMock(__name__="ok")
+    router.register("devices/+/logs", MagicMock(side_effect=RuntimeError("boom"), __name__="falha"))
+    router.register("devices/+/logs", ok)
+
+    router.dispatch("devices/esp32-1/logs", b"")
+
+    ok.assert_called_once()
+    stats = {s["handler"]: s for s in router.stats()}
+    assert stats["falha"]["erros"] == 1
+    assert stats["ok"]["chamadas"] == 1
+
+def test_registering_invalidates_match_cache():
+    router, calls = make_router("devices/+/status")
+    router.dispatch("devices/esp32-1/acks", b"")
+
+    handler = MagicMock(__name__="acks")
+    router.register("devices/+/acks", handler)
+    router.dispatch("devices/esp32-1/acks", b"")
+
+    handler.assert_called_once()
+
+def test_filters_are_unique_subscriptions():
+    router, _ = make_router("devices/+/status", "devices/+/trajeto")
+    router.register("devices/+/status", print)
+
+    assert router.filters() == ["devices/+/status", "devices/+/trajeto"]
+
+def test_register_handler_subscribes_when_connected(mqtt_manager_mock: MQTTManager):
+    mqtt_manager_mock.on_connect(mqtt_manager_mock.client, flags={}, rc=0, properties=None)
+    handler = MagicMock(__name__="sensores")
+
+    mqtt_manager_mock.register_handler("devices/+/sensors", handler)
+    mqtt_manager_mock.on_message(mqtt_manager_mock.client, "devices/esp32-1/sensors", b"1", 0, None)
+
+    mqtt_manager_mock.client.subscribe.assert_called_with("devices/+/sensors")
+    assert handler.call_args.args[0].params == ("esp32-1",)
+
+def test_handler_stats_endpoint(client: TestClient, mqtt_manager_mock: MQTTManager, monkeypatch):
+    import app.dependencies as dependencies
+    monkeypatch.setattr(dependencies, "ADMIN_TOKEN", "segredo")
+    mqtt_manager_mock.on_message(mqtt_manager_mock.client, "devices/esp32-1/status", b'{"online": true}', 0, None)
+
+    response = client.get("/admin/mqtt/handlers", headers={"X-Admin-Token": "segredo"})
+
+    assert response.status_code == 200
+    status = next(s for s in response.json() if s["filtro"] == "devices/+/status")
+    assert status["chamadas"] == 1
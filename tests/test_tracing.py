@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from app.mqtt_manager import MQTTManager
+from app.outbox import OutboxRelay
+from app.tracing import TRACE_FLUSH_EVERY, Tracer, trace_id_from_properties
+
+def test_trace_id_from_properties():
+    assert trace_id_from_properties({"user_property": [("outro", "x"), ("trace_id", "abc")]}) == "abc"
+    assert trace_id_from_properties({"user_property": [("outro", "x")]}) is None
+    assert trace_id_from_properties(None) is None
+
+def test_record_and_get_spans_in_start_order():
+    tracer = Tracer(export_path=None)
+
+    tracer.record("t1", "publish", 2_000_000, 3_000_000)
+    tracer.record("t1", "db_insert", 0, 2_000_000, deviceId="esp32-1")
+
+    spans = tracer.get("t1")
+    assert [s["nome"] for s in spans] == ["db_insert", "publish"]
+    assert spans[0]["duracaoMs"] == 2.0
+    assert spans[0]["deviceId"] == "esp32-1"
+    assert tracer.end_of("t1", "publish") == 3_000_000
+
+def test_span_records_errors():
+    tracer = Tracer(export_path=None)
+
+    try:
+        with tracer.span("t1", "publish"):
+            raise RuntimeError("broker down")
+    except RuntimeError:
+        pass
+
+    assert tracer.get("t1")[0]["erro"] == "broker down"
+
+def test_oldest_traces_are_evicted():
+    tracer = Tracer(capacity=2, export_path=None)
+
+    for trace_id in ("t1", "t2", "t3"):
+        tracer.record(trace_id, "publish", 0, 1)
+
+    assert tracer.get("t1") == []
+    assert tracer.recent() == ["t3", "t2"]
+
+def test_spans_are_exported_as_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(export_path=str(path))
+
+    tracer.record("t1", "db_insert", 0, 1)
+    tracer.record("t1", "publish", 1, 2)
+    tracer.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["nome"] for line in lines] == ["db_insert", "publish"]
+
+def test_full_batch_is_exported_off_the_caller(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(export_path=str(path))
+    writes = []
+
+    def write(batch):
+        writes.append((threading.current_thread().name, len(batch)))
+
+    tracer._write = write
+
+    for i in range(TRACE_FLUSH_EVERY):
+        tracer.record("t1", "publish", i, i + 1)
+    tracer.flush()
+
+    assert [n for _, n in writes if n] == [TRACE_FLUSH_EVERY]
+    assert all(name.startswith("trace-export") for name, _ in writes)
+
+def test_dispatch_timeline_end_to_end(
+    client: TestClient, mqtt_manager_mock: MQTTManager, db_session: Session, outbox_relay: OutboxRelay
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
+    mqtt_manager_mock.publish = MagicMock()
+
+    trajeto = client.post("/trajetos/esp32-1", json={"comandosEnviados": "a1000da0001e"}).json()
+    trace_id = trajeto["traceId"]
+    asyncio.run(outbox_relay.relay_once())
+
+    result = json.dumps({"idTrajeto": trajeto["idTrajeto"], "status": True, "tempo": 12000}).encode()
+    with patch("app.mqtt_manager.SessionLocal", return_value=db_session):
+        mqtt_manager_mock.on_message(
+            mqtt_manager_mock.client, "devices/esp32-1/trajeto", result, 1,
+            {"user_property": [("trace_id", trace_id)]}
+        )
+
+    response = client.get(f"/traces/{trace_id}")
+
+    assert response.status_code == 200
+    assert [s["nome"] for s in response.json()] == ["db_insert", "publish", "car", "result_write"]
+    assert client.get("/traces/").json() == [trace_id]
+
+def test_result_without_echoed_trace_uses_stored_trace_id(
+    client: TestClient, mqtt_manager_mock: MQTTManager, db_session: Session
+):
+    mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.publish = MagicMock()
+    trajeto = client.post("/trajetos/esp32-1", json={"comandosEnviados": "a0100"}).json()
+
+    result = json.dumps({"idTrajeto": trajeto["idTrajeto"], "status": True, "tempo": 1000}).encode()
+    with patch("app.mqtt_manager.SessionLocal", return_value=db_session):
+        mqtt_manager_mock.on_message(mqtt_manager_mock.client, "devices/esp32-1/trajeto", result, 1, None)
+
+    assert "result_write" in [s["nome"] for s in client.get(f"/traces/{trajeto['traceId']}").json()]
+
+def test_get_trace_not_found(client: TestClient):
+    assert client.get("/traces/desconhecido").status_code == 404
@@ -1,15 +1,19 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from app.models import TrajetoORM
+from app.models import OutboxORM, RotaTemplateORM, TrajetoORM
+from app.outbox import OutboxRelay
 from app.services.trajetos import TrajetoService
 from app.repositories.trajetos import TrajetoRepository
 from app.exceptions.trajetos import TrajetoNotFoundException
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from unittest.mock import MagicMock
 
-def test_create_trajeto_success(client: TestClient, mqtt_manager_mock):
+def test_create_trajeto_success(client: TestClient, mqtt_manager_mock, outbox_relay: OutboxRelay):
     device_id = "esp32-1"
     mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
     mqtt_manager_mock.publish = MagicMock()
 
     trajeto = {"comandosEnviados": "a1000da0001e"}
@@ -20,7 +24,13 @@ def test_create_trajeto_success(client: TestClient, mqtt_manager_mock):
     data = response.json()
     assert data["comandosEnviados"] == trajeto["comandosEnviados"]
     assert "idTrajeto" in data
-    mqtt_manager_mock.publish.assert_called_once()
+    mqtt_manager_mock.publish.assert_not_called()
+
+    assert asyncio.run(outbox_relay.relay_once()) == 1
+    mqtt_manager_mock.publish.assert_called_once_with(
+        f"devices/{device_id}/commands", f"a1000da0001ei{data['idTrajeto']}".encode(),
+        qos=1, user_property=[("trace_id", data["traceId"])]
+    )
 
 def test_create_trajeto_device_offline(client: TestClient, mqtt_manager_mock):
     device_id = "esp32-2"
@@ -36,19 +46,28 @@ def test_create_trajeto_device_offline(client: TestClient, mqtt_manager_mock):
     mqtt_manager_mock.publish.assert_not_called()
 
 
-def test_create_trajeto_publish_failure(client: TestClient, mqtt_manager_mock):
+def test_create_trajeto_publish_failure_keeps_command_pending(
+    client: TestClient, mqtt_manager_mock, outbox_relay: OutboxRelay, db_session: Session
+):
     device_id = "esp32-3"
     mqtt_manager_mock.is_device_online = MagicMock(return_value=True)
+    mqtt_manager_mock.connected = True
     mqtt_manager_mock.publish = MagicMock(side_effect=Exception("MQTT error"))
 
     trajeto = {"comandosEnviados": "a1000da0001e"}
 
     response = client.post(f"/trajetos/{device_id}", json=trajeto)
 
-    assert response.status_code == 500
-    assert "Falha ao enviar comandos MQTT" in response.json()["detail"]
+    assert response.status_code == 201
+    asyncio.run(outbox_relay.relay_once())
     mqtt_manager_mock.publish.assert_called_once()
 
+    mensagem = db_session.query(OutboxORM).one()
+    assert mensagem.idTrajeto == response.json()["idTrajeto"]
+    assert mensagem.enviadoEm is None
+    assert mensagem.tentativas == 1
+    assert mensagem.erro == "MQTT error"
+
 def test_list_trajetos_empty(client: TestClient):
     response = client.get("/trajetos/")
     
@@ -113,6 +132,30 @@ def test_get_trajeto_not_found(client: TestClient):
     data = response.json()
     assert data["detail"] == "Trajeto não encontrado"
 
+def test_list_trajetos_loads_templates_in_one_query(db_session: Session):
+    templates = [RotaTemplateORM(nome=f"Ronda {i}", comandos=f"a010{i}") for i in range(5)]
+    db_session.add_all(templates)
+    db_session.flush()
+    db_session.add_all([TrajetoORM(idTemplate=t.idTemplate, deviceId="esp1") for t in templates])
+    db_session.commit()
+    db_session.expunge_all()
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", listener)
+    try:
+        trajetos = TrajetoRepository(db_session).list_all()
+        comandos = [t.comandos for t in trajetos]
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", listener)
+
+    assert comandos == [f"a010{i}" for i in range(5)]
+    assert len(statements) == 2
+
+
 def test_delete_trajeto(db_session: Session, client: TestClient):
     """Deve excluir um trajeto existente e retornar status 204."""
     trajeto = TrajetoORM(